@@ -64,7 +64,6 @@ class LocalEnsembl:
         self.local_pep_zipname: str = self.filename_pep_template.format(self.url_species_name,
                                                                         self.assembly_default_species_name)
 
-        self.local_filename: str = self.local_zipname[:-3]
         self.local_pep_filename: str = self.local_pep_zipname[:-3]
 
         self.ftp_address: str = self.ftp_template.format(self.release_num,
@@ -85,20 +84,15 @@ class LocalEnsembl:
         return self.taxon_id
 
     def download(self) -> str:
+        # The GTF stays compressed on disk. GTFBoy streams gzip input directly.
         if not self.is_downloaded():
             print("\tDownloading " + self.ftp_address + ".")
             with closing(request.urlopen(self.ftp_address)) as r:
                 with open(os.path.join(self.goal_directory, self.local_zipname), 'wb') as f:
                     shutil.copyfileobj(r, f)
-
-            # Unpacking file
-            with gzip.open(os.path.join(self.goal_directory, self.local_zipname), 'rb') as f_in:
-                with open(os.path.join(self.goal_directory, self.local_filename), "wb") as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-            os.remove(os.path.join(self.goal_directory, self.local_zipname))
         else:
-            print("Ensembl file already downloaded. (" + os.path.join(self.goal_directory, self.local_filename) + ")")
-        return os.path.join(self.goal_directory, self.local_filename)
+            print("Ensembl file already downloaded. (" + os.path.join(self.goal_directory, self.local_zipname) + ")")
+        return os.path.join(self.goal_directory, self.local_zipname)
 
     def download_pep(self) -> str:
         if not self.is_pep_downloaded():
@@ -122,18 +116,21 @@ class LocalEnsembl:
 
     def remove(self) -> None:
         if self.is_downloaded():
-            os.remove(os.path.join(self.goal_directory, self.local_filename))
+            os.remove(os.path.join(self.goal_directory, self.local_zipname))
 
     def remove_pep(self) -> None:
         if self.is_pep_downloaded():
             os.remove(os.path.join(self.goal_directory, self.local_pep_filename))
+        # The faidx index that was built during the sequence collection.
+        if os.path.isfile(os.path.join(self.goal_directory, self.local_pep_filename + ".fai")):
+            os.remove(os.path.join(self.goal_directory, self.local_pep_filename + ".fai"))
 
     @property
     def ping(self) -> bool:
         return ping_ensembl()
 
     def is_downloaded(self) -> bool:
-        if os.path.isfile(os.path.join(self.goal_directory, self.local_filename)):
+        if os.path.isfile(os.path.join(self.goal_directory, self.local_zipname)):
             return True
         else:
             return False
@@ -21,6 +21,7 @@
 #######################################################################
 
 from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+from Classes.SequenceHandling.FASMatrix import FASMatrix
 
 import json
 import math
@@ -57,15 +58,16 @@ class AssemblyVisualizer:
 
         data_dict: Dict[str, List[Any]] = {"transcript_count": [],
                                            "fas_score": []}
-        for gene in self.gene_assembler.get_genes():
+        for gene in self.gene_assembler.iter_genes():
             count: int = 0
             fas_scores_count: int = 0
-            for transcript1 in gene.get_transcripts():
+            for transcript1 in gene.iter_transcripts():
                 if transcript1.get_biotype() != "nonsense_mediated_decay":
                     count += 1
-                    for transcript2 in gene.get_transcripts():
+                    for transcript2 in gene.iter_transcripts():
                         if transcript1 != transcript2 and transcript2.get_biotype() != "nonsense_mediated_decay":
-                            data_dict["fas_score"].append(gene.fas_dict[transcript1.get_id()][transcript2.get_id()])
+                            data_dict["fas_score"].append(gene.get_fas_matrix().get_score(transcript1.get_id(),
+                                                                                          transcript2.get_id()))
                             fas_scores_count += 1
             if count == 1:
                 continue
@@ -82,15 +84,16 @@ class AssemblyVisualizer:
         data_dict: Dict[str, List[Any]] = {"fas_score": [],
                                            "tsl_dist": [],
                                            "complete_status": []}
-        for gene in self.gene_assembler.get_genes():
-            for transcript1 in gene.get_transcripts():
+        for gene in self.gene_assembler.iter_genes():
+            for transcript1 in gene.iter_transcripts():
                 if transcript1.get_biotype() == "nonsense_mediated_decay":
                     continue
-                for transcript2 in gene.get_transcripts():
+                for transcript2 in gene.iter_transcripts():
                     if transcript1 == transcript2 or transcript2.get_biotype() == "nonsense_mediated_decay":
                         continue
                     else:
-                        data_dict["fas_score"].append(gene.fas_dict[transcript1.get_id()][transcript2.get_id()])
+                        data_dict["fas_score"].append(gene.get_fas_matrix().get_score(transcript1.get_id(),
+                                                                                      transcript2.get_id()))
                         tsl1: int = transcript1.get_transcript_support_level()
                         tsl2: int = transcript2.get_transcript_support_level()
                         data_dict["tsl_dist"].append(abs(tsl1 - tsl2))
@@ -129,7 +132,7 @@ class AssemblyVisualizer:
         for tag in tags:
             data_dict[tag] = []
 
-        for transcript in self.gene_assembler.get_transcripts():
+        for transcript in self.gene_assembler.iter_transcripts():
             data_dict["_id"].append(transcript.get_id())
             data_dict["transcript_name"].append(transcript.get_name())
             data_dict["feature"].append(transcript.get_feature())
@@ -161,11 +164,11 @@ class ResultVisualizer:
         with open(os.path.join(self.library_path, "fas_data", "fas_index.json"), "r") as f:
             file_name: str = json.load(f)[gene_id]
         with open(os.path.join(self.library_path, "fas_data", "fas_scores", file_name), "r") as f:
-            fas_adjacency_dict: Dict[str, Dict[str, float]] = json.load(f)[gene_id]
+            fas_matrix: FASMatrix = FASMatrix.from_dict(json.load(f)[gene_id])
 
-        fas_adjacency_matrix: np.array = ResultVisualizer.distance_dict_to_matrix(fas_adjacency_dict)
+        fas_adjacency_matrix: np.array = 1 - fas_matrix.get_block()
 
-        all_transcripts: List[str] = list(fas_adjacency_dict.keys())
+        all_transcripts: List[str] = fas_matrix.get_ids()
         expression_vector_1 = np.zeros(len(all_transcripts))
         expression_vector_2 = np.zeros(len(all_transcripts))
 
@@ -186,12 +189,7 @@ class ResultVisualizer:
 
     @staticmethod
     def distance_dict_to_matrix(distance_dict: Dict[str, Dict[str, float]]) -> np.array:
-        raw_matrix: List[List[float]] = list()
-        for protein_id_outer in distance_dict.keys():
-            raw_matrix.append(list())
-            for protein_id_inner in distance_dict[protein_id_outer].keys():
-                raw_matrix[-1].append(1 - distance_dict[protein_id_outer][protein_id_inner])
-        return np.array(raw_matrix)
+        return 1 - FASMatrix.from_dict(distance_dict).get_block()
 
     @staticmethod
     def calc_rmsd(ewfd_1: List[float], ewfd_2: List[float]):
@@ -201,15 +199,12 @@ class ResultVisualizer:
         return math.sqrt(sum(squared_delta_list)) / len(ewfd_1)
 
     @staticmethod
-    def calculate_ewfd(fas_adjacency_matrix: Dict[str, Dict[str, float]],
+    def calculate_ewfd(fas_adjacency_matrix: FASMatrix,
                        rel_expressions: List[float],
                        transcript_ids: List[str]) -> List[float]:
-        ewfd_list: List[float] = [0.0] * len(transcript_ids)
-        for s, seed_id in enumerate(transcript_ids):
-            for q, query_id in enumerate(transcript_ids):
-                ewfd_list[s] += rel_expressions[q] * fas_adjacency_matrix[seed_id][query_id]
-        ewfd_list = [round(1 - movement_value, 4) for movement_value in ewfd_list]
-        return ewfd_list
+        movement: np.ndarray = fas_adjacency_matrix.get_block(transcript_ids) @ np.asarray(rel_expressions,
+                                                                                          dtype=np.float64)
+        return np.round(1 - movement, 4).tolist()
 
     def plot_rmsd_distribution(self,
                                result_directory: str,
@@ -22,6 +22,7 @@
 
 import numpy as np
 from typing import Dict, List, Any, Set
+from Classes.SequenceHandling.FASMatrix import FASMatrix
 from scipy.optimize import minimize
 import argparse
 import copy
@@ -56,17 +57,13 @@ class RMSDOptimizer:
             print("---")
 
     @staticmethod
-    def extract_max_rmsd(matrix):
-        vector: List[float] = list()
-        for i, _ in enumerate(matrix):
-            for j, _ in enumerate(matrix[i]):
-                if i != j:
-                    vector.append((matrix[i][j] + matrix[j][i]) / 2)
-        complement: List[float] = [1-entry for entry in vector]
-        if len(complement) == 0:
+    def extract_max_rmsd(matrix: np.ndarray) -> float:
+        if len(matrix) < 2:
             return 0.0
-        else:
-            return max(complement)
+        # Average both directions of each pair and leave out the diagonal.
+        symmetric: np.ndarray = (matrix + matrix.T) / 2
+        off_diagonal: np.ndarray = symmetric[~np.eye(len(matrix), dtype=bool)]
+        return float((1 - off_diagonal).max())
 
     @staticmethod
     def distance_dict_to_matrix(distance_dict: Dict[str, Dict[str, float]],
@@ -74,22 +71,17 @@ class RMSDOptimizer:
                                 complete_flag: bool,
                                 pre_ewfd_flag: bool,
                                 info_dict: Dict[str, Any]) -> np.array:
-        raw_matrix: List[List[float]] = list()
+        fas_matrix: FASMatrix = FASMatrix.from_dict(distance_dict)
         complete_flag = complete_flag and pre_ewfd_flag
         protein_coding_flag = protein_coding_flag and pre_ewfd_flag
-        for protein_id_outer in distance_dict.keys():
-            if complete_flag and "incomplete" in info_dict["transcripts"][protein_id_outer]["tags"]:
+        protein_ids: List[str] = list()
+        for protein_id in fas_matrix.get_ids():
+            if complete_flag and "incomplete" in info_dict["transcripts"][protein_id]["tags"]:
                 continue
-            elif protein_coding_flag and info_dict["transcripts"][protein_id_outer]["biotype"] != "protein_coding":
+            elif protein_coding_flag and info_dict["transcripts"][protein_id]["biotype"] != "protein_coding":
                 continue
-            raw_matrix.append(list())
-            for protein_id_inner in distance_dict[protein_id_outer].keys():
-                if complete_flag and "incomplete" in info_dict["transcripts"][protein_id_inner]["tags"]:
-                    continue
-                elif protein_coding_flag and info_dict["transcripts"][protein_id_inner]["biotype"] != "protein_coding":
-                    continue
-                raw_matrix[-1].append(distance_dict[protein_id_outer][protein_id_inner])
-        return np.array(raw_matrix)
+            protein_ids.append(protein_id)
+        return fas_matrix.get_block(protein_ids)
 
 
 def main():
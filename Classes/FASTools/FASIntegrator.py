@@ -0,0 +1,156 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2023 Christian Bluemel
+#
+# This file is part of Spice.
+#
+#  FASIntegrator is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  FASIntegrator is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Spice.  If not, see <http://www.gnu.org/licenses/>.
+#
+#######################################################################
+
+import json
+import os
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from Classes.FASTools.FASScoreCache import FASScoreCache
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.FASMatrix import FASMatrix
+from Classes.WriteGuard.AtomicFile import AtomicFile
+
+
+class FASIntegrator:
+    """
+    Writes the scores of phyloprofile rows into the FAS score shards of a library. The rows are grouped by the shard
+    that holds their gene and each shard is read, updated and replaced on its own. Only one shard is held in memory at a
+    time and the rest of the library is not loaded. Shards without new rows are left untouched. With a FASScoreCache
+    given, the new scores are added to the cache as well.
+    """
+
+    # Rows of a phyloprofile file that are buffered before they are appended to the files of their shards.
+    BUFFER_ROWS: int = 100000
+
+    def __init__(self, pass_path: PassPath, fas_score_cache: Optional[FASScoreCache] = None) -> None:
+        self.pass_path: PassPath = pass_path
+        with open(pass_path["fas_index"], "r") as f:
+            self.fas_index: Dict[str, str] = json.load(f)
+        self.fas_score_cache: Optional[FASScoreCache] = fas_score_cache
+        # Sequence hash of each protein, only needed for the cache.
+        self.sequence_hashes: Dict[str, str] = dict()
+        if fas_score_cache is not None:
+            self.sequence_hashes = FASScoreCache.load_hashes(pass_path)
+
+    def integrate_shard(self, shard: str, rows: Iterable[str]) -> int:
+        """
+        Sets the scores of the rows in one shard. Rows of genes or proteins that are not part of the shard are skipped.
+        Returns the number of integrated rows.
+        """
+        shard_path: str = os.path.join(self.pass_path["fas_scores"], shard)
+        with open(shard_path, "r") as f:
+            shard_dict: Dict[str, Dict[str, Dict[str, float]]] = json.load(f)
+        fas_matrices: Dict[str, FASMatrix] = dict()
+        cache_scores: List[Tuple[str, str, float]] = list()
+        row_count: int = 0
+        for row in rows:
+            parsed_row: Optional[Tuple[str, str, str, float, float]] = FASIntegrator.parse_row(row)
+            if parsed_row is None or parsed_row[0] not in shard_dict:
+                continue
+            gene_id, seed_id, query_id, fas_forward, fas_backward = parsed_row
+            if gene_id not in fas_matrices:
+                fas_matrices[gene_id] = FASMatrix.from_dict(shard_dict[gene_id])
+            fas_matrix: FASMatrix = fas_matrices[gene_id]
+            if seed_id in fas_matrix and query_id in fas_matrix:
+                fas_matrix.set_score(seed_id, query_id, fas_backward)
+                fas_matrix.set_score(query_id, seed_id, fas_forward)
+                row_count += 1
+                if seed_id in self.sequence_hashes and query_id in self.sequence_hashes:
+                    cache_scores.append((self.sequence_hashes[seed_id], self.sequence_hashes[query_id], fas_backward))
+                    cache_scores.append((self.sequence_hashes[query_id], self.sequence_hashes[seed_id], fas_forward))
+        if row_count > 0:
+            for gene_id, fas_matrix in fas_matrices.items():
+                shard_dict[gene_id] = fas_matrix.to_dict()
+            with AtomicFile(shard_path) as f:
+                json.dump(shard_dict, f, indent=4)
+        if self.fas_score_cache is not None and len(cache_scores) > 0:
+            self.fas_score_cache.put_scores(cache_scores)
+        return row_count
+
+    def integrate_genes(self, result_paths: Dict[str, str]) -> int:
+        """
+        Integrates the phyloprofile files of single genes, given by gene id. The files of one shard are read together.
+        """
+        shard_genes: Dict[str, List[str]] = dict()
+        for gene_id in result_paths.keys():
+            if gene_id in self.fas_index:
+                shard_genes.setdefault(self.fas_index[gene_id], list()).append(gene_id)
+        row_count: int = 0
+        for shard in sorted(shard_genes.keys()):
+            row_count += self.integrate_shard(shard, FASIntegrator.iter_rows([result_paths[gene_id] for gene_id
+                                                                              in shard_genes[shard]]))
+        return row_count
+
+    def integrate_file(self, phyloprofile_path: str) -> int:
+        """
+        Integrates a phyloprofile with the rows of any number of genes. The rows are first split into one file per shard,
+        so the phyloprofile is read only once and never held in memory as a whole.
+        """
+        with tempfile.TemporaryDirectory(dir=self.pass_path["fas_data"]) as bucket_dir:
+            buckets: Dict[str, List[str]] = dict()
+            buffered_rows: int = 0
+            for row in FASIntegrator.iter_rows([phyloprofile_path]):
+                gene_id: str = row.split("|", 1)[0]
+                if gene_id not in self.fas_index:
+                    continue
+                buckets.setdefault(self.fas_index[gene_id], list()).append(row)
+                buffered_rows += 1
+                if buffered_rows >= FASIntegrator.BUFFER_ROWS:
+                    FASIntegrator.flush_buckets(buckets, bucket_dir)
+                    buffered_rows = 0
+            FASIntegrator.flush_buckets(buckets, bucket_dir)
+            row_count: int = 0
+            for shard in sorted(os.listdir(bucket_dir)):
+                with open(os.path.join(bucket_dir, shard), "r") as f:
+                    row_count += self.integrate_shard(shard, f)
+        return row_count
+
+    @staticmethod
+    def flush_buckets(buckets: Dict[str, List[str]], bucket_dir: str) -> None:
+        for shard, rows in buckets.items():
+            with open(os.path.join(bucket_dir, shard), "a") as f:
+                f.write("".join(row + "\n" for row in rows))
+        buckets.clear()
+
+    @staticmethod
+    def iter_rows(phyloprofile_paths: List[str]) -> Iterator[str]:
+        """
+        Streams the rows of phyloprofile files without their header line.
+        """
+        for phyloprofile_path in phyloprofile_paths:
+            with open(phyloprofile_path, "r") as f:
+                next(f, None)
+                for line in f:
+                    yield line.rstrip("\n")
+
+    @staticmethod
+    def parse_row(row: str) -> Optional[Tuple[str, str, str, float, float]]:
+        """
+        Splits a phyloprofile row into gene id, seed and query protein id and the forward and backward score.
+        """
+        split_row: List[str] = row.rstrip("\n").split("\t")
+        if len(split_row) < 5:
+            return None
+        split_seed: List[str] = split_row[0].split("|")
+        split_query: List[str] = split_row[2].split("|")
+        return split_seed[0], split_seed[1], split_query[1], float(split_row[3]), float(split_row[4])
@@ -0,0 +1,159 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2023 Christian Bluemel
+#
+# This file is part of Spice.
+#
+#  FASScoreCache is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  FASScoreCache is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Spice.  If not, see <http://www.gnu.org/licenses/>.
+#
+#######################################################################
+
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.FASMatrix import FASMatrix
+from Classes.SequenceHandling.Gene import Gene
+from Classes.SequenceHandling.Protein import Protein
+from Classes.WriteGuard.AtomicFile import AtomicFile
+
+
+class FASScoreCache:
+    """
+    Persistent FAS scores of protein pairs, shared by any number of libraries. A score is stored under the sequence
+    hashes of both proteins, the FAS mode hex and a version label of the annotation tools, so it is reused for every
+    pair with the same sequences and settings, no matter the release or library. Scores are directed like the FAS
+    matrix, the score of protein A against protein B is the one in the row of A.
+    """
+
+    # Sequence hash of each protein of a library, needed to address the cache without loading the sequences.
+    HASH_FILE: str = "sequence_hashes.json"
+
+    def __init__(self, cache_path: str, mode_hex: str, tools_version: str = "") -> None:
+        self.cache_path: str = cache_path
+        self.mode_hex: str = mode_hex
+        self.tools_version: str = tools_version
+        self.connection: sqlite3.Connection = sqlite3.connect(cache_path, timeout=600)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS fas_scores ("
+                                "sequence_a TEXT NOT NULL, sequence_b TEXT NOT NULL, "
+                                "mode TEXT NOT NULL, tools TEXT NOT NULL, score REAL NOT NULL, "
+                                "PRIMARY KEY (sequence_a, sequence_b, mode, tools)) WITHOUT ROWID")
+        self.connection.commit()
+
+    def __enter__(self) -> "FASScoreCache":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def get_score(self, hash_a: str, hash_b: str) -> Optional[float]:
+        row: Optional[Tuple[float]] = self.connection.execute(
+            "SELECT score FROM fas_scores WHERE sequence_a = ? AND sequence_b = ? AND mode = ? AND tools = ?",
+            (hash_a, hash_b, self.mode_hex, self.tools_version)).fetchone()
+        return None if row is None else row[0]
+
+    def put_scores(self, scores: Iterable[Tuple[str, str, float]]) -> None:
+        """
+        Stores (hash A, hash B, score) entries in one transaction. Existing entries are replaced.
+        """
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO fas_scores VALUES (?, ?, ?, ?, ?)",
+                                        [(hash_a, hash_b, self.mode_hex, self.tools_version, score)
+                                         for hash_a, hash_b, score in scores])
+
+    def fill_gene(self, gene: Gene) -> int:
+        """
+        Sets the cached scores of all unscored protein pairs of a gene. Returns the number of scores that were set.
+        """
+        hash_dict: Dict[str, str] = {protein.get_id(): FASScoreCache.hash_sequence(protein.get_sequence())
+                                     for protein in gene.get_proteins() if protein.has_sequence()}
+        score_count: int = 0
+        for protein_1, protein_2 in list(gene.iter_pairings()):
+            for id_1, id_2 in [(protein_1.get_id(), protein_2.get_id()), (protein_2.get_id(), protein_1.get_id())]:
+                if id_1 not in hash_dict or id_2 not in hash_dict:
+                    continue
+                if gene.get_fas_matrix().get_score(id_1, id_2) != FASMatrix.UNSCORED:
+                    continue
+                score: Optional[float] = self.get_score(hash_dict[id_1], hash_dict[id_2])
+                if score is not None:
+                    gene.set_fas_score(id_1, id_2, score)
+                    score_count += 1
+        return score_count
+
+    def add_gene(self, gene: Gene) -> None:
+        """
+        Stores all scores of different proteins of a gene.
+        """
+        proteins: List[Protein] = [protein for protein in gene.get_proteins() if protein.has_sequence()]
+        hash_dict: Dict[str, str] = {protein.get_id(): FASScoreCache.hash_sequence(protein.get_sequence())
+                                     for protein in proteins}
+        fas_matrix: FASMatrix = gene.get_fas_matrix()
+        scores: List[Tuple[str, str, float]] = list()
+        for protein_1 in proteins:
+            for protein_2 in proteins:
+                if protein_1 == protein_2 or not fas_matrix.has_score(protein_1.get_id(), protein_2.get_id()):
+                    continue
+                score: float = fas_matrix.get_score(protein_1.get_id(), protein_2.get_id())
+                if score != FASMatrix.UNSCORED:
+                    scores.append((hash_dict[protein_1.get_id()], hash_dict[protein_2.get_id()], score))
+        self.put_scores(scores)
+
+    @staticmethod
+    def hash_sequence(sequence: str) -> str:
+        return hashlib.sha256(sequence.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_tools_label(anno_version: str) -> str:
+        """
+        Turns the --anno_version argument into the tools label of the cache. A path to the annoTools directory is
+        replaced by a hash of the names and sizes of all files in it, so a changed installation gets a new label.
+        """
+        if not os.path.isdir(anno_version):
+            return anno_version
+        hasher = hashlib.sha256()
+        for directory, directory_names, file_names in os.walk(anno_version):
+            directory_names.sort()
+            for file_name in sorted(file_names):
+                file_path: str = os.path.join(directory, file_name)
+                hasher.update(json.dumps([os.path.relpath(file_path, anno_version),
+                                          os.path.getsize(file_path)]).encode("utf-8"))
+        return "annoTools:" + hasher.hexdigest()
+
+    @staticmethod
+    def get_hash_path(pass_path: PassPath) -> str:
+        return os.path.join(pass_path["fas_data"], FASScoreCache.HASH_FILE)
+
+    @staticmethod
+    def save_hashes(genes: Iterable[Gene], pass_path: PassPath) -> None:
+        hash_dict: Dict[str, str] = dict()
+        for gene in genes:
+            for protein in gene.get_proteins():
+                if protein.has_sequence():
+                    hash_dict[protein.get_id()] = FASScoreCache.hash_sequence(protein.get_sequence())
+        with AtomicFile(FASScoreCache.get_hash_path(pass_path)) as f:
+            json.dump(hash_dict, f)
+
+    @staticmethod
+    def load_hashes(pass_path: PassPath) -> Dict[str, str]:
+        if not os.path.exists(FASScoreCache.get_hash_path(pass_path)):
+            return dict()
+        with open(FASScoreCache.get_hash_path(pass_path), "r") as f:
+            return json.load(f)
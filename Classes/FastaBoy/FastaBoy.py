@@ -21,9 +21,11 @@
 #######################################################################
 
 import sys
-from typing import Dict, List, Tuple, Iterator, Any
+from typing import Dict, List, Tuple, Iterator, Any, Optional, Callable, BinaryIO
 import argparse
 import json
+import mmap
+import os
 
 from Classes.SequenceHandling.Protein import Protein
 from Classes.SequenceHandling.Transcript import Transcript
@@ -171,9 +173,14 @@ class EnsemblFastaBoy:
         gene_id: str = ""
         protein_id: str = ""
         found_flag: bool = False
+        # The lines of the current sequence are joined once the next header is reached.
+        sequence_list: List[str] = list()
         for line in self:
             if line.startswith(">"):
+                if found_flag:
+                    self.fasta_dict[gene_id][protein_id] = "".join(sequence_list)
                 found_flag = False
+                sequence_list = list()
                 fasta_header_dict: Dict[str, str] = EnsemblFastaBoy.make_fasta_header_dict(line)
                 if self.__apply_filter(fasta_header_dict):
                     found_flag = True
@@ -183,7 +190,9 @@ class EnsemblFastaBoy:
                         self.fasta_dict[gene_id] = dict()
                     self.fasta_dict[gene_id][protein_id] = ""
             elif found_flag:
-                self.fasta_dict[gene_id][protein_id] += line.strip()
+                sequence_list.append(line.strip())
+        if found_flag:
+            self.fasta_dict[gene_id][protein_id] = "".join(sequence_list)
 
     def __apply_filter(self, fasta_header_dict: Dict[str, str]) -> bool:
         for key, value in self.filter_list:
@@ -229,6 +238,137 @@ class EnsemblFastaBoy:
                 yield line
 
 
+class IndexedFastaBoy:
+    """
+    Random access to the sequences of an uncompressed FASTA file through a faidx compatible index (<fasta>.fai). The
+    index is built on first use and reused as long as it is newer than the FASTA. Sequences are sliced out of a memory
+    map of the FASTA, so only the bytes of the requested sequence are read.
+    """
+
+    def __init__(self, fasta_path: str, key_function: Optional[Callable[[str], str]] = None):
+        """
+        :param fasta_path: Path to an uncompressed FASTA file.
+        :param key_function: Maps the sequence names of the index to the keys they are looked up by, e.g. to drop the
+         version of Ensembl ids. By default the names are used as they are.
+        """
+        self.fasta_path: str = fasta_path
+        self.index_path: str = fasta_path + ".fai"
+        if not IndexedFastaBoy.is_index_current(fasta_path, self.index_path):
+            IndexedFastaBoy.build_index(fasta_path, self.index_path)
+        # name -> (length, offset, line_bases, line_width)
+        self.index: Dict[str, Tuple[int, int, int, int]] = IndexedFastaBoy.load_index(self.index_path)
+        self.key_dict: Dict[str, str] = dict()
+        if key_function is not None:
+            self.key_dict = {key_function(name): name for name in self.index.keys()}
+        self.file: BinaryIO = open(fasta_path, "rb")
+        if os.path.getsize(fasta_path) > 0:
+            self.memory_map: Optional[mmap.mmap] = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.memory_map: Optional[mmap.mmap] = None
+
+    def __enter__(self) -> "IndexedFastaBoy":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.memory_map is not None:
+            self.memory_map.close()
+        self.file.close()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.key_dict or key in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, key: str) -> str:
+        return self.fetch(key)
+
+    def resolve_name(self, key: str) -> str:
+        if key in self.key_dict:
+            return self.key_dict[key]
+        elif key in self.index:
+            return key
+        raise KeyError(key)
+
+    def get_length(self, key: str) -> int:
+        return self.index[self.resolve_name(key)][0]
+
+    def fetch(self, key: str, start: int = 1, end: Optional[int] = None) -> str:
+        """
+        Returns the sequence of key between start and end. Like GTF coordinates both are 1-based and inclusive.
+        Without end the sequence is returned up to its last position.
+        """
+        length, offset, line_bases, line_width = self.index[self.resolve_name(key)]
+        if end is None or end > length:
+            end = length
+        if start < 1:
+            start = 1
+        if end < start:
+            return ""
+        start_byte: int = offset + ((start - 1) // line_bases) * line_width + (start - 1) % line_bases
+        end_byte: int = offset + ((end - 1) // line_bases) * line_width + (end - 1) % line_bases + 1
+        return self.memory_map[start_byte:end_byte].replace(b"\n", b"").replace(b"\r", b"").decode()
+
+    @staticmethod
+    def strip_version(name: str) -> str:
+        return name.split(".")[0]
+
+    @staticmethod
+    def is_index_current(fasta_path: str, index_path: str) -> bool:
+        if not os.path.isfile(index_path):
+            return False
+        return os.path.getmtime(index_path) >= os.path.getmtime(fasta_path)
+
+    @staticmethod
+    def build_index(fasta_path: str, index_path: str) -> None:
+        """
+        Writes a faidx index with the columns NAME, LENGTH, OFFSET, LINEBASES and LINEWIDTH. Like faidx it expects all
+        sequence lines of a record but the last to have the same length.
+        """
+        name: str = ""
+        length: int = 0
+        offset: int = 0
+        line_bases: int = 0
+        line_width: int = 0
+        position: int = 0
+        with open(fasta_path, "rb") as f_in:
+            with open(index_path, "w") as f_out:
+                for line in f_in:
+                    position += len(line)
+                    if line.startswith(b">"):
+                        if name:
+                            f_out.write("\t".join([name, str(length), str(offset),
+                                                   str(line_bases), str(line_width)]) + "\n")
+                        split_header: List[bytes] = line[1:].split()
+                        name = split_header[0].decode() if len(split_header) > 0 else ""
+                        length = 0
+                        offset = position
+                        line_bases = 0
+                        line_width = 0
+                    else:
+                        bases: int = len(line.rstrip(b"\r\n"))
+                        if line_bases == 0:
+                            line_bases = bases
+                            line_width = len(line)
+                        length += bases
+                if name:
+                    f_out.write("\t".join([name, str(length), str(offset),
+                                           str(line_bases), str(line_width)]) + "\n")
+
+    @staticmethod
+    def load_index(index_path: str) -> Dict[str, Tuple[int, int, int, int]]:
+        index: Dict[str, Tuple[int, int, int, int]] = dict()
+        with open(index_path, "r") as f:
+            for line in f:
+                split_line: List[str] = line.rstrip("\n").split("\t")
+                index[split_line[0]] = (int(split_line[1]), int(split_line[2]),
+                                        int(split_line[3]), int(split_line[4]))
+        return index
+
+
 def main():
     parser: argparse.ArgumentParser = argparse.ArgumentParser()
     parser.add_argument("-i",
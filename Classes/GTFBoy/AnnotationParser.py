@@ -21,6 +21,7 @@
 #######################################################################
 
 from Classes.GTFBoy.GTFBoy import GTFBoy
+from Classes.GTFBoy.GTFRecord import GTFRecord
 from typing import List, Dict, Any, Set
 import json
 import hashlib
@@ -64,7 +65,11 @@ class AnnotationParser:
             current_anno_dict: Dict[str, Dict[str, Any]] = dict()
             for line in gtf_iterator:
                 if not line.startswith("#"):
-                    line_dict: Dict[str, str] = GTFBoy.build_dict(line.split("\t"))
+                    record: GTFRecord = GTFRecord.from_line(line)
+                    # Only exons and transcripts can become candidates, see check_if_candidate.
+                    if record.feature not in ["exon", "transcript"]:
+                        continue
+                    line_dict: Dict[str, str] = record.to_dict()
                     line_dict["gene_id"] = line_dict["gene_id"].split(".")[0]
                     line_dict["transcript_id"] = line_dict["transcript_id"].split(".")[0]
                     if line_dict["gene_id"] not in self.protein_coding_gene_set:
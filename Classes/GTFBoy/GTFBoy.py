@@ -20,7 +20,14 @@
 #
 #######################################################################
 
-from typing import Iterator, Dict, List
+import gzip
+import io
+import os
+import shutil
+import tempfile
+from typing import Iterator, Dict, List, BinaryIO, TextIO, Optional, Tuple
+
+from tqdm import tqdm
 
 
 class GTFBoy:
@@ -32,15 +39,120 @@ class GTFBoy:
                            "start", "end", "score",
                            "strand", "frame", "attribute"]
 
+    GZIP_MAGIC: bytes = b"\x1f\x8b"
+
+    # Number of lines between two updates of the progress bar.
+    PROGRESS_INTERVAL: int = 10000
+
+    # Number of byte ranges per process when the GTF is parsed in parallel. More ranges than processes even out
+    # ranges that happen to be slower to parse.
+    RANGES_PER_PROCESS: int = 4
+
     def __init__(self, gtf_path: str):
         self.gtf_path: str = gtf_path
-        with open(gtf_path) as f:
-            self.total_lines = len(f.readlines())
+        # Size on disk. For gzip/bgzip input this is the compressed size, which is what the progress tracks.
+        self.total_bytes: int = os.path.getsize(gtf_path)
 
     def __iter__(self) -> Iterator[str]:
-        with open(self.gtf_path, "r") as f:
-            for line in f:
-                yield line
+        with open(self.gtf_path, "rb") as raw:
+            with GTFBoy.open_text(raw) as f:
+                for line in f:
+                    yield line
+
+    def progress(self, desc: str) -> Iterator[str]:
+        """
+        Streams the GTF line by line, exactly like iterating over the GTFBoy, while showing a progress bar that is
+        driven by the number of bytes read from disk. The file is only read once.
+
+        :param desc: Description shown in front of the progress bar.
+        """
+        with open(self.gtf_path, "rb") as raw:
+            with GTFBoy.open_text(raw) as f:
+                with tqdm(total=self.total_bytes, ncols=100, unit="B", unit_scale=True, desc=desc) as progress_bar:
+                    position: int = 0
+                    for i, line in enumerate(f):
+                        yield line
+                        if i % GTFBoy.PROGRESS_INTERVAL == 0:
+                            new_position: int = raw.tell()
+                            progress_bar.update(new_position - position)
+                            position = new_position
+                    progress_bar.update(self.total_bytes - position)
+
+    def is_splittable(self) -> bool:
+        # Compressed files can not be entered at an arbitrary byte offset.
+        with open(self.gtf_path, "rb") as raw:
+            return not GTFBoy.is_gzipped(raw)
+
+    def decompress(self, directory: str) -> str:
+        """
+        Writes the uncompressed GTF into a new temporary file in the given directory and returns its path. The caller
+        removes the file.
+        """
+        file_descriptor, temp_path = tempfile.mkstemp(suffix=".gtf", dir=directory)
+        with open(self.gtf_path, "rb") as raw:
+            with os.fdopen(file_descriptor, "wb") as f:
+                if GTFBoy.is_gzipped(raw):
+                    shutil.copyfileobj(gzip.GzipFile(fileobj=raw, mode="rb"), f)
+                else:
+                    shutil.copyfileobj(raw, f)
+        return temp_path
+
+    def split_ranges(self, range_count: int, boundary_feature: Optional[str] = None) -> List[Tuple[int, int]]:
+        """
+        Splits the uncompressed GTF into at most range_count consecutive byte ranges. Every range starts at the
+        beginning of a line. If boundary_feature is given, every range starts at a line with this feature, e.g. "gene",
+        so that all lines that belong to a gene end up in the same range.
+
+        :param range_count: Number of ranges that the file is split into at most.
+        :param boundary_feature: Feature of the lines that a range may start with.
+        """
+        boundary_list: List[int] = [0]
+        with open(self.gtf_path, "rb") as raw:
+            for i in range(1, range_count):
+                target: int = self.total_bytes * i // range_count
+                if target <= boundary_list[-1]:
+                    continue
+                # Move to the start of the first line that begins at or after the target.
+                raw.seek(target - 1)
+                raw.readline()
+                position: int = raw.tell()
+                if boundary_feature is not None:
+                    for line in iter(raw.readline, b""):
+                        split_line: List[bytes] = line.split(b"\t", 3)
+                        if len(split_line) > 2 and split_line[2].decode() == boundary_feature:
+                            break
+                        position += len(line)
+                if boundary_list[-1] < position < self.total_bytes:
+                    boundary_list.append(position)
+        boundary_list.append(self.total_bytes)
+        return [(start, end) for start, end in zip(boundary_list[:-1], boundary_list[1:])]
+
+    def iter_range(self, start: int, end: int) -> Iterator[str]:
+        """
+        Streams the lines of an uncompressed GTF that start within the byte range [start, end).
+        """
+        with open(self.gtf_path, "rb") as raw:
+            raw.seek(start)
+            position: int = start
+            for line in raw:
+                if position >= end:
+                    break
+                position += len(line)
+                yield line.decode()
+
+    @staticmethod
+    def is_gzipped(raw: BinaryIO) -> bool:
+        magic: bytes = raw.read(2)
+        raw.seek(0)
+        return magic == GTFBoy.GZIP_MAGIC
+
+    @staticmethod
+    def open_text(raw: BinaryIO) -> TextIO:
+        # bgzip files are multi-member gzip files, which the gzip module reads transparently.
+        if GTFBoy.is_gzipped(raw):
+            return io.TextIOWrapper(gzip.GzipFile(fileobj=raw, mode="rb"))
+        else:
+            return io.TextIOWrapper(raw)
 
     @staticmethod
     def build_attribute_dict(attribute_entry: str) -> Dict[str, str]:
@@ -68,6 +180,14 @@ class GTFBoy:
                     attribute_dict["transcript_support_level"] = pair[1][0]
             else:
                 attribute_dict[pair[0]] = pair[1]
+        attribute_dict["tag"] = GTFBoy.complete_tags(tag_list)
+        if "transcript_support_level" not in attribute_dict.keys():
+            attribute_dict["transcript_support_level"] = "6"
+        return attribute_dict
+
+    @staticmethod
+    def complete_tags(tag_list: List[str]) -> str:
+        tag_list = list(tag_list)
         # Search for tags indicating a 3'/5' incomplete transcript.
         if any([tag in GTFBoy.start_incomplete_tags for tag in tag_list]):
             tag_list.append("start_incomplete")
@@ -77,11 +197,7 @@ class GTFBoy:
             tag_list.append("incomplete")
         else:
             tag_list.append("complete")
-        tag_string = ";".join(tag_list)
-        attribute_dict["tag"] = tag_string
-        if "transcript_support_level" not in attribute_dict.keys():
-            attribute_dict["transcript_support_level"] = "6"
-        return attribute_dict
+        return ";".join(tag_list)
 
     @staticmethod
     def build_dict(gtf_split_line: List[str]) -> Dict[str, str]:
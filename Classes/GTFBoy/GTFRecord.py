@@ -0,0 +1,103 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2023 Christian Bluemel
+#
+# This file is part of Spice.
+#
+#  GTFRecord is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  GTFRecord is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Spice.  If not, see <http://www.gnu.org/licenses/>.
+#
+#######################################################################
+
+from typing import Dict, List, Optional
+
+from Classes.GTFBoy.GTFBoy import GTFBoy
+
+
+class GTFRecord:
+    """
+    A single GTF line that is split into its nine columns exactly once. The attribute column is only decoded when an
+    attribute is requested for the first time and the decoded attributes are cached afterwards.
+    """
+
+    __slots__ = ("fields", "attribute_dict")
+
+    COLUMN_INDEX: Dict[str, int] = {field_name: i for i, field_name in enumerate(GTFBoy.GTF_MASK)}
+
+    def __init__(self, gtf_split_line: List[str], attribute_dict: Optional[Dict[str, str]] = None):
+        self.fields: List[str] = gtf_split_line
+        # Can be handed over already decoded, e.g. by the columnar GTFTable.
+        self.attribute_dict: Optional[Dict[str, str]] = attribute_dict
+
+    @staticmethod
+    def from_line(line: str) -> "GTFRecord":
+        return GTFRecord(line.rstrip("\n").split("\t", 8))
+
+    def __getitem__(self, key: str) -> str:
+        if key in GTFRecord.COLUMN_INDEX and key != "attribute":
+            return self.fields[GTFRecord.COLUMN_INDEX[key]]
+        return self.attributes[key]
+
+    def __contains__(self, key: str) -> bool:
+        if key in GTFRecord.COLUMN_INDEX and key != "attribute":
+            return True
+        return key in self.attributes
+
+    @property
+    def seqname(self) -> str:
+        return self.fields[0]
+
+    @property
+    def feature(self) -> str:
+        return self.fields[2]
+
+    @property
+    def start(self) -> str:
+        return self.fields[3]
+
+    @property
+    def end(self) -> str:
+        return self.fields[4]
+
+    @property
+    def strand(self) -> str:
+        return self.fields[6]
+
+    @property
+    def attributes(self) -> Dict[str, str]:
+        if self.attribute_dict is None:
+            self.attribute_dict = GTFBoy.build_attribute_dict(self.fields[8])
+        return self.attribute_dict
+
+    def has_attribute_value(self, attribute_key: str, attribute_value: str) -> bool:
+        return self.attributes[attribute_key] == attribute_value
+
+    def has_values(self, inclusion_filter_dict: Dict[str, List[str]]) -> bool:
+        # Check the plain columns first. The attribute column is only decoded if a filter key requires it.
+        for key, values in inclusion_filter_dict.items():
+            if key in GTFRecord.COLUMN_INDEX and key != "attribute":
+                if self.fields[GTFRecord.COLUMN_INDEX[key]] not in values:
+                    return False
+        for key, values in inclusion_filter_dict.items():
+            if key not in GTFRecord.COLUMN_INDEX and key in self.attributes:
+                if self.attributes[key] not in values:
+                    return False
+        return True
+
+    def to_dict(self) -> Dict[str, str]:
+        full_dict: Dict[str, str] = dict()
+        for i, field_name in enumerate(GTFBoy.GTF_MASK[:-1]):
+            full_dict[field_name] = self.fields[i]
+        full_dict.update(self.attributes)
+        return full_dict
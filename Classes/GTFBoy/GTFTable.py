@@ -0,0 +1,146 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2023 Christian Bluemel
+#
+# This file is part of Spice.
+#
+#  GTFTable is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  GTFTable is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Spice.  If not, see <http://www.gnu.org/licenses/>.
+#
+#######################################################################
+
+import csv
+import re
+from typing import Dict, List, Optional, Set, Iterator, Any
+
+import pandas
+from tqdm import tqdm
+
+from Classes.GTFBoy.GTFBoy import GTFBoy
+from Classes.GTFBoy.GTFRecord import GTFRecord
+
+
+class GTFTable:
+    """
+    Columnar counterpart of the GTFBoy. The GTF is loaded chunk wise into a pandas DataFrame with one column per GTF
+    field. Attributes are pulled out of the attribute column with vectorized regular expressions that follow the
+    decoding rules of GTFBoy.build_attribute_dict, so filters can be applied as boolean masks instead of line by line.
+    """
+
+    # Number of GTF lines that are parsed per chunk.
+    CHUNK_SIZE: int = 250000
+
+    def __init__(self, gtf_path: str, features: Optional[Set[str]] = None):
+        self.gtf_path: str = gtf_path
+        # Only rows with these features are kept. None keeps all rows.
+        self.features: Optional[Set[str]] = features
+
+    def read(self, desc: str) -> pandas.DataFrame:
+        """
+        Reads the GTF into a DataFrame with the columns of GTFBoy.GTF_MASK. All values are kept as strings. The row index
+        is the position of the row within the file.
+
+        :param desc: Description shown in front of the progress bar.
+        """
+        gtf_boy: GTFBoy = GTFBoy(self.gtf_path)
+        chunk_list: List[pandas.DataFrame] = list()
+        with open(self.gtf_path, "rb") as raw:
+            with GTFBoy.open_text(raw) as f:
+                with tqdm(total=gtf_boy.total_bytes, ncols=100, unit="B", unit_scale=True, desc=desc) as progress_bar:
+                    position: int = 0
+                    for chunk in pandas.read_csv(f, sep="\t", header=None, names=GTFBoy.GTF_MASK, dtype=str,
+                                                 na_filter=False, quoting=csv.QUOTE_NONE, chunksize=GTFTable.CHUNK_SIZE):
+                        chunk = chunk[~chunk["seqname"].str.startswith("#")]
+                        if self.features is not None:
+                            chunk = chunk[chunk["feature"].isin(self.features)]
+                        chunk_list.append(chunk)
+                        new_position: int = raw.tell()
+                        progress_bar.update(new_position - position)
+                        position = new_position
+                    progress_bar.update(gtf_boy.total_bytes - position)
+        if len(chunk_list) == 0:
+            return pandas.DataFrame(columns=GTFBoy.GTF_MASK, dtype=str)
+        return pandas.concat(chunk_list)
+
+    @staticmethod
+    def attribute_pattern(attribute_key: str) -> str:
+        # Like GTFBoy.build_attribute_dict only the first word of a value is kept and the quotes are dropped. The key
+        # comes first so that the regex engine can scan for it as a literal, the lookbehind then rejects keys that
+        # only end with attribute_key.
+        key: str = re.escape(attribute_key)
+        return key + r'(?<!\w' + key + r') "?([^"; ]*)'
+
+    @staticmethod
+    def extract_attribute(attribute_column: pandas.Series, attribute_key: str) -> pandas.Series:
+        """
+        Returns the value of attribute_key for each row. Rows without the attribute are NaN.
+        """
+        if attribute_key == "tag":
+            return GTFTable.extract_tags(attribute_column)
+        elif attribute_key == "transcript_support_level":
+            return GTFTable.extract_support_level(attribute_column)
+        return attribute_column.str.extract(GTFTable.attribute_pattern(attribute_key), expand=False)
+
+    @staticmethod
+    def extract_tags(attribute_column: pandas.Series) -> pandas.Series:
+        tag_column: pandas.Series = attribute_column.str.findall(GTFTable.attribute_pattern("tag")).str.join(";")
+        # There are only few distinct tag combinations, so the completeness tags are added once per combination.
+        completed_tags: Dict[str, str] = {tags: GTFBoy.complete_tags(tags.split(";") if tags else [])
+                                          for tags in tag_column.unique()}
+        return tag_column.map(completed_tags)
+
+    @staticmethod
+    def extract_support_level(attribute_column: pandas.Series) -> pandas.Series:
+        support_column: pandas.Series = attribute_column.str.extract(
+            GTFTable.attribute_pattern("transcript_support_level"), expand=False).str[0]
+        return support_column.where(support_column.notna() & (support_column != "N"), "6")
+
+    @staticmethod
+    def mask(frame: pandas.DataFrame, inclusion_filter_dict: Dict[str, List[str]]) -> pandas.Series:
+        """
+        Vectorized version of GTFRecord.has_values. Attribute filters only apply to rows that carry the attribute.
+        Attributes that were already added as columns are reused.
+        """
+        mask: pandas.Series = pandas.Series(True, index=frame.index)
+        for key, values in inclusion_filter_dict.items():
+            if key in GTFBoy.GTF_MASK[:-1]:
+                mask &= frame[key].isin(values)
+            else:
+                if key in frame.columns:
+                    attribute_values: pandas.Series = frame[key]
+                else:
+                    attribute_values: pandas.Series = GTFTable.extract_attribute(frame["attribute"], key)
+                mask &= attribute_values.isna() | attribute_values.isin(values)
+        return mask
+
+    @staticmethod
+    def add_attribute_columns(frame: pandas.DataFrame, attribute_keys: List[str]) -> pandas.DataFrame:
+        frame = frame.copy()
+        for attribute_key in attribute_keys:
+            if attribute_key not in frame.columns:
+                frame[attribute_key] = GTFTable.extract_attribute(frame["attribute"], attribute_key)
+        return frame
+
+    @staticmethod
+    def iter_records(frame: pandas.DataFrame, attribute_keys: List[str]) -> Iterator[GTFRecord]:
+        """
+        Turns the rows of a frame that went through add_attribute_columns into GTFRecords with already decoded
+        attributes. Attributes that are missing in a row are left out of its attribute dict.
+        """
+        field_columns: List[List[str]] = [frame[field_name].tolist() for field_name in GTFBoy.GTF_MASK]
+        attribute_columns: List[List[Any]] = [frame[attribute_key].tolist() for attribute_key in attribute_keys]
+        for fields, attribute_values in zip(zip(*field_columns), zip(*attribute_columns)):
+            attribute_dict: Dict[str, str] = {key: value for key, value in zip(attribute_keys, attribute_values)
+                                              if isinstance(value, str)}
+            yield GTFRecord(list(fields), attribute_dict)
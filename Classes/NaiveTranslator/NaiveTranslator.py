@@ -37,13 +37,11 @@ STANDARD: Dict[str, str] = {"TTT": "F", "TTC": "F", "TTA": "L", "TTG": "L", "TCT
 
 
 INVERT: Dict[str, str] = {"G": "C", "C": "G", "A": "T", "T": "A"}
+INVERT_TABLE: Dict[int, int] = str.maketrans(INVERT)
 
 
 def seq_inverter(sequence: str):
-    new_seq: str = ""
-    for char in sequence:
-        new_seq += INVERT[char]
-    return new_seq[::-1]
+    return sequence.translate(INVERT_TABLE)[::-1]
 
 
 class NaiveTranslator:
@@ -100,9 +98,7 @@ class NaiveTranslator:
 
     def __translate(self):
         codon_count: int = len(self.orf) // 3
-        for codon in range(codon_count):
-            i: int = codon * 3
-            self.peptide += self.translation_dict[self.orf[i:i+3]]
+        self.peptide = "".join([self.translation_dict[self.orf[i:i+3]] for i in range(0, codon_count * 3, 3)])
 
     def __identify_frame(self) -> None:
         start_index_list: List[int] = list()
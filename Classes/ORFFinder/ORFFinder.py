@@ -0,0 +1,244 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2023 Christian Bluemel
+#
+# This file is part of Spice.
+#
+#  ORFFinder is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  ORFFinder is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Spice.  If not, see <http://www.gnu.org/licenses/>.
+#
+#######################################################################
+
+from typing import Dict, List, Iterator, Tuple
+
+import numpy as np
+
+from Classes.NaiveTranslator.NaiveTranslator import STANDARD
+
+
+class ORFFinder:
+    """
+    Batch six-frame ORF finder. All sequences of a batch are encoded into one NumPy array per strand, separated by a
+    sentinel base. Every position is turned into a codon code that is translated through a lookup table, so start and
+    stop codons of all sequences and frames are found at once. Each start is paired with the next stop of its frame
+    with a single searchsorted, and only the first start after a stop is kept, which yields the longest ORF per stop.
+
+    Like TransDecoder.LongOrfs, an ORF begins with a start codon and is either 'complete' (ends with a stop codon) or
+    '3prime_partial' (runs into the end of the transcript).
+    """
+
+    BASES: str = "ACGT"
+    # Code of every character that is not A, C, G or T. It also separates the sequences of a batch.
+    SENTINEL: int = 4
+    CODON_BASE: int = 5
+
+    # Default minimal ORF length in amino acids, the default of TransDecoder.LongOrfs.
+    MIN_PROTEIN_LENGTH: int = 100
+
+    def __init__(self,
+                 min_protein_length: int = MIN_PROTEIN_LENGTH,
+                 start_codons=None,
+                 translation_dict=None):
+        if start_codons is None:
+            start_codons = ["ATG"]
+        if translation_dict is None:
+            translation_dict = STANDARD
+        self.min_protein_length: int = min_protein_length
+
+        # Lookup tables from ASCII to base code and from base code to its complement.
+        self.base_table: np.ndarray = np.full(256, ORFFinder.SENTINEL, dtype=np.uint8)
+        for i, base in enumerate(ORFFinder.BASES):
+            self.base_table[ord(base)] = i
+            self.base_table[ord(base.lower())] = i
+        self.base_table[ord("U")] = self.base_table[ord("T")]
+        self.base_table[ord("u")] = self.base_table[ord("T")]
+        self.complement_table: np.ndarray = np.array([3, 2, 1, 0, ORFFinder.SENTINEL], dtype=np.uint8)
+
+        # Lookup tables from codon code to amino acid, stop flag and start flag. Codons with an unknown base become X.
+        codon_count: int = ORFFinder.CODON_BASE ** 3
+        self.amino_acid_table: np.ndarray = np.full(codon_count, ord("X"), dtype=np.uint8)
+        self.stop_table: np.ndarray = np.zeros(codon_count, dtype=bool)
+        self.start_table: np.ndarray = np.zeros(codon_count, dtype=bool)
+        for codon, amino_acid in translation_dict.items():
+            code: int = ORFFinder.codon_code(codon)
+            self.amino_acid_table[code] = ord(amino_acid)
+            self.stop_table[code] = amino_acid == "*"
+        for codon in start_codons:
+            self.start_table[ORFFinder.codon_code(codon)] = True
+
+    @staticmethod
+    def codon_code(codon: str) -> int:
+        return sum(ORFFinder.BASES.index(base) * ORFFinder.CODON_BASE ** (2 - i) for i, base in enumerate(codon))
+
+    def encode(self, sequence_list: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Concatenates the sequences into one base code array, each followed by a sentinel.
+
+        :return: The code array, the start offset and the length of every sequence.
+        """
+        joined: bytes = "\0".join(sequence_list).encode("ascii", "replace") + b"\0"
+        codes: np.ndarray = self.base_table[np.frombuffer(joined, dtype=np.uint8)]
+        lengths: np.ndarray = np.array([len(sequence) for sequence in sequence_list], dtype=np.int64)
+        offsets: np.ndarray = np.zeros(len(sequence_list), dtype=np.int64)
+        offsets[1:] = np.cumsum(lengths + 1)[:-1]
+        return codes, offsets, lengths
+
+    def find_orfs(self, sequence_list: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Finds the ORFs of all sequences in all six frames.
+
+        :param sequence_list: Nucleotide sequences, e.g. transcripts.
+        :return: Arrays with one entry per ORF:
+         'sequence_index' - index of the sequence in sequence_list,
+         'strand' - '+' or '-',
+         'start', 'end' - 1-based position of the first and last base of the ORF (including the stop codon) on the
+          forward strand of the sequence. On the '-' strand start is larger than end, like in TransDecoder headers.
+         'orf_type' - 'complete' or '3prime_partial',
+         'peptide' - translated ORF, complete ORFs end with '*'.
+        """
+        codes, offsets, lengths = self.encode(sequence_list)
+        # The reverse complement of the concatenation holds the reverse complements of all sequences in reverse order.
+        reverse_codes: np.ndarray = self.complement_table[codes[::-1]]
+        reverse_offsets: np.ndarray = len(codes) - offsets - lengths
+        sequence_count: int = len(sequence_list)
+
+        result_list: List[Dict[str, np.ndarray]] = list()
+        for strand, strand_codes, strand_offsets, sequence_order in [("+", codes, offsets,
+                                                                      np.arange(sequence_count)),
+                                                                     ("-", reverse_codes, reverse_offsets[::-1],
+                                                                      np.arange(sequence_count)[::-1])]:
+            # On the '-' strand the sequences appear in reverse order.
+            strand_lengths: np.ndarray = lengths[sequence_order]
+            orf_dict: Dict[str, np.ndarray] = self.find_strand_orfs(strand_codes, strand_offsets, strand_lengths)
+            orf_dict["sequence_index"] = sequence_order[orf_dict["sequence_index"]]
+            sequence_length: np.ndarray = lengths[orf_dict["sequence_index"]]
+            if strand == "+":
+                orf_dict["start"], orf_dict["end"] = orf_dict["first"] + 1, orf_dict["last"]
+            else:
+                orf_dict["start"], orf_dict["end"] = sequence_length - orf_dict["first"], \
+                    sequence_length - orf_dict["last"] + 1
+            orf_dict["strand"] = np.full(len(orf_dict["first"]), strand)
+            del orf_dict["first"]
+            del orf_dict["last"]
+            result_list.append(orf_dict)
+
+        output: Dict[str, np.ndarray] = dict()
+        for key in result_list[0].keys():
+            output[key] = np.concatenate([orf_dict[key] for orf_dict in result_list])
+        # Sort by sequence and strand, longest ORF first.
+        order: np.ndarray = np.lexsort((-np.abs(output["end"] - output["start"]),
+                                        output["strand"] == "-",
+                                        output["sequence_index"]))
+        return {key: value[order] for key, value in output.items()}
+
+    def find_strand_orfs(self, codes: np.ndarray, offsets: np.ndarray, lengths: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Finds the ORFs of the three frames of one strand. Positions are 0-based within each sequence, 'last' is
+        exclusive.
+        """
+        if len(codes) < 3:
+            return ORFFinder.empty_orfs()
+        codon_codes: np.ndarray = (codes[:-2].astype(np.int16) * ORFFinder.CODON_BASE ** 2
+                                   + codes[1:-1].astype(np.int16) * ORFFinder.CODON_BASE + codes[2:])
+        amino_acids: np.ndarray = self.amino_acid_table[codon_codes]
+
+        # Only the positions of start and stop codons are needed. Keys sort them by frame group of their sequence first
+        # and by position second, every sequence has three groups.
+        key_base: int = len(codes) + 1
+        start_keys: np.ndarray = self.group_keys(np.flatnonzero(self.start_table[codon_codes]), offsets, key_base)
+        stop_positions: np.ndarray = np.flatnonzero(self.stop_table[codon_codes])
+        # The end of every group is a sentinel stop, so every start finds a stop within its own group.
+        group_count: int = len(offsets) * 3
+        sentinel_keys: np.ndarray = np.arange(group_count, dtype=np.int64) * key_base + (key_base - 1)
+        stop_keys: np.ndarray = np.concatenate([self.group_keys(stop_positions, offsets, key_base), sentinel_keys])
+        stop_is_real: np.ndarray = np.concatenate([np.ones(len(stop_positions), dtype=bool),
+                                                   np.zeros(group_count, dtype=bool)])
+        stop_order: np.ndarray = np.argsort(stop_keys, kind="stable")
+        stop_keys = stop_keys[stop_order]
+        stop_is_real = stop_is_real[stop_order]
+        start_keys.sort()
+
+        # The next stop of every start. Only the first start before each stop opens the longest ORF.
+        next_stop: np.ndarray = np.searchsorted(stop_keys, start_keys)
+        _, first_start = np.unique(next_stop, return_index=True)
+        start_keys = start_keys[first_start]
+        next_stop = next_stop[first_start]
+
+        orf_group: np.ndarray = start_keys // key_base
+        orf_sequence: np.ndarray = orf_group // 3
+        first: np.ndarray = start_keys % key_base - offsets[orf_sequence]
+        complete: np.ndarray = stop_is_real[next_stop]
+        sequence_length: np.ndarray = lengths[orf_sequence]
+        # Complete ORFs end behind their stop codon, partial ones with the last full codon of the sequence.
+        last: np.ndarray = np.where(complete,
+                                    stop_keys[next_stop] % key_base - offsets[orf_sequence] + 3,
+                                    sequence_length - (sequence_length - first) % 3)
+        protein_length: np.ndarray = (last - first) // 3 - complete
+        keep: np.ndarray = protein_length >= self.min_protein_length
+        first, last, complete, orf_sequence = first[keep], last[keep], complete[keep], orf_sequence[keep]
+
+        peptide_list: List[str] = list()
+        for sequence_start, peptide_end in zip(offsets[orf_sequence] + first, offsets[orf_sequence] + last):
+            peptide_list.append(amino_acids[sequence_start:peptide_end:3].tobytes().decode())
+        return {"sequence_index": orf_sequence,
+                "first": first,
+                "last": last,
+                "orf_type": np.where(complete, "complete", "3prime_partial"),
+                "peptide": np.array(peptide_list, dtype=object)}
+
+    @staticmethod
+    def group_keys(positions: np.ndarray, offsets: np.ndarray, key_base: int) -> np.ndarray:
+        sequence_index: np.ndarray = np.searchsorted(offsets, positions, side="right") - 1
+        frame: np.ndarray = (positions - offsets[sequence_index]) % 3
+        return (sequence_index * 3 + frame) * key_base + positions
+
+    @staticmethod
+    def empty_orfs() -> Dict[str, np.ndarray]:
+        return {"sequence_index": np.empty(0, dtype=np.int64),
+                "first": np.empty(0, dtype=np.int64),
+                "last": np.empty(0, dtype=np.int64),
+                "orf_type": np.empty(0, dtype="<U14"),
+                "peptide": np.empty(0, dtype=object)}
+
+    @staticmethod
+    def iter_fasta(fasta_path: str) -> Iterator[Tuple[str, str]]:
+        """
+        Yields (identifier, sequence) of a nucleotide FASTA. The identifier is the first word of the header.
+        """
+        identifier: str = ""
+        sequence_list: List[str] = list()
+        with open(fasta_path, "r") as f:
+            for line in f:
+                if line.startswith(">"):
+                    if identifier:
+                        yield identifier, "".join(sequence_list)
+                    identifier = line[1:].split()[0] if len(line[1:].split()) > 0 else ""
+                    sequence_list = list()
+                else:
+                    sequence_list.append(line.strip())
+        if identifier:
+            yield identifier, "".join(sequence_list)
+
+    @staticmethod
+    def make_transdecoder_entry(identifier: str, orf_number: int, orf_type: str,
+                                start: int, end: int, strand: str, peptide: str) -> str:
+        """
+        Formats an ORF like a TransDecoder.LongOrfs pep entry, so it can be read by the TransDecoderFastaBoy.
+        """
+        header: str = " ".join([">" + identifier + ".p" + str(orf_number),
+                                "type:" + orf_type,
+                                "len:" + str(len(peptide.rstrip("*"))),
+                                "gc:universal",
+                                identifier + ":" + str(start) + "-" + str(end) + "(" + strand + ")"])
+        return header + "\n" + peptide + "\n"
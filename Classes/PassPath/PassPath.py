@@ -29,6 +29,9 @@ class PassPath:
     def __init__(self, path_dict: Dict[str, str]):
         self.path_dict: Dict[str, str] = path_dict
 
+    def __contains__(self, item: str) -> bool:
+        return item in self.path_dict
+
     def __getitem__(self, item: str) -> str:
         if item == "root":
             return self.path_dict["root"]
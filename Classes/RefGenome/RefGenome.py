@@ -20,39 +20,31 @@
 #
 #######################################################################
 
-from typing import Iterator, List
+from typing import Iterator
+
+from Classes.FastaBoy.FastaBoy import IndexedFastaBoy
 
 
 class RefGenome:
 
     def __init__(self, genome_path: str):
         self.path = genome_path
+        # The faidx index next to the genome is built on first use, afterwards every lookup is a direct slice.
+        self.fasta_index: IndexedFastaBoy = IndexedFastaBoy(genome_path)
 
     def __iter__(self) -> Iterator[str]:
         with open(self.path, "r") as f:
             for line in f:
                 yield line
 
-    def get_sequence(self, chromosome: str, start: int, end: int) -> str:
-        sequence: str = ""
-        start_found: bool = False
-        end_found: bool = False
-        found_flag: bool = False
-        for line in self:
-            if end_found:
-                break
-            elif start_found:
-                pass
-            if found_flag:
-                if start - len(line) < 0:
-                    pass
+    def close(self) -> None:
+        self.fasta_index.close()
 
-            else:
-                if line.startswith(">"):
-                    split_line: List[str] = line[1:].split(" ")
-                    if chromosome in split_line:
-                        found_flag: bool = True
-        return sequence
+    def get_sequence(self, chromosome: str, start: int, end: int) -> str:
+        """
+        Returns the forward strand sequence of the chromosome between start and end, both 1-based and inclusive.
+        """
+        return self.fasta_index.fetch(chromosome, start, end)
 
 
 def main():
@@ -27,6 +27,7 @@ import math
 import os
 from Classes.PassPath.PassPath import PassPath
 from Classes.ResultBuddy.EWFDHandling.EWFDAssembler import EWFDAssembler
+from Classes.SequenceHandling.FASMatrix import FASMatrix
 
 
 class ComparisonGene:
@@ -35,7 +36,7 @@ class ComparisonGene:
                  data_dict_1: Dict[str, List[Any]],
                  data_dict_2: Dict[str, List[Any]],
                  biotype_filter: List[str], tag_filter: List[str],
-                 fas_adjacency_matrix: Dict[str, Dict[str, float]]):
+                 fas_adjacency_matrix: FASMatrix):
         self.gene_id = gene_id
 
         self.rmsd: float = 0.0
@@ -94,7 +95,7 @@ class ComparisonGene:
         return output
 
     @staticmethod
-    def recalculate_ewfd(data_dict: Dict[str, List[Any]], fas_adjacency_matrix: Dict[str, Dict[str, float]]):
+    def recalculate_ewfd(data_dict: Dict[str, List[Any]], fas_adjacency_matrix: FASMatrix):
         return EWFDAssembler.calculate_ewfd(fas_adjacency_matrix,
                                             data_dict["expression_rel_avg"],
                                             data_dict["ids"])
@@ -174,7 +175,7 @@ class ComparisonAssembler:
 
         for gene_id in data_cond_1.keys():
             with open(os.path.join(self.fas_scores_directory, self.fas_index[gene_id]), "r") as f:
-                fas_adjacency_matrix: Dict[str, Dict[str, float]] = json.load(f)[gene_id]
+                fas_adjacency_matrix: FASMatrix = FASMatrix.from_dict(json.load(f)[gene_id])
             self.comparison_gene_list.append(ComparisonGene(gene_id,
                                                             data_cond_1[gene_id],
                                                             data_cond_2[gene_id],
@@ -30,6 +30,7 @@ from Classes.PassPath.PassPath import PassPath
 from Classes.ResultBuddy.ExpressionHandling.ConditionAssembler import ConditionAssembler
 from Classes.ResultBuddy.ExpressionHandling.ExpressionAssembler import ExpressionAssembler
 from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+from Classes.SequenceHandling.FASMatrix import FASMatrix
 
 
 class EWFDAssembler:
@@ -55,12 +56,12 @@ class EWFDAssembler:
                 self.ewfd_assembly["data"]: Dict[str, Dict[str, Any]] = dict()
 
                 gene_assembler: GeneAssembler = GeneAssembler(species, str(taxon_id))
-                gene_assembler.load(self.library_pass_path)
-                fas_dist_matrix: Dict[str, Dict[str, Dict[str, float]]] = gene_assembler.get_fas_dist_matrix()
+                gene_assembler.load(self.library_pass_path, ["info", "fas"])
+                fas_dist_matrix: Dict[str, FASMatrix] = gene_assembler.get_fas_dist_matrix()
                 condition_data: Dict[str, Any] = condition_assembler.condition_assembly["data"]
 
                 for gene_id in condition_data.keys():
-                    gene_dist_matrix: Dict[str, Dict[str, float]] = fas_dist_matrix[gene_id]
+                    gene_dist_matrix: FASMatrix = fas_dist_matrix[gene_id]
                     self.ewfd_assembly["data"][gene_id]: Dict[str, Any] = dict()
                     transcript_ids: List[str] = condition_data[gene_id]["ids"]
                     self.ewfd_assembly["data"][gene_id]["ids"]: List[str] = transcript_ids
@@ -130,12 +131,12 @@ class EWFDAssembler:
                 self.ewfd_assembly["data"]: Dict[str, Dict[str, Any]] = dict()
 
                 gene_assembler: GeneAssembler = GeneAssembler(species, str(taxon_id))
-                gene_assembler.load(self.library_pass_path)
-                fas_dist_matrix: Dict[str, Dict[str, Dict[str, float]]] = gene_assembler.get_fas_dist_matrix()
+                gene_assembler.load(self.library_pass_path, ["info", "fas"])
+                fas_dist_matrix: Dict[str, FASMatrix] = gene_assembler.get_fas_dist_matrix()
                 expression_data: Dict[str, Any] = expression_assembler.expression_assembly["data"]
 
                 for gene_id in expression_data.keys():
-                    gene_dist_matrix: Dict[str, Dict[str, float]] = fas_dist_matrix[gene_id]
+                    gene_dist_matrix: FASMatrix = fas_dist_matrix[gene_id]
                     self.ewfd_assembly["data"][gene_id]: Dict[str, Any] = dict()
                     transcript_ids: List[str] = expression_data[gene_id]["ids"]
                     self.ewfd_assembly["data"][gene_id]["ids"]: List[str] = transcript_ids
@@ -166,15 +167,15 @@ class EWFDAssembler:
             self.ewfd_assembly = json.load(f)
 
     @staticmethod
-    def calculate_ewfd(gene_fas_dists: Dict[str, Dict[str, float]],
+    def calculate_ewfd(gene_fas_dists: FASMatrix,
                        rel_expressions: List[float],
                        transcript_ids: List[str]) -> List[float]:
-        ewfd_list: List[float] = [0.0] * len(transcript_ids)
-        # This calculates the movement.
-        for s, seed_id in enumerate(transcript_ids):
-            for q, query_id in enumerate(transcript_ids):
-                ewfd_list[s] += round(rel_expressions[q] * (1 - gene_fas_dists[seed_id][query_id]), 4)
+        if len(transcript_ids) == 0:
+            return list()
+        fas_block: np.ndarray = gene_fas_dists.get_block(transcript_ids)
+        # This calculates the movement. Row s holds the contribution of every query transcript to seed transcript s.
+        movement: np.ndarray = np.round(np.asarray(rel_expressions, dtype=np.float64) * (1 - fas_block), 4)
 
         # ewfd_list = [round(1 - movement, 4) for movement in ewfd_list]
 
-        return ewfd_list
+        return movement.sum(axis=1).tolist()
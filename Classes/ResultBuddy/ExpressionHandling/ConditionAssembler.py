@@ -21,14 +21,12 @@
 #######################################################################
 
 import json
-import os
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 from Classes.PassPath.PassPath import PassPath
 from Classes.ResultBuddy.ExpressionHandling.ExpressionAssembler import ExpressionAssembler
-from Classes.SequenceHandling.Gene import Gene
-from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+from Classes.SequenceHandling.IDIndex import IDIndex
 
 
 class ConditionAssembler:
@@ -36,7 +34,10 @@ class ConditionAssembler:
     def __init__(self,
                  library_pass_path: PassPath,
                  condition_name: str = "",
-                 initial_flag: bool = False):
+                 initial_flag: bool = False,
+                 id_index: Optional[IDIndex] = None):
+        # Running sums of expression_rel_all per gene. Built on first use, they are not part of the saved assembly.
+        self.rel_expr_sums: Dict[str, List[float]] = dict()
         if initial_flag:
             self.library_pass_path: PassPath = library_pass_path
             self.condition_assembly: Dict[str, Any] = dict()
@@ -46,8 +47,9 @@ class ConditionAssembler:
             self.condition_assembly["replicates"]: List[str] = list()
             self.condition_assembly["replicate_count"]: int = 0
             self.condition_assembly["data"]: Dict[str, Dict[str, Any]] = dict()
-            gene_assembly: Dict[str, Gene] = self.__load_gene_assembly()
-            for gene_id in gene_assembly.keys():
+            if id_index is None:
+                id_index = IDIndex.load(library_pass_path)
+            for gene_id, transcript_ids in id_index.iter_genes():
                 self.condition_assembly["data"][gene_id]: Dict[str, List[Any]] = dict()
                 self.condition_assembly["data"][gene_id]["ids"]: List[str] = list()
                 self.condition_assembly["data"][gene_id]["synonyms"]: List[List[str]] = list()
@@ -57,14 +59,14 @@ class ConditionAssembler:
                 self.condition_assembly["data"][gene_id]["expression_rel_avg"]: List[float] = list()
                 self.condition_assembly["data"][gene_id]["expression_rel_all"]: List[List[float]] = list()
                 self.condition_assembly["data"][gene_id]["expression_all"]: List[List[float]] = list()
-                for transcript in gene_assembly[gene_id].get_transcripts():
-                    self.condition_assembly["data"][gene_id]["ids"].append(transcript.get_id())
-                    self.condition_assembly["data"][gene_id]["synonyms"].append(transcript.get_synonyms())
-                    biotype: str = transcript.get_biotype()
+                for transcript_id in transcript_ids:
+                    _, protein_id, biotype, tsl, tags, synonyms = id_index[transcript_id]
+                    # Proteins are listed by their protein id.
+                    self.condition_assembly["data"][gene_id]["ids"].append(protein_id or transcript_id)
+                    self.condition_assembly["data"][gene_id]["synonyms"].append(synonyms)
                     self.condition_assembly["data"][gene_id]["biotypes"].append(biotype)
-                    tsl: int = transcript.get_transcript_support_level()
                     self.condition_assembly["data"][gene_id]["transcript_support_levels"].append(tsl)
-                    self.condition_assembly["data"][gene_id]["tags"].append(transcript.get_tags())
+                    self.condition_assembly["data"][gene_id]["tags"].append(tags)
                     self.condition_assembly["data"][gene_id]["expression_rel_avg"].append(1.0)
                     self.condition_assembly["data"][gene_id]["expression_rel_all"].append([])
                     self.condition_assembly["data"][gene_id]["expression_all"].append([])
@@ -85,22 +87,30 @@ class ConditionAssembler:
     def load(self, input_path: str):
         with open(input_path, "r") as f:
             self.condition_assembly = json.load(f)
+        self.rel_expr_sums = dict()
+
+    def get_rel_expr_sums(self, gene_id: str) -> List[float]:
+        if gene_id not in self.rel_expr_sums:
+            self.rel_expr_sums[gene_id] = [sum(rel_expr_all) for rel_expr_all
+                                           in self.condition_assembly["data"][gene_id]["expression_rel_all"]]
+        return self.rel_expr_sums[gene_id]
 
     def insert_expression(self, expression_assembler: ExpressionAssembler):
         expr_assembly: Dict[str, Any] = expression_assembler.expression_assembly
         self.condition_assembly["replicates"].append(expr_assembly["name"])
         self.condition_assembly["replicate_count"] += 1
+        repl_count: int = self.condition_assembly["replicate_count"]
         for gene_id in self.condition_assembly["data"].keys():
             if gene_id in expr_assembly["data"].keys():
                 gene_found_flag: bool = True
+                positions: Dict[str, int] = expression_assembler.get_positions(gene_id)
             else:
                 gene_found_flag: bool = False
+                positions: Dict[str, int] = dict()
+            rel_expr_sums: List[float] = self.get_rel_expr_sums(gene_id)
             for i, transcript_id in enumerate(self.condition_assembly["data"][gene_id]["ids"]):
-                if not gene_found_flag:
-                    expr_value = 0.0
-                    rel_expr_value = 0.0
-                elif transcript_id in expr_assembly["data"][gene_id]["ids"]:
-                    index: int = expr_assembly["data"][gene_id]["ids"].index(transcript_id)
+                if gene_found_flag and transcript_id in positions:
+                    index: int = positions[transcript_id]
                     rel_expr_value = expr_assembly["data"][gene_id]["expression_rel"][index]
                     expr_value = expr_assembly["data"][gene_id]["expression"][index]
                 else:
@@ -111,49 +121,20 @@ class ConditionAssembler:
                 self.condition_assembly["data"][gene_id]["expression_rel_all"][i].append(rel_expr_value)
                 self.condition_assembly["data"][gene_id]["expression_all"][i].append(expr_value)
 
-                rel_expr_all: List[float] = self.condition_assembly["data"][gene_id]["expression_rel_all"][i]
-                rel_expr_sum: float = sum(rel_expr_all)
-                repl_count: int = self.condition_assembly["replicate_count"]
-
-                # Calculate the average relative expression.
-                rel_expr_avg: float = rel_expr_sum / repl_count
-                self.condition_assembly["data"][gene_id]["expression_rel_avg"][i] = rel_expr_avg
-
-    def __load_gene_assembly(self) -> Dict[str, Gene]:
-        with open(self.library_pass_path["transcript_info"], "r") as f:
-            info_dict: Dict[str, Dict[str, Any]] = json.load(f)
-        with open(self.library_pass_path["transcript_seq"], "r") as f:
-            seq_dict: Dict[str, Dict[str, Any]] = json.load(f)
-        fas_dict: Dict[str, Dict[str, Any]] = dict()
-        with open(self.library_pass_path["fas_index"], "r") as f1:
-            fas_index: Dict[str, str] = json.load(f1)
-            for path in set(fas_index.values()):
-                with open(os.path.join(self.library_pass_path["fas_scores"], path), "r") as f2:
-                    fas_sub_dict: Dict[str, Dict[str, Any]] = json.load(f2)
-                    fas_dict.update(fas_sub_dict)
-        gene_assembly: Dict[str, Gene] = GeneAssembler.from_dict(info_dict, seq_dict, fas_dict)
-        return gene_assembly
+                # Calculate the average relative expression. The running sum adds up the values in the same order as
+                # sum over expression_rel_all.
+                rel_expr_sums[i] += rel_expr_value
+                self.condition_assembly["data"][gene_id]["expression_rel_avg"][i] = rel_expr_sums[i] / repl_count
 
     def cleanse_assembly(self):
-        cleanse_dict: Dict[str, List[str]] = dict()
-        for gene_id in self.condition_assembly["data"].keys():
-            cleanse_dict[gene_id] = list()
-            id_list: List[str] = self.condition_assembly["data"][gene_id]["ids"]
-            for index, transcript_id in enumerate(id_list):
-                if self.condition_assembly["data"][gene_id]["expression_rel_avg"][index] == 0.0:
-                    cleanse_dict[gene_id].append(transcript_id)
-        for gene_id in cleanse_dict.keys():
-            for transcript_id in cleanse_dict[gene_id]:
-                id_list: List[str] = self.condition_assembly["data"][gene_id]["ids"]
-                index: int = id_list.index(transcript_id)
-                self.condition_assembly["data"][gene_id]["ids"].pop(index)
-                self.condition_assembly["data"][gene_id]["synonyms"].pop(index)
-                self.condition_assembly["data"][gene_id]["biotypes"].pop(index)
-                self.condition_assembly["data"][gene_id]["transcript_support_levels"].pop(index)
-                self.condition_assembly["data"][gene_id]["tags"].pop(index)
-                self.condition_assembly["data"][gene_id]["expression_rel_avg"].pop(index)
-                self.condition_assembly["data"][gene_id]["expression_rel_all"].pop(index)
-                self.condition_assembly["data"][gene_id]["expression_all"].pop(index)
-
-            if len(self.condition_assembly["data"][gene_id]["ids"]) == 0:
+        for gene_id in list(self.condition_assembly["data"].keys()):
+            gene_data: Dict[str, List[Any]] = self.condition_assembly["data"][gene_id]
+            keep_list: List[int] = [index for index, rel_expr_avg in enumerate(gene_data["expression_rel_avg"])
+                                    if rel_expr_avg != 0.0]
+            for key in ["ids", "synonyms", "biotypes", "transcript_support_levels", "tags",
+                        "expression_rel_avg", "expression_rel_all", "expression_all"]:
+                gene_data[key] = [gene_data[key][index] for index in keep_list]
+
+            if len(gene_data["ids"]) == 0:
                 del self.condition_assembly["data"][gene_id]
+        self.rel_expr_sums = dict()
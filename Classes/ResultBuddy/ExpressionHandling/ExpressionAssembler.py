@@ -23,14 +23,12 @@
 import json
 import os
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 from tqdm import tqdm
 
 from Classes.PassPath.PassPath import PassPath
-from Classes.SequenceHandling.Gene import Gene
-from Classes.SequenceHandling.GeneAssembler import GeneAssembler
-from Classes.SequenceHandling.Transcript import Transcript
+from Classes.SequenceHandling.IDIndex import IDIndex
 
 
 class ExpressionAssembler:
@@ -41,7 +39,10 @@ class ExpressionAssembler:
                  origin_path: str = "",
                  normalization: str = "",
                  initial_flag: bool = False,
-                 expression_threshold: float = 1.0):
+                 expression_threshold: float = 1.0,
+                 id_index: Optional[IDIndex] = None):
+        # Position of every id in the lists of its gene. Built on first use, it is not part of the saved assembly.
+        self.positions: Dict[str, Dict[str, int]] = dict()
         if initial_flag:
             self.library_pass_path: PassPath = library_pass_path
             self.expression_assembly: Dict[str, Any] = dict()
@@ -51,8 +52,9 @@ class ExpressionAssembler:
             self.expression_assembly["normalization"] = normalization
             self.expression_assembly["expression_threshold"] = expression_threshold
             self.expression_assembly["data"]: Dict[str, Dict[str, Any]] = dict()
-            gene_assembly: Dict[str, Gene] = self.__load_gene_assembly()
-            for gene_id in gene_assembly.keys():
+            if id_index is None:
+                id_index = IDIndex.load(library_pass_path)
+            for gene_id, transcript_ids in id_index.iter_genes():
                 self.expression_assembly["data"][gene_id]: Dict[str, Any] = dict()
                 self.expression_assembly["data"][gene_id]["ids"]: List[str] = list()
                 self.expression_assembly["data"][gene_id]["synonyms"]: List[List[str]] = list()
@@ -61,14 +63,14 @@ class ExpressionAssembler:
                 self.expression_assembly["data"][gene_id]["tags"]: List[List[str]] = list()
                 self.expression_assembly["data"][gene_id]["expression"]: List[float] = list()
                 self.expression_assembly["data"][gene_id]["expression_rel"]: List[float] = list()
-                for transcript in gene_assembly[gene_id].get_transcripts():
-                    self.expression_assembly["data"][gene_id]["ids"].append(transcript.get_id())
-                    self.expression_assembly["data"][gene_id]["synonyms"].append(transcript.get_synonyms())
-                    biotype: str = transcript.get_biotype()
+                for transcript_id in transcript_ids:
+                    _, protein_id, biotype, tsl, tags, synonyms = id_index[transcript_id]
+                    # Proteins are listed by their protein id.
+                    self.expression_assembly["data"][gene_id]["ids"].append(protein_id or transcript_id)
+                    self.expression_assembly["data"][gene_id]["synonyms"].append(synonyms)
                     self.expression_assembly["data"][gene_id]["biotypes"].append(biotype)
-                    tsl: int = transcript.get_transcript_support_level()
                     self.expression_assembly["data"][gene_id]["transcript_support_levels"].append(tsl)
-                    self.expression_assembly["data"][gene_id]["tags"].append(transcript.get_tags())
+                    self.expression_assembly["data"][gene_id]["tags"].append(tags)
                     self.expression_assembly["data"][gene_id]["expression"].append(0.0)
                     self.expression_assembly["data"][gene_id]["expression_rel"].append(0.0)
         else:
@@ -84,20 +86,13 @@ class ExpressionAssembler:
     def __len__(self) -> int:
         return len(self.expression_assembly["data"])
 
-    def __load_gene_assembly(self) -> Dict[str, Gene]:
-        with open(self.library_pass_path["transcript_info"], "r") as f:
-            info_dict: Dict[str, Dict[str, Any]] = json.load(f)
-        with open(self.library_pass_path["transcript_seq"], "r") as f:
-            seq_dict: Dict[str, Dict[str, Any]] = json.load(f)
-        fas_dict: Dict[str, Dict[str, Any]] = dict()
-        with open(self.library_pass_path["fas_index"], "r") as f1:
-            fas_index: Dict[str, str] = json.load(f1)
-            for path in set(fas_index.values()):
-                with open(os.path.join(self.library_pass_path["fas_scores"], path), "r") as f2:
-                    fas_sub_dict: Dict[str, Dict[str, Any]] = json.load(f2)
-                    fas_dict.update(fas_sub_dict)
-        gene_assembly: Dict[str, Gene] = GeneAssembler.from_dict(info_dict, seq_dict, fas_dict)
-        return gene_assembly
+    def get_positions(self, gene_id: str) -> Dict[str, int]:
+        if gene_id not in self.positions:
+            positions: Dict[str, int] = dict()
+            for i, transcript_id in enumerate(self.expression_assembly["data"][gene_id]["ids"]):
+                positions.setdefault(transcript_id, i)
+            self.positions[gene_id] = positions
+        return self.positions[gene_id]
 
     def insert_expression_dict(self, insert_dict: Dict[str, Any]):
         gene_id: str = insert_dict["gene_id"]
@@ -105,44 +100,29 @@ class ExpressionAssembler:
         protein_id: str = insert_dict["protein_id"]
         expression: float = float(insert_dict[self.expression_assembly["normalization"]])
         expression_threshold: float = self.expression_assembly["expression_threshold"]
-        id_list: List[str] = self.expression_assembly["data"][gene_id]["ids"]
         if len(protein_id) == 0:
-            index: int = id_list.index(transcript_id)
-            if expression >= expression_threshold:
-                self.expression_assembly["data"][gene_id]["expression"][index] = expression
-            else:
-                self.expression_assembly["data"][gene_id]["expression"][index] = 0.0
+            index: int = self.get_positions(gene_id)[transcript_id]
         else:
-            index: int = id_list.index(protein_id)
-            if expression >= expression_threshold:
-                self.expression_assembly["data"][gene_id]["expression"][index] = expression
-            else:
-                self.expression_assembly["data"][gene_id]["expression"][index] = 0.0
+            index: int = self.get_positions(gene_id)[protein_id]
+        if expression >= expression_threshold:
+            self.expression_assembly["data"][gene_id]["expression"][index] = expression
+        else:
+            self.expression_assembly["data"][gene_id]["expression"][index] = 0.0
 
     def cleanse_assembly(self):
-        cleanse_dict: Dict[str, List[str]] = dict()
-        for gene_id in tqdm(self.expression_assembly["data"].keys(),
+        for gene_id in tqdm(list(self.expression_assembly["data"].keys()),
                             ncols=100,
                             total=len(self.expression_assembly["data"]),
                             desc=self.expression_assembly["name"] + ": extract cleanup progress"):
-            cleanse_dict[gene_id] = list()
-            id_list: List[str] = self.expression_assembly["data"][gene_id]["ids"]
-            for index, transcript_id in enumerate(id_list):
-                if self.expression_assembly["data"][gene_id]["expression"][index] == 0.0:
-                    cleanse_dict[gene_id].append(transcript_id)
-        for gene_id in cleanse_dict.keys():
-            for transcript_id in cleanse_dict[gene_id]:
-                id_list: List[str] = self.expression_assembly["data"][gene_id]["ids"]
-                index: int = id_list.index(transcript_id)
-                self.expression_assembly["data"][gene_id]["ids"].pop(index)
-                self.expression_assembly["data"][gene_id]["synonyms"].pop(index)
-                self.expression_assembly["data"][gene_id]["biotypes"].pop(index)
-                self.expression_assembly["data"][gene_id]["transcript_support_levels"].pop(index)
-                self.expression_assembly["data"][gene_id]["tags"].pop(index)
-                self.expression_assembly["data"][gene_id]["expression"].pop(index)
-                self.expression_assembly["data"][gene_id]["expression_rel"].pop(index)
-            if len(self.expression_assembly["data"][gene_id]["ids"]) == 0:
+            gene_data: Dict[str, List[Any]] = self.expression_assembly["data"][gene_id]
+            keep_list: List[int] = [index for index, expression in enumerate(gene_data["expression"])
+                                    if expression != 0.0]
+            for key in ["ids", "synonyms", "biotypes", "transcript_support_levels", "tags",
+                        "expression", "expression_rel"]:
+                gene_data[key] = [gene_data[key][index] for index in keep_list]
+            if len(gene_data["ids"]) == 0:
                 del self.expression_assembly["data"][gene_id]
+        self.positions = dict()
 
     def calc_relative_expression(self):
         for gene_id in tqdm(self.expression_assembly["data"].keys(),
@@ -159,6 +139,7 @@ class ExpressionAssembler:
     def load(self, input_path: str) -> None:
         with open(input_path, "r") as f:
             self.expression_assembly = json.load(f)
+        self.positions = dict()
         with open(os.path.join(self.expression_assembly["library"], "paths.json"), "r") as f:
             self.library_pass_path = PassPath(json.load(f))
 
@@ -20,23 +20,23 @@
 #
 #######################################################################
 
+import multiprocessing
 import os
 import json
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterable, Iterator, Tuple, Optional
 
 from tqdm import tqdm
 
 from Classes.GTFBoy.GTFBoy import GTFBoy
+from Classes.GTFBoy.GTFRecord import GTFRecord
 from Classes.PassPath.PassPath import PassPath
 from Classes.ResultBuddy.ComparisonHandling.ComparisonAssembler import ComparisonAssembler
 from Classes.ResultBuddy.ExpressionHandling.ConditionAssembler import ConditionAssembler
 from Classes.ResultBuddy.ExpressionHandling.ExpressionAssembler import ExpressionAssembler
 from Classes.ResultBuddy.EWFDHandling.EWFDAssembler import EWFDAssembler
-from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+from Classes.SequenceHandling.IDIndex import IDIndex
 from Classes.SequenceHandling.LibraryInfo import LibraryInfo
-from Classes.SequenceHandling.Protein import Protein
-from Classes.SequenceHandling.Transcript import Transcript
 from Classes.TreeGrow.TreeGrow import TreeGrow
 from Classes.WriteGuard.WriteGuard import WriteGuard
 
@@ -164,42 +164,32 @@ class ResultBuddy:
                               expression_path: str,
                               expression_name: str,
                               normalization: str,
-                              expression_threshold: float = 1.0) -> None:
-        transcript_to_protein_dict: Dict[str, str] = self.transcript_to_protein_map()
-        transcript_to_gene_dict: Dict[str, str] = self.transcript_to_gene_map()
-        synonym_to_transcript_dict: Dict[str, str] = self.synonym_to_transcript_map()
+                              expression_threshold: float = 1.0,
+                              threads: int = 1) -> None:
+        id_index: IDIndex = IDIndex.load(self.library_pass_path)
         expression_gtf: GTFBoy = GTFBoy(expression_path)
         expression_assembler: ExpressionAssembler = ExpressionAssembler(self.library_pass_path,
                                                                         expression_name,
                                                                         expression_path,
                                                                         normalization,
                                                                         True,
-                                                                        expression_threshold)
-        for line in tqdm(expression_gtf,
-                         ncols=100,
-                         total=expression_gtf.total_lines,
-                         desc=expression_name + " GTF extraction progress"):
-            if line.startswith("#"):
-                continue
-            else:
-                split_line: List[str] = line.split("\t")
-                line_dict: Dict[str, str] = GTFBoy.build_dict(split_line)
-
-                transcript_flag: bool = line_dict["feature"] in ["transcript", "novel_transcript"]
-                if "transcript_id" in line_dict.keys() and transcript_flag:
-                    line_dict["transcript_id"] = line_dict["transcript_id"].split(".")[0].split(":")[-1]
-                    transcript_in_lib_flag: bool = line_dict["transcript_id"] in synonym_to_transcript_dict.keys()
-                    if transcript_in_lib_flag:
-                        line_dict["transcript_id"] = synonym_to_transcript_dict[line_dict["transcript_id"]]
-                        gene_in_lib_flag: bool = line_dict["transcript_id"] in transcript_to_gene_dict.keys()
-                    else:
-                        gene_in_lib_flag: bool = False
-                    # This implicitly checks if the transcript is PROTEIN CODING or NMD bio-typed.
-                    if gene_in_lib_flag:
-                        line_dict["transcript_id"] = synonym_to_transcript_dict[line_dict["transcript_id"]]
-                        line_dict["gene_id"] = transcript_to_gene_dict[line_dict["transcript_id"]]
-                        line_dict["protein_id"] = transcript_to_protein_dict[line_dict["transcript_id"]]
-                        expression_assembler.insert_expression_dict(line_dict)
+                                                                        expression_threshold,
+                                                                        id_index)
+        # The GTF is split into byte ranges that are parsed in parallel.
+        if threads > 1:
+            line_dict_iter: Iterator[Dict[str, str]] = ResultBuddy.parse_expression_parallel(
+                expression_gtf, threads, expression_name + " GTF extraction progress")
+        else:
+            line_dict_iter: Iterator[Dict[str, str]] = ResultBuddy.parse_expression_lines(
+                expression_gtf.progress(expression_name + " GTF extraction progress"))
+        for line_dict in line_dict_iter:
+            transcript_id: Optional[str] = id_index.resolve_synonym(line_dict["transcript_id"])
+            # This implicitly checks if the transcript is PROTEIN CODING or NMD bio-typed.
+            if transcript_id is not None and transcript_id in id_index:
+                line_dict["transcript_id"] = id_index.resolve_synonym(transcript_id)
+                line_dict["gene_id"] = id_index.get_gene_id(line_dict["transcript_id"])
+                line_dict["protein_id"] = id_index.get_protein_id(line_dict["transcript_id"])
+                expression_assembler.insert_expression_dict(line_dict)
         # Keep all genes and transcripts, doesn't matter if they have expression or not.
         # expression_assembler.cleanse_assembly()
         expression_assembler.calc_relative_expression()
@@ -216,53 +206,76 @@ class ResultBuddy:
 
         expression_assembler.save(expression_json_path)
 
+    @staticmethod
+    def parse_expression_lines(lines: Iterable[str]) -> Iterator[Dict[str, str]]:
+        """
+        Yields the line dicts of all transcript lines that carry a transcript id. The id is stripped of its version
+        and prefix.
+        """
+        for line in lines:
+            if line.startswith("#"):
+                continue
+            else:
+                record: GTFRecord = GTFRecord.from_line(line)
+                # Only transcript lines carry the expression, so skip everything else before decoding attributes.
+                if record.feature not in ["transcript", "novel_transcript"]:
+                    continue
+                line_dict: Dict[str, str] = record.to_dict()
+                if "transcript_id" in line_dict.keys():
+                    line_dict["transcript_id"] = line_dict["transcript_id"].split(".")[0].split(":")[-1]
+                    yield line_dict
+
+    @staticmethod
+    def parse_expression_range(task: Tuple[str, int, int]) -> List[Dict[str, str]]:
+        expression_path, start, end = task
+        return list(ResultBuddy.parse_expression_lines(GTFBoy(expression_path).iter_range(start, end)))
+
+    @staticmethod
+    def parse_expression_parallel(expression_gtf: GTFBoy, threads: int, desc: str) -> Iterator[Dict[str, str]]:
+        """
+        A compressed GTF is unpacked into a temporary file next to it first, which is removed once all lines were
+        yielded.
+        """
+        if not expression_gtf.is_splittable():
+            # Compressed files can not be entered at a byte offset.
+            print("\tUnpacking the GTF to parse it in " + str(threads) + " processes.")
+            temp_path: str = expression_gtf.decompress(os.path.dirname(os.path.abspath(expression_gtf.gtf_path)))
+            try:
+                yield from ResultBuddy.parse_expression_parallel(GTFBoy(temp_path), threads, desc)
+            finally:
+                os.remove(temp_path)
+            return
+        task_list: List[Tuple[str, int, int]] = [(expression_gtf.gtf_path, start, end) for start, end
+                                                 in expression_gtf.split_ranges(threads * GTFBoy.RANGES_PER_PROCESS)]
+        with multiprocessing.Pool(threads) as pool:
+            # imap keeps the order of the ranges, so the records arrive in file order.
+            for line_dict_list in tqdm(pool.imap(ResultBuddy.parse_expression_range, task_list),
+                                       ncols=100,
+                                       total=len(task_list),
+                                       desc=desc):
+                for line_dict in line_dict_list:
+                    yield line_dict
+
     def transcript_to_biotype_map(self) -> Dict[str, str]:
         transcript_to_biotype_map: Dict[str, str] = dict()
-        gene_assembler: GeneAssembler = GeneAssembler(self.result_info["species"], self.result_info["taxon_id"])
-        gene_assembler.load(self.library_pass_path)
-        for transcript in gene_assembler.get_transcripts():
-            if isinstance(transcript, Protein):
-                transcript_to_biotype_map[transcript.id_transcript] = "protein_coding"
-            elif isinstance(transcript, Transcript):
-                transcript_to_biotype_map[transcript.id_transcript] = "nonsense_mediated_decay"
+        id_index: IDIndex = IDIndex.load(self.library_pass_path)
+        for transcript_id in id_index.transcripts.keys():
+            if id_index.get_protein_id(transcript_id):
+                transcript_to_biotype_map[transcript_id] = "protein_coding"
+            else:
+                transcript_to_biotype_map[transcript_id] = "nonsense_mediated_decay"
         return transcript_to_biotype_map
 
     def synonym_to_transcript_map(self) -> Dict[str, str]:
-        synonym_to_transcript_map: Dict[str, str] = dict()
-        gene_assembler: GeneAssembler = GeneAssembler(self.result_info["species"], self.result_info["taxon_id"])
-        gene_assembler.load(self.library_pass_path)
-        for transcript in gene_assembler.get_transcripts():
-            if isinstance(transcript, Protein):
-                synonym_to_transcript_map[transcript.get_id_transcript()] = transcript.get_id_transcript()
-                for synonym in transcript.get_synonyms():
-                    synonym_to_transcript_map[synonym] = transcript.get_id_transcript()
-            elif isinstance(transcript, Transcript):
-                synonym_to_transcript_map[transcript.get_id()] = transcript.get_id()
-                for synonym in transcript.get_synonyms():
-                    synonym_to_transcript_map[synonym] = transcript.get_id()
-        return synonym_to_transcript_map
+        return dict(IDIndex.load(self.library_pass_path).synonyms)
 
     def transcript_to_protein_map(self) -> Dict[str, str]:
-        transcript_to_protein_map: Dict[str, str] = dict()
-        gene_assembler: GeneAssembler = GeneAssembler(self.result_info["species"], self.result_info["taxon_id"])
-        gene_assembler.load(self.library_pass_path)
-        for transcript in gene_assembler.get_transcripts():
-            if isinstance(transcript, Protein):
-                transcript_to_protein_map[transcript.get_id_transcript()] = transcript.get_id()
-            elif isinstance(transcript, Transcript):
-                transcript_to_protein_map[transcript.get_id()] = ""
-        return transcript_to_protein_map
+        id_index: IDIndex = IDIndex.load(self.library_pass_path)
+        return {transcript_id: id_index.get_protein_id(transcript_id) for transcript_id in id_index.transcripts.keys()}
 
     def transcript_to_gene_map(self) -> Dict[str, str]:
-        transcript_to_gene_map: Dict[str, str] = dict()
-        gene_assembler: GeneAssembler = GeneAssembler(self.result_info["species"], self.result_info["taxon_id"])
-        gene_assembler.load(self.library_pass_path)
-        for transcript in gene_assembler.get_transcripts():
-            if isinstance(transcript, Protein):
-                transcript_to_gene_map[transcript.get_id_transcript()] = transcript.get_id_gene()
-            elif isinstance(transcript, Transcript):
-                transcript_to_gene_map[transcript.get_id()] = transcript.get_id_gene()
-        return transcript_to_gene_map
+        id_index: IDIndex = IDIndex.load(self.library_pass_path)
+        return {transcript_id: id_index.get_gene_id(transcript_id) for transcript_id in id_index.transcripts.keys()}
 
 
 def main():
@@ -0,0 +1,311 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2023 Christian Bluemel
+#
+# This file is part of Spice.
+#
+#  BinaryLibrary is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  BinaryLibrary is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Spice.  If not, see <http://www.gnu.org/licenses/>.
+#
+#######################################################################
+
+import json
+import mmap
+import struct
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from Classes.SequenceHandling.FASMatrix import FASMatrix
+from Classes.SequenceHandling.Gene import Gene
+from Classes.WriteGuard.AtomicFile import AtomicFile
+
+
+class BinaryLibrary:
+    """
+    Binary, memory mapped alternative to the transcript_info.json, sequences.json and fas_scores files of a library.
+    The file starts with a small JSON header that lists the sections of the file. Every section is a flat numpy array:
+    Gene and transcript fields are stored column wise, strings as one byte blob with offsets and fields with few
+    distinct values as codes into a value list of the header. The FAS matrix of each gene is stored as float32 block.
+    Opening a file only reads the header and the gene ids, genes are built on request.
+    """
+
+    MAGIC: bytes = b"SPICELIB"
+    VERSION: int = 1
+
+    # Magic, version and the byte length of the JSON header.
+    PREFIX_FORMAT: str = "<8sIQ"
+
+    # All sections start at a multiple of this, so that they can be mapped as numpy arrays.
+    ALIGNMENT: int = 8
+
+    # Number of genes that are decoded together when the whole library is read.
+    LOAD_CHUNK_SIZE: int = 1000
+
+    # Columns with one value per gene.
+    GENE_STRINGS: List[str] = ["gene_id", "gene_name"]
+    GENE_CATEGORIES: List[str] = ["gene_feature", "gene_taxon_id", "gene_chromosome", "gene_species", "gene_biotype"]
+
+    # Columns with one value per transcript. Transcripts are stored gene by gene.
+    TRANSCRIPT_STRINGS: List[str] = ["transcript_key", "transcript_id", "transcript_name", "transcript_gene_id",
+                                     "sequence"]
+    TRANSCRIPT_CATEGORIES: List[str] = ["transcript_feature", "transcript_taxon_id", "transcript_biotype",
+                                        "transcript_tags", "transcript_tsl", "transcript_synonyms"]
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        with open(path, "rb") as f:
+            self.buffer: mmap.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        prefix_size: int = struct.calcsize(BinaryLibrary.PREFIX_FORMAT)
+        magic, version, header_length = struct.unpack_from(BinaryLibrary.PREFIX_FORMAT, self.buffer)
+        if magic != BinaryLibrary.MAGIC:
+            raise ValueError(path + " is not a binary SPICE library.")
+        if version != BinaryLibrary.VERSION:
+            raise ValueError(path + " has version " + str(version) + ", expected "
+                             + str(BinaryLibrary.VERSION) + ".")
+        header: Dict[str, Any] = json.loads(self.buffer[prefix_size:prefix_size + header_length])
+        data_start: int = BinaryLibrary.align(prefix_size + header_length)
+        self.gene_count: int = header["gene_count"]
+        self.transcript_count: int = header["transcript_count"]
+        self.categories: Dict[str, List[Any]] = header["categories"]
+        # Input fingerprint of the JSON files the binary library was written from, see LibraryManifest.
+        self.source_fingerprint: str = header.get("source_fingerprint", "")
+        self.sections: Dict[str, np.ndarray] = dict()
+        for name, (dtype, offset, count) in header["sections"].items():
+            self.sections[name] = np.frombuffer(self.buffer, dtype=np.dtype(dtype), count=count,
+                                                offset=data_start + offset)
+        self.gene_ids: List[str] = self.get_strings("gene_id", 0, self.gene_count)
+        self.gene_rows: Dict[str, int] = {gene_id: i for i, gene_id in enumerate(self.gene_ids)}
+
+    def __len__(self) -> int:
+        return self.gene_count
+
+    def __contains__(self, gene_id: str) -> bool:
+        return gene_id in self.gene_rows
+
+    def __enter__(self) -> "BinaryLibrary":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        # The arrays point into the mapping, they have to be dropped before it can be closed.
+        self.sections = dict()
+        self.buffer.close()
+
+    def get_gene_ids(self) -> List[str]:
+        return self.gene_ids
+
+    def get_strings(self, name: str, start: int, stop: int) -> List[str]:
+        """
+        Decodes the entries start to stop of a string column.
+        """
+        offsets: np.ndarray = self.sections[name + "_offsets"][start:stop + 1]
+        data: bytes = self.sections[name + "_data"][offsets[0]:offsets[-1]].tobytes()
+        bounds: List[int] = (offsets - offsets[0]).tolist()
+        text: str = data.decode("utf-8")
+        if len(text) == len(data):
+            # Pure ASCII, byte offsets are character offsets.
+            return [text[bounds[i]:bounds[i + 1]] for i in range(stop - start)]
+        return [data[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(stop - start)]
+
+    def get_categories(self, name: str, start: int, stop: int) -> List[Any]:
+        values: List[Any] = self.categories[name]
+        return [values[code] for code in self.sections[name][start:stop].tolist()]
+
+    def load_gene(self, gene_id: str) -> Gene:
+        row: int = self.gene_rows[gene_id]
+        return self.load_rows(row, row + 1)[0]
+
+    def load_rows(self, start: int, stop: int) -> List[Gene]:
+        """
+        Builds the genes start to stop. The columns are decoded once for the whole range.
+        """
+        gene_columns: Dict[str, List[Any]] = dict()
+        for name in BinaryLibrary.GENE_STRINGS:
+            gene_columns[name] = self.get_strings(name, start, stop)
+        for name in BinaryLibrary.GENE_CATEGORIES:
+            gene_columns[name] = self.get_categories(name, start, stop)
+        gene_transcripts: List[int] = self.sections["gene_transcripts"][start:stop + 1].tolist()
+        gene_fas: List[int] = self.sections["gene_fas"][start:stop + 1].tolist()
+        gene_fas_scores: List[int] = self.sections["gene_fas_scores"][start:stop + 1].tolist()
+
+        transcript_start, transcript_stop = gene_transcripts[0], gene_transcripts[-1]
+        columns: Dict[str, List[Any]] = dict()
+        for name in BinaryLibrary.TRANSCRIPT_STRINGS:
+            columns[name] = self.get_strings(name, transcript_start, transcript_stop)
+        for name in BinaryLibrary.TRANSCRIPT_CATEGORIES:
+            columns[name] = self.get_categories(name, transcript_start, transcript_stop)
+        cds_offsets: List[int] = self.sections["cds_offsets"][transcript_start:transcript_stop + 1].tolist()
+        cds: np.ndarray = self.sections["cds"]
+        fas_ids: List[str] = self.get_strings("fas_id", gene_fas[0], gene_fas[-1])
+        fas_scores: np.ndarray = self.sections["fas_scores"]
+
+        genes: List[Gene] = list()
+        for row in range(stop - start):
+            transcript_dict: Dict[str, Dict[str, Any]] = dict()
+            seq_dict: Dict[str, str] = dict()
+            for i in range(gene_transcripts[row] - transcript_start, gene_transcripts[row + 1] - transcript_start):
+                key: str = columns["transcript_key"][i]
+                entry: Dict[str, Any] = {"_id": key,
+                                         "transcript_name": columns["transcript_name"][i],
+                                         "feature": columns["transcript_feature"][i],
+                                         "gene_id": columns["transcript_gene_id"][i],
+                                         "taxon_id": columns["transcript_taxon_id"][i],
+                                         "biotype": columns["transcript_biotype"][i],
+                                         "tags": columns["transcript_tags"][i],
+                                         "tsl": columns["transcript_tsl"][i],
+                                         "synonyms": columns["transcript_synonyms"][i]}
+                if entry["biotype"] == "protein_coding":
+                    entry["transcript_id"] = columns["transcript_id"][i]
+                    entry["cds"] = cds[2 * cds_offsets[i]:2 * cds_offsets[i + 1]].copy()
+                    seq_dict[key] = columns["sequence"][i]
+                transcript_dict[key] = entry
+            info_dict: Dict[str, Any] = {"_id": gene_columns["gene_id"][row],
+                                         "name": gene_columns["gene_name"][row],
+                                         "feature": gene_columns["gene_feature"][row],
+                                         "taxon_id": gene_columns["gene_taxon_id"][row],
+                                         "chromosome": gene_columns["gene_chromosome"][row],
+                                         "species": gene_columns["gene_species"][row],
+                                         "biotype": gene_columns["gene_biotype"][row],
+                                         "transcripts": transcript_dict}
+            fas_matrix: FASMatrix = FASMatrix.from_block(
+                fas_ids[gene_fas[row] - gene_fas[0]:gene_fas[row + 1] - gene_fas[0]],
+                fas_scores[gene_fas_scores[row]:gene_fas_scores[row + 1]])
+            gene: Gene = Gene()
+            gene.from_info_dict(info_dict, seq_dict, fas_matrix)
+            genes.append(gene)
+        return genes
+
+    def iter_genes(self, gene_ids: Optional[Iterable[str]] = None) -> Iterator[Gene]:
+        """
+        Yields the given genes, all genes in file order if gene_ids is None.
+        """
+        if gene_ids is not None:
+            for gene_id in gene_ids:
+                yield self.load_gene(gene_id)
+            return
+        for start in range(0, self.gene_count, BinaryLibrary.LOAD_CHUNK_SIZE):
+            yield from self.load_rows(start, min(start + BinaryLibrary.LOAD_CHUNK_SIZE, self.gene_count))
+
+    @staticmethod
+    def align(position: int) -> int:
+        return -(-position // BinaryLibrary.ALIGNMENT) * BinaryLibrary.ALIGNMENT
+
+    @staticmethod
+    def encode_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        encoded: List[bytes] = [value.encode("utf-8") for value in values]
+        offsets: np.ndarray = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+    @staticmethod
+    def encode_categories(values: List[Any]) -> Tuple[np.ndarray, List[Any]]:
+        # Values are told apart by their JSON form, this keeps lists and the type of ids like the taxon id.
+        codes: Dict[str, int] = dict()
+        categories: List[Any] = list()
+        column: np.ndarray = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            key: str = json.dumps(value)
+            if key not in codes:
+                codes[key] = len(categories)
+                categories.append(value)
+            column[i] = codes[key]
+        return column, categories
+
+    @staticmethod
+    def write(genes: Iterable[Gene], path: str, source_fingerprint: str = "") -> None:
+        """
+        Writes the genes into a binary library. The file is replaced atomically, an open BinaryLibrary of the old file
+        keeps working on the old content.
+
+        :param source_fingerprint: Input fingerprint of the JSON files the genes were loaded from. A binary library is
+         only used instead of the JSON files while it matches.
+        """
+        columns: Dict[str, List[Any]] = {name: list() for name in BinaryLibrary.GENE_STRINGS
+                                         + BinaryLibrary.GENE_CATEGORIES
+                                         + BinaryLibrary.TRANSCRIPT_STRINGS
+                                         + BinaryLibrary.TRANSCRIPT_CATEGORIES + ["fas_id"]}
+        gene_transcripts: List[int] = [0]
+        gene_fas: List[int] = [0]
+        gene_fas_scores: List[int] = [0]
+        cds_offsets: List[int] = [0]
+        cds_blocks: List[np.ndarray] = list()
+        fas_blocks: List[np.ndarray] = list()
+
+        for gene in genes:
+            info_dict: Dict[str, Any] = gene.to_dict("info")
+            seq_dict: Dict[str, str] = gene.to_dict("seq")
+            columns["gene_id"].append(info_dict["_id"])
+            columns["gene_name"].append(info_dict["name"])
+            columns["gene_feature"].append(info_dict["feature"])
+            columns["gene_taxon_id"].append(info_dict["taxon_id"])
+            columns["gene_chromosome"].append(info_dict["chromosome"])
+            columns["gene_species"].append(info_dict["species"])
+            columns["gene_biotype"].append(info_dict["biotype"])
+            for key, entry in info_dict["transcripts"].items():
+                columns["transcript_key"].append(key)
+                columns["transcript_id"].append(entry.get("transcript_id", key))
+                columns["transcript_name"].append(entry["transcript_name"])
+                columns["transcript_gene_id"].append(entry["gene_id"])
+                columns["sequence"].append(seq_dict.get(key, ""))
+                columns["transcript_feature"].append(entry["feature"])
+                columns["transcript_taxon_id"].append(entry["taxon_id"])
+                columns["transcript_biotype"].append(entry["biotype"])
+                columns["transcript_tags"].append(entry["tags"])
+                columns["transcript_tsl"].append(entry["tsl"])
+                columns["transcript_synonyms"].append(entry["synonyms"])
+                cds: np.ndarray = np.asarray(entry.get("cds", []), dtype=np.int64).reshape(-1, 2)
+                cds_blocks.append(cds.ravel())
+                cds_offsets.append(cds_offsets[-1] + len(cds))
+            gene_transcripts.append(gene_transcripts[-1] + len(info_dict["transcripts"]))
+            fas_matrix: FASMatrix = gene.get_fas_matrix()
+            columns["fas_id"].extend(fas_matrix.get_ids())
+            fas_blocks.append(fas_matrix.matrix.ravel())
+            gene_fas.append(gene_fas[-1] + len(fas_matrix))
+            gene_fas_scores.append(gene_fas_scores[-1] + len(fas_matrix) ** 2)
+
+        sections: Dict[str, np.ndarray] = dict()
+        categories: Dict[str, List[Any]] = dict()
+        for name in BinaryLibrary.GENE_STRINGS + BinaryLibrary.TRANSCRIPT_STRINGS + ["fas_id"]:
+            sections[name + "_data"], sections[name + "_offsets"] = BinaryLibrary.encode_strings(columns[name])
+        for name in BinaryLibrary.GENE_CATEGORIES + BinaryLibrary.TRANSCRIPT_CATEGORIES:
+            sections[name], categories[name] = BinaryLibrary.encode_categories(columns[name])
+        sections["gene_transcripts"] = np.array(gene_transcripts, dtype=np.int64)
+        sections["gene_fas"] = np.array(gene_fas, dtype=np.int64)
+        sections["gene_fas_scores"] = np.array(gene_fas_scores, dtype=np.int64)
+        sections["cds_offsets"] = np.array(cds_offsets, dtype=np.int64)
+        sections["cds"] = np.concatenate(cds_blocks + [np.empty(0, dtype=np.int64)])
+        sections["fas_scores"] = np.concatenate(fas_blocks + [np.empty(0, dtype=np.float32)])
+
+        section_table: Dict[str, Tuple[str, int, int]] = dict()
+        position: int = 0
+        for name, array in sections.items():
+            section_table[name] = (array.dtype.str, position, len(array))
+            position = BinaryLibrary.align(position + array.nbytes)
+        header: bytes = json.dumps({"gene_count": len(columns["gene_id"]),
+                                    "transcript_count": len(columns["transcript_key"]),
+                                    "categories": categories,
+                                    "source_fingerprint": source_fingerprint,
+                                    "sections": section_table}).encode("utf-8")
+        prefix: bytes = struct.pack(BinaryLibrary.PREFIX_FORMAT, BinaryLibrary.MAGIC, BinaryLibrary.VERSION,
+                                    len(header))
+
+        with AtomicFile(path, "wb") as f:
+            f.write(prefix + header)
+            data_start: int = BinaryLibrary.align(len(prefix) + len(header))
+            for name, array in sections.items():
+                f.write(b"\0" * (data_start + section_table[name][1] - f.tell()))
+                f.write(array.tobytes())
@@ -0,0 +1,260 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2023 Christian Bluemel
+#
+# This file is part of Spice.
+#
+#  FASMatrix is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  FASMatrix is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Spice.  If not, see <http://www.gnu.org/licenses/>.
+#
+#######################################################################
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class FASMatrix:
+    """
+    Dense FAS scores of a single gene. Row and column i belong to the transcript ids[i]. Pairs that were never
+    scored hold UNSCORED, pairs that are not part of the matrix at all (only possible for imported dicts) hold NaN.
+    The scores are kept in a buffer that grows by doubling so that adding a transcript does not copy the matrix.
+    The number of UNSCORED cells is tracked along the way, scores should therefore only be written through the methods
+    of this class and not through the matrix view.
+    """
+
+    __slots__ = ("ids", "index", "fills", "scores", "size", "row_unscored", "unscored_count", "unscored_rows")
+
+    UNSCORED: float = -1.0
+
+    # float32 keeps about seven decimal digits. Scores are rounded to this precision when they are handed out as float64.
+    PRECISION: int = 7
+
+    def __init__(self, capacity: int = 4) -> None:
+        self.ids: List[str] = list()
+        self.index: Dict[str, int] = dict()
+        # The score that a transcript receives against every newly added transcript that is scored as well.
+        self.fills: np.ndarray = np.full(capacity, FASMatrix.UNSCORED, dtype=np.float32)
+        self.scores: np.ndarray = np.full((capacity, capacity), np.nan, dtype=np.float32)
+        self.size: int = 0
+        # Number of UNSCORED cells per row, in total and the number of rows with at least one UNSCORED cell.
+        self.row_unscored: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self.unscored_count: int = 0
+        self.unscored_rows: int = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, transcript_id: str) -> bool:
+        return transcript_id in self.index
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """
+        View on the used part of the buffer.
+        """
+        return self.scores[:self.size, :self.size]
+
+    def get_ids(self) -> List[str]:
+        return self.ids
+
+    def get_index(self, transcript_id: str) -> int:
+        return self.index[transcript_id]
+
+    def reserve(self, capacity: int) -> None:
+        if capacity <= len(self.fills):
+            return
+        capacity = max(capacity, 2 * len(self.fills))
+        scores: np.ndarray = np.full((capacity, capacity), np.nan, dtype=np.float32)
+        scores[:self.size, :self.size] = self.matrix
+        fills: np.ndarray = np.full(capacity, FASMatrix.UNSCORED, dtype=np.float32)
+        fills[:self.size] = self.fills[:self.size]
+        row_unscored: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        row_unscored[:self.size] = self.row_unscored[:self.size]
+        self.scores = scores
+        self.fills = fills
+        self.row_unscored = row_unscored
+
+    def recount(self) -> None:
+        """
+        Recounts the UNSCORED cells from scratch. Used after changes that touch many cells at once.
+        """
+        row_unscored: np.ndarray = (self.matrix == FASMatrix.UNSCORED).sum(axis=1)
+        self.row_unscored[:self.size] = row_unscored
+        self.unscored_count = int(row_unscored.sum())
+        self.unscored_rows = int(np.count_nonzero(row_unscored))
+
+    def add(self, transcript_id: str, fill: float) -> None:
+        """
+        Adds a transcript. It is paired with all transcripts that are already part of the matrix and with itself. A
+        pair only stays UNSCORED if both fill values are UNSCORED, otherwise it gets the larger fill value.
+        """
+        self.reserve(self.size + 1)
+        i: int = self.size
+        self.fills[i] = fill
+        row: np.ndarray = np.maximum(self.fills[:i + 1], np.float32(fill))
+        self.scores[i, :i + 1] = row
+        self.scores[:i + 1, i] = row
+        self.ids.append(transcript_id)
+        self.index[transcript_id] = i
+        self.size += 1
+        # The new column adds at most one UNSCORED cell to each of the old rows.
+        unscored: np.ndarray = row == FASMatrix.UNSCORED
+        self.unscored_rows += int(np.count_nonzero(unscored[:i] & (self.row_unscored[:i] == 0)))
+        self.row_unscored[:i] += unscored[:i]
+        self.row_unscored[i] = int(np.count_nonzero(unscored))
+        self.unscored_rows += int(self.row_unscored[i] > 0)
+        self.unscored_count += int(np.count_nonzero(unscored[:i])) + int(self.row_unscored[i])
+
+    def set_fill(self, transcript_id: str, fill: float) -> None:
+        self.fills[self.index[transcript_id]] = fill
+
+    def delete(self, transcript_id: str) -> None:
+        i: int = self.index[transcript_id]
+        keep: np.ndarray = np.arange(self.size) != i
+        self.scores[:self.size - 1, :self.size - 1] = self.matrix[keep][:, keep]
+        self.scores[self.size - 1, :self.size] = np.nan
+        self.scores[:self.size, self.size - 1] = np.nan
+        self.fills[:self.size - 1] = self.fills[:self.size][keep]
+        self.ids.pop(i)
+        self.size -= 1
+        self.index = {transcript_id: j for j, transcript_id in enumerate(self.ids)}
+        self.recount()
+
+    def get_score(self, transcript_id_1: str, transcript_id_2: str) -> float:
+        value: float = float(self.scores[self.index[transcript_id_1], self.index[transcript_id_2]])
+        return round(value, FASMatrix.PRECISION)
+
+    def set_score(self, transcript_id_1: str, transcript_id_2: str, score: float) -> None:
+        i: int = self.index[transcript_id_1]
+        j: int = self.index[transcript_id_2]
+        change: int = int(score == FASMatrix.UNSCORED) - int(self.scores[i, j] == FASMatrix.UNSCORED)
+        self.scores[i, j] = score
+        if change != 0:
+            self.unscored_rows -= int(self.row_unscored[i] > 0)
+            self.row_unscored[i] += change
+            self.unscored_rows += int(self.row_unscored[i] > 0)
+            self.unscored_count += change
+
+    def has_score(self, transcript_id_1: str, transcript_id_2: str) -> bool:
+        """
+        True if both transcripts are part of the matrix and their pair is present. The pair may still be UNSCORED.
+        """
+        if transcript_id_1 not in self.index or transcript_id_2 not in self.index:
+            return False
+        return not np.isnan(self.scores[self.index[transcript_id_1], self.index[transcript_id_2]])
+
+    def get_indices(self, transcript_ids: List[str]) -> np.ndarray:
+        return np.fromiter((self.index[transcript_id] for transcript_id in transcript_ids),
+                           dtype=np.intp, count=len(transcript_ids))
+
+    def get_block(self, transcript_ids: Optional[List[str]] = None) -> np.ndarray:
+        """
+        Returns the scores between transcript_ids, rows and columns in the given order, as float64. Without ids the
+        whole matrix is returned.
+        """
+        if transcript_ids is None:
+            block: np.ndarray = self.matrix
+        else:
+            indices: np.ndarray = self.get_indices(transcript_ids)
+            block: np.ndarray = self.matrix[np.ix_(indices, indices)]
+        return np.round(block.astype(np.float64), FASMatrix.PRECISION)
+
+    def get_unscored_mask(self) -> np.ndarray:
+        """
+        Boolean mask over the rows. True for transcripts that have at least one UNSCORED pair.
+        """
+        return self.row_unscored[:self.size] > 0
+
+    def get_unscored_ids(self) -> List[str]:
+        return [self.ids[i] for i in np.flatnonzero(self.get_unscored_mask())]
+
+    def get_unscored_pairs(self) -> List[Tuple[str, str]]:
+        """
+        All pairs of two different transcripts where at least one direction is UNSCORED. Each pair is listed once.
+        """
+        unscored: np.ndarray = self.matrix == FASMatrix.UNSCORED
+        rows, columns = np.nonzero(np.triu(unscored | unscored.T, 1))
+        return [(self.ids[i], self.ids[j]) for i, j in zip(rows.tolist(), columns.tolist())]
+
+    def is_complete(self) -> bool:
+        return self.unscored_count == 0
+
+    def get_unscored_count(self) -> int:
+        return self.unscored_count
+
+    def get_unscored_row_count(self) -> int:
+        return self.unscored_rows
+
+    def reset(self, transcript_ids: List[str]) -> None:
+        """
+        Marks the pairs of the given transcripts against all other transcripts as UNSCORED. Only the rows of the given
+        transcripts are reset.
+        """
+        for i in self.get_indices(transcript_ids).tolist():
+            diagonal: float = self.scores[i, i]
+            self.scores[i, :self.size] = FASMatrix.UNSCORED
+            self.scores[i, i] = diagonal
+        self.recount()
+
+    def fill_diagonal(self, score: float) -> None:
+        np.fill_diagonal(self.matrix, score)
+        self.recount()
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        """
+        Nested dict representation as used in the fas_scores files. Missing pairs are left out.
+        """
+        output: Dict[str, Dict[str, float]] = dict()
+        block: np.ndarray = self.get_block()
+        present: np.ndarray = ~np.isnan(block)
+        for i, transcript_id in enumerate(self.ids):
+            if not present[i].any():
+                continue
+            row: List[float] = block[i].tolist()
+            output[transcript_id] = {self.ids[j]: row[j] for j in np.flatnonzero(present[i]).tolist()}
+        return output
+
+    @staticmethod
+    def from_dict(fas_dict: Dict[str, Dict[str, float]]) -> "FASMatrix":
+        fas_matrix: FASMatrix = FASMatrix(max(len(fas_dict), 1))
+        for transcript_id_1, row_dict in fas_dict.items():
+            for transcript_id_2 in [transcript_id_1] + list(row_dict.keys()):
+                if transcript_id_2 not in fas_matrix.index:
+                    fas_matrix.reserve(fas_matrix.size + 1)
+                    fas_matrix.index[transcript_id_2] = fas_matrix.size
+                    fas_matrix.ids.append(transcript_id_2)
+                    fas_matrix.size += 1
+        for transcript_id_1, row_dict in fas_dict.items():
+            if len(row_dict) == 0:
+                continue
+            i: int = fas_matrix.index[transcript_id_1]
+            columns: np.ndarray = fas_matrix.get_indices(list(row_dict.keys()))
+            fas_matrix.scores[i, columns] = list(row_dict.values())
+        fas_matrix.recount()
+        return fas_matrix
+
+    @staticmethod
+    def from_block(transcript_ids: List[str], block: np.ndarray) -> "FASMatrix":
+        """
+        Counterpart of the matrix view. The block is copied, so it may be a view on a memory mapped file.
+        """
+        size: int = len(transcript_ids)
+        fas_matrix: FASMatrix = FASMatrix(max(size, 1))
+        fas_matrix.ids = list(transcript_ids)
+        fas_matrix.index = {transcript_id: i for i, transcript_id in enumerate(fas_matrix.ids)}
+        fas_matrix.size = size
+        fas_matrix.scores[:size, :size] = np.asarray(block, dtype=np.float32).reshape(size, size)
+        fas_matrix.recount()
+        return fas_matrix
@@ -21,21 +21,34 @@
 #######################################################################
 
 
-from typing import List, Dict, Any
+import sys
+from typing import List, Dict, Any, Iterator, Tuple, Optional, Callable
+
+import numpy as np
 
 from Classes.SequenceHandling.Transcript import Transcript
 from Classes.SequenceHandling.Protein import Protein
-from Classes.GTFBoy.GTFBoy import GTFBoy
+from Classes.SequenceHandling.FASMatrix import FASMatrix
+from Classes.GTFBoy.GTFRecord import GTFRecord
 
 
 class Gene:
 
+    __slots__ = ("id_gene", "name_gene", "id_taxon", "feature", "chromosome", "biotype", "species",
+                 "transcripts", "protein_count", "missing_sequence_count", "fas_matrix",
+                 "gene_index")
+
     GTF_MASK: List[str] = ["seqname", "source", "feature",
                            "start", "end", "score",
                            "strand", "frame", "attribute"]
 
     fasta_template = ">{0}|{1}|{2}\n{3}"
 
+    # Only transcripts with these biotypes take part in the FAS scoring.
+    FAS_BIOTYPES: List[str] = ["protein_coding", "nonsense_mediated_decay", "non_coding"]
+    # Transcripts with these biotypes have no domains, their FAS scores are known to be 0.
+    NON_CODING_BIOTYPES: List[str] = ["nonsense_mediated_decay", "non_coding"]
+
     def __init__(self) -> None:
         self.id_gene: str = ""
         self.name_gene: str = ""
@@ -45,11 +58,12 @@ class Gene:
         self.biotype: str = ""
         self.species: str = ""
         self.transcripts: Dict[str, Transcript] = dict()
-        self.sequences_complete_flag = False
-        self.fas_complete_flag = False
-        self.fas_dict: Dict[str, Dict[str, float]] = dict()
-        self.check_sequence_status()
-        self.check_fas_status()
+        # Kept up to date by add_transcript, delete_transcript and set_sequence_of_transcript.
+        self.protein_count: int = 0
+        self.missing_sequence_count: int = 0
+        self.fas_matrix: FASMatrix = FASMatrix()
+        # The GeneIndex of the GeneAssembler this gene belongs to. It is informed about all changes of the gene.
+        self.gene_index = None
 
     def set_id(self, id_gene: str) -> None:
         self.id_gene = id_gene
@@ -58,46 +72,79 @@ class Gene:
         self.name_gene = name_gene
 
     def set_feature(self, feature: str) -> None:
-        self.feature = feature
+        self.feature = sys.intern(feature)
 
     def set_biotype(self, biotype: str) -> None:
-        self.biotype = biotype
+        self.biotype = sys.intern(biotype)
 
     def set_id_taxon(self, id_taxon: str) -> None:
         """
 
         :type id_taxon: str
         """
-        self.id_taxon = id_taxon
+        # Older libraries may hold the taxon id as a number.
+        self.id_taxon = sys.intern(id_taxon) if isinstance(id_taxon, str) else id_taxon
 
     def set_species(self, species: str):
-        self.species = species
+        self.species = sys.intern(species)
 
     def set_chromosome(self, chromosome: str) -> None:
-        self.chromosome = chromosome
+        self.chromosome = sys.intern(chromosome)
 
     def add_transcript(self, transcript: Transcript, initial_add: bool = False) -> None:
         """
         :param initial_add: True if this transcript is being newly added to the gene or if it comes from an old load.
         :type transcript: Transcript
         """
+        if transcript.get_id() in self.transcripts:
+            self.count_transcript(self.transcripts[transcript.get_id()], -1)
         self.transcripts[transcript.get_id()] = transcript
-        if transcript.get_biotype() in ["protein_coding", "nonsense_mediated_decay", "non_coding"] and initial_add:
-            if transcript.get_id() not in self.fas_dict.keys():
-                self.fas_dict[transcript.get_id()] = dict()
-                for transcript_id in self.fas_dict.keys():
-                    if transcript.get_biotype() in ["nonsense_mediated_decay", "non_coding"]:
-                        self.fas_dict[transcript.get_id()][transcript_id] = 0.0
-                        self.fas_dict[transcript_id][transcript.get_id()] = 0.0
-                    elif self.transcripts[transcript_id].get_biotype() in ["nonsense_mediated_decay", "non_coding"]:
-                        self.fas_dict[transcript.get_id()][transcript_id] = 0.0
-                        self.fas_dict[transcript_id][transcript.get_id()] = 0.0
-                    else:
-                        self.fas_dict[transcript.get_id()][transcript_id] = -1.0
-                        self.fas_dict[transcript_id][transcript.get_id()] = -1.0
-
-        self.check_sequence_status()
-        self.check_fas_status()
+        self.count_transcript(transcript, 1)
+        if transcript.get_biotype() in Gene.FAS_BIOTYPES:
+            fill: float = 0.0 if transcript.get_biotype() in Gene.NON_CODING_BIOTYPES else FASMatrix.UNSCORED
+            if transcript.get_id() in self.fas_matrix:
+                self.fas_matrix.set_fill(transcript.get_id(), fill)
+            elif initial_add:
+                unscored_rows: int = self.fas_matrix.get_unscored_row_count()
+                self.fas_matrix.add(transcript.get_id(), fill)
+                self.update_fas_index(unscored_rows)
+
+    def count_transcript(self, transcript: Transcript, step: int) -> None:
+        if isinstance(transcript, Protein):
+            self.protein_count += step
+            if not transcript.has_sequence():
+                self.missing_sequence_count += step
+        if self.gene_index is not None:
+            self.gene_index.count_transcript(self.get_id(), transcript, step)
+
+    def update_fas_index(self, unscored_rows: int) -> None:
+        """
+        Reports a change of the FAS matrix to the GeneIndex. The matrix is only changed by the methods of the gene,
+        which call this after each change.
+
+        :param unscored_rows: Number of rows with unscored pairs before the change.
+        """
+        if self.gene_index is not None:
+            self.gene_index.unscored_protein_count += self.fas_matrix.get_unscored_row_count() - unscored_rows
+            self.gene_index.fas_changed_gene_ids.add(self.get_id())
+
+    def set_gene_index(self, gene_index) -> None:
+        self.gene_index = gene_index
+
+    def iter_transcripts(self, predicate: Optional[Callable[[Transcript], bool]] = None) -> Iterator[Transcript]:
+        """
+        Lazy counterpart of get_transcripts. Transcripts must not be added or deleted while iterating.
+
+        :param predicate: Only transcripts for which it returns True are yielded.
+        """
+        for transcript in self.transcripts.values():
+            if predicate is None or predicate(transcript):
+                yield transcript
+
+    def iter_proteins(self, predicate: Optional[Callable[[Protein], bool]] = None) -> Iterator[Protein]:
+        for transcript in self.transcripts.values():
+            if isinstance(transcript, Protein) and (predicate is None or predicate(transcript)):
+                yield transcript
 
     def get_transcripts(self, no_sequence_flag: bool = False) -> List[Transcript]:
         if no_sequence_flag:
@@ -112,11 +159,7 @@ class Gene:
             return [protein for protein in self.transcripts.values() if
                     isinstance(protein, Protein) and not protein.has_sequence()]
         elif no_fas_flag:
-            output_list: List[Protein] = list()
-            for protein_id in self.fas_dict.keys():
-                if -1 in self.fas_dict[protein_id].values():
-                    output_list.append(self.transcripts[protein_id])
-            return output_list
+            return [self.transcripts[protein_id] for protein_id in self.fas_matrix.get_unscored_ids()]
         else:
             return [protein for protein in self.transcripts.values() if isinstance(protein, Protein)]
 
@@ -141,40 +184,83 @@ class Gene:
     def get_chromosome(self) -> str:
         return self.chromosome
 
+    def get_fas_matrix(self) -> FASMatrix:
+        return self.fas_matrix
+
     def get_fas_dict(self) -> Dict[str, Dict[str, float]]:
-        return self.fas_dict
+        """
+        Nested dict copy of the FAS matrix. Changes to it are not written back, use set_fas_dict for that.
+        """
+        return self.fas_matrix.to_dict()
+
+    def get_protein_fas_block(self) -> np.ndarray:
+        """
+        FAS scores between the proteins of this gene in the order of get_proteins.
+        """
+        return self.fas_matrix.get_block([protein.get_id() for protein in self.get_proteins()])
 
     def reset_fas(self) -> None:
-        for transcript_1 in self.get_transcripts():
-            for transcript_2 in self.get_transcripts():
-                if transcript_1.get_biotype() == "protein_coding" and transcript_1 != transcript_2:
-                    self.fas_dict[transcript_1.get_id()][transcript_2.get_id()] = -1.0
+        unscored_rows: int = self.fas_matrix.get_unscored_row_count()
+        self.fas_matrix.reset([transcript.get_id() for transcript in self.get_transcripts()
+                               if transcript.get_biotype() == "protein_coding" and transcript.get_id() in self.fas_matrix])
+        self.update_fas_index(unscored_rows)
+
+    def set_fas_score(self, transcript_id_1: str, transcript_id_2: str, score: float) -> None:
+        unscored_rows: int = self.fas_matrix.get_unscored_row_count()
+        self.fas_matrix.set_score(transcript_id_1, transcript_id_2, score)
+        self.update_fas_index(unscored_rows)
 
     def is_sequence_complete(self) -> bool:
-        return self.sequences_complete_flag
+        return self.missing_sequence_count == 0
 
     def is_fas_complete(self) -> bool:
-        return self.fas_complete_flag
+        return self.fas_matrix.is_complete()
+
+    def set_fas_matrix(self, fas_matrix: FASMatrix):
+        unscored_rows: int = self.fas_matrix.get_unscored_row_count()
+        self.fas_matrix = fas_matrix
+        self.update_fas_index(unscored_rows)
 
     def set_fas_dict(self, fas_dict: Dict[str, Dict[str, float]]):
-        self.fas_dict = fas_dict
+        self.set_fas_matrix(FASMatrix.from_dict(fas_dict))
 
     def set_sequence_of_transcript(self, transcript_id: str, sequence: str) -> None:
         protein: Protein = self.transcripts[transcript_id]
+        self.count_transcript(protein, -1)
         protein.set_sequence(sequence)
-        self.check_sequence_status()
+        self.count_transcript(protein, 1)
 
     def check_sequence_status(self) -> None:
-        self.sequences_complete_flag = all([len(protein.get_sequence()) > 0
-                                            for protein in self.get_proteins() if isinstance(protein, Protein)])
+        """
+        Recounts the protein counters, e.g. after sequences were set on the proteins directly.
+        """
+        missing_sequence_count: int = self.missing_sequence_count
+        proteins: List[Protein] = self.get_proteins()
+        self.protein_count = len(proteins)
+        self.missing_sequence_count = len([protein for protein in proteins if not protein.has_sequence()])
+        if self.gene_index is not None:
+            change: int = self.missing_sequence_count - missing_sequence_count
+            self.gene_index.missing_sequence_count += change
+            self.gene_index.sequence_transcript_count -= change
 
     def check_fas_status(self) -> None:
-        self.fas_complete_flag = all([-1 not in list(row_dict.values()) for row_dict in self.get_fas_dict().values()])
+        unscored_rows: int = self.fas_matrix.get_unscored_row_count()
+        self.fas_matrix.recount()
+        self.update_fas_index(unscored_rows)
 
     def from_dict(self,
                   info_dict: Dict[str, Any],
                   seq_dict: Dict[str, Any],
                   fas_dict: Dict[str, Any]) -> None:
+        self.from_info_dict(info_dict, seq_dict, FASMatrix.from_dict(fas_dict))
+
+    def from_info_dict(self,
+                       info_dict: Dict[str, Any],
+                       seq_dict: Dict[str, Any],
+                       fas_matrix: FASMatrix) -> None:
+        """
+        Like from_dict, but with the FAS scores already given as a FASMatrix.
+        """
         self.set_id(info_dict["_id"])
         self.set_name(info_dict["name"])
         self.set_feature(info_dict["feature"])
@@ -182,7 +268,7 @@ class Gene:
         self.set_chromosome(info_dict["chromosome"])
         self.set_species(info_dict["species"])
         self.set_biotype(info_dict["biotype"])
-        self.set_fas_dict(fas_dict)
+        self.set_fas_matrix(fas_matrix)
         for key in info_dict["transcripts"].keys():
             transcript_dict = info_dict["transcripts"][key]
             if transcript_dict["biotype"] != "protein_coding":
@@ -190,10 +276,17 @@ class Gene:
                 transcript.from_dict(transcript_dict)
                 self.add_transcript(transcript)
             else:
-                transcript_dict["sequence"] = seq_dict[key]
+                # The info dict may be shared, e.g. by the JSON cache of the GeneAssembler, so it is not modified.
+                transcript_dict = dict(transcript_dict)
+                transcript_dict["sequence"] = seq_dict.get(key, "")
                 protein: Protein = Protein()
                 protein.from_dict(transcript_dict)
                 self.add_transcript(protein)
+        # Scores of transcripts that are not part of the gene anymore, e.g. if a run was interrupted after the FAS
+        # scores were saved but before the transcript info was.
+        for transcript_id in [transcript_id for transcript_id in fas_matrix.get_ids()
+                              if transcript_id not in self.transcripts]:
+            self.delete_fas_entry(transcript_id)
 
     def to_dict(self, mode: str) -> Dict[str, Any]:
         output: Dict[str, Any]
@@ -218,22 +311,18 @@ class Gene:
         return output
 
     def from_gtf_line(self, gtf_split_line: List[str]):
-        for i in range(len(self.GTF_MASK)):
-            field_name: str = self.GTF_MASK[i]
-            entry: str = gtf_split_line[i]
-
-            if field_name == "seqname":
-                self.set_chromosome(entry)
-            elif field_name == "feature":
-                self.set_feature(entry)
-            elif field_name == "attribute":
-                attribute_dict: Dict[str, str] = GTFBoy.build_attribute_dict(entry)
-                self.set_id(attribute_dict["gene_id"])
-                try:
-                    self.set_name(attribute_dict["gene_name"])
-                except KeyError:
-                    self.set_name(".")
-                self.set_biotype(attribute_dict["gene_biotype"])
+        self.from_gtf_record(GTFRecord(gtf_split_line))
+
+    def from_gtf_record(self, record: GTFRecord):
+        self.set_chromosome(record.seqname)
+        self.set_feature(record.feature)
+        attribute_dict: Dict[str, str] = record.attributes
+        self.set_id(attribute_dict["gene_id"])
+        try:
+            self.set_name(attribute_dict["gene_name"])
+        except KeyError:
+            self.set_name(".")
+        self.set_biotype(attribute_dict["gene_biotype"])
 
     def add_entry(self, entry_type: str, entry: Any):
         if entry_type == "transcript":
@@ -245,30 +334,45 @@ class Gene:
     def get_protein_count(self,
                           no_sequence_flag: bool = False,
                           no_fas_flag: bool = False) -> int:
-        return len(self.get_proteins(no_sequence_flag, no_fas_flag))
+        if no_sequence_flag:
+            return self.missing_sequence_count
+        elif no_fas_flag:
+            return self.fas_matrix.get_unscored_row_count()
+        return self.protein_count
 
     def delete_transcript(self, transcript_id: str):
         print("\tDeleting ", transcript_id)
+        self.count_transcript(self.transcripts[transcript_id], -1)
         del self.transcripts[transcript_id]
-        del self.fas_dict[transcript_id]
-        for key in self.fas_dict.keys():
-            del self.fas_dict[key][transcript_id]
-        self.check_sequence_status()
+        self.delete_fas_entry(transcript_id)
+
+    def delete_fas_entry(self, transcript_id: str) -> None:
+        """
+        Removes the row and column of a transcript from the FAS matrix. The transcript itself is kept.
+        """
+        unscored_rows: int = self.fas_matrix.get_unscored_row_count()
+        self.fas_matrix.delete(transcript_id)
+        self.update_fas_index(unscored_rows)
 
     def calculate_implicit_fas_scores(self):
-        for key_x in self.fas_dict.keys():
-            for key_y in self.fas_dict.keys():
-                if key_x == key_y:
-                    self.fas_dict[key_x][key_y] = 1.0
+        unscored_rows: int = self.fas_matrix.get_unscored_row_count()
+        self.fas_matrix.fill_diagonal(1.0)
+        self.update_fas_index(unscored_rows)
+
+    def iter_pairings(self) -> Iterator[Tuple[Protein, Protein]]:
+        """
+        Yields every unordered pair of proteins that still has an unscored FAS value in at least one direction. The
+        pairs come in the order of the FAS matrix.
+        """
+        for transcript_id_1, transcript_id_2 in self.fas_matrix.get_unscored_pairs():
+            protein_1: Transcript = self.transcripts[transcript_id_1]
+            protein_2: Transcript = self.transcripts[transcript_id_2]
+            # Non coding transcripts can not be scored by FAS. They only end up here after a reset.
+            if isinstance(protein_1, Protein) and isinstance(protein_2, Protein) and protein_1 != protein_2:
+                yield protein_1, protein_2
 
     def make_pairings(self) -> str:
-        protein_list: List[Protein] = self.get_proteins(False, True)
-        row_list: List[str] = list()
-        for protein_1 in protein_list:
-            for protein_2 in protein_list:
-                if protein_1 != protein_2 and protein_2.make_header_pair(protein_1) not in row_list:
-                    row_list.append(protein_1.make_header_pair(protein_2))
-        return "\n".join(row_list)
+        return "\n".join([protein_1.make_header_pair(protein_2) for protein_1, protein_2 in self.iter_pairings()])
 
     def __eq__(self, other):
         if isinstance(other, Gene):
@@ -22,14 +22,25 @@
 #######################################################################
 
 from Classes.GTFBoy.GTFBoy import GTFBoy
+from Classes.GTFBoy.GTFRecord import GTFRecord
+from Classes.GTFBoy.GTFTable import GTFTable
 from Classes.PassPath.PassPath import PassPath
 from Classes.SequenceHandling.Gene import Gene
 from Classes.SequenceHandling.Transcript import Transcript
 from Classes.SequenceHandling.Protein import Protein
+from Classes.SequenceHandling.FASMatrix import FASMatrix
+from Classes.SequenceHandling.GeneIndex import GeneIndex
+from Classes.SequenceHandling.BinaryLibrary import BinaryLibrary
+from Classes.SequenceHandling.LibraryManifest import LibraryManifest
+from Classes.WriteGuard.AtomicFile import AtomicFile
+import multiprocessing
 import os
+import zlib
 from tqdm import tqdm
 import json
-from typing import List, Dict, Any, Set, Iterator, Tuple
+import numpy as np
+import pandas
+from typing import List, Dict, Any, Set, Iterator, Iterable, Tuple, Optional, Callable
 
 
 class GeneAssembler:
@@ -55,53 +66,270 @@ class GeneAssembler:
                            "start", "end", "score",
                            "strand", "frame", "attribute"]
 
+    EXTRACTED_FEATURES: Set[str] = {"gene", "transcript", "CDS"}
+
+    # Attributes that Gene, Transcript and Protein read from a GTF record.
+    EXTRACTED_ATTRIBUTES: List[str] = ["gene_id", "gene_name", "gene_biotype",
+                                       "transcript_id", "transcript_name", "transcript_biotype",
+                                       "transcript_support_level", "protein_id", "tag"]
+
+    ENGINES: List[str] = ["stream", "columnar"]
+
+    # Parts of a library that can be loaded: transcript info, sequences and FAS scores.
+    LIBRARY_COMPONENTS: List[str] = ["info", "seq", "fas"]
+
+    # Number of FAS score files. Genes are assigned to them by a hash of their id, so the file of a gene does not depend
+    # on the other genes of the library.
+    FAS_SHARD_COUNT: int = 1024
+
+    # Parsed library files by path. An entry is reused as long as modification time and size of the file match.
+    JSON_CACHE: Dict[str, Tuple[Tuple[int, int], Any]] = dict()
+
     def __init__(self, species: str, taxon_id: str):
         self.gene_assembly: Dict[str, Gene] = dict()
+        self.gene_index: GeneIndex = GeneIndex()
         self.species: str = species
         self.taxon_id: str = taxon_id
         self.inclusion_filter_dict: Dict[str, List[str]] = dict()
+        # LIBRARY_COMPONENTS the genes were loaded with. Components that are missing must not be saved.
+        self.loaded_components: List[str] = list(GeneAssembler.LIBRARY_COMPONENTS)
+        # Opened binary library and the ids of its genes that were not loaded yet.
+        self.binary_library: Optional[BinaryLibrary] = None
+        self.lazy_gene_ids: Set[str] = set()
+        # The opened binary library matches the JSON files, so its genes do not have to be written back.
+        self.binary_is_saved: bool = False
 
     def __getitem__(self, gene_id) -> Gene:
-        return self.gene_assembly[gene_id]
+        return self.get_gene(gene_id)
 
     def __contains__(self, gene_id) -> bool:
-        return gene_id in self.gene_assembly.keys()
+        return gene_id in self.gene_assembly or gene_id in self.lazy_gene_ids
+
+    def get_gene(self, gene_id: str) -> Gene:
+        """
+        Genes of an opened binary library are loaded on their first access.
+        """
+        if gene_id in self.lazy_gene_ids:
+            self.add_binary_gene(self.binary_library.load_gene(gene_id))
+        return self.gene_assembly[gene_id]
+
+    def add_binary_gene(self, gene: Gene) -> None:
+        self.add_gene(gene)
+        if self.binary_is_saved:
+            self.gene_index.fas_changed_gene_ids.discard(gene.get_id())
+
+    def add_gene(self, gene: Gene) -> None:
+        self.lazy_gene_ids.discard(gene.get_id())
+        if gene.get_id() in self.gene_assembly:
+            self.remove_gene(gene.get_id())
+        self.gene_assembly[gene.get_id()] = gene
+        self.gene_index.add_gene(gene)
+
+    def remove_gene(self, gene_id: str) -> None:
+        if gene_id in self.lazy_gene_ids:
+            self.lazy_gene_ids.discard(gene_id)
+        else:
+            self.gene_index.remove_gene(self.gene_assembly.pop(gene_id))
+
+    def set_gene_assembly(self, gene_assembly: Dict[str, Gene]) -> None:
+        self.close_binary()
+        self.gene_assembly = dict()
+        self.gene_index = GeneIndex()
+        for gene in gene_assembly.values():
+            self.add_gene(gene)
+
+    def get_gene_of(self, transcript_id: str) -> Gene:
+        """
+        Returns the gene of a transcript or protein. Synonyms of transcripts are resolved as well.
+        """
+        self.load_lazy_genes()
+        return self.gene_assembly[self.gene_index.get_gene_id(transcript_id)]
+
+    def resolve_synonym(self, transcript_id: str) -> str:
+        self.load_lazy_genes()
+        return self.gene_index.resolve_synonym(transcript_id)
+
+    def get_ids_by_biotype(self, biotype: str) -> Set[str]:
+        self.load_lazy_genes()
+        return self.gene_index.get_ids_by_biotype(biotype)
 
     def update_inclusion_filter(self, key: str, possible_values: List[str]) -> None:
         self.inclusion_filter_dict.update({key: possible_values})
 
     def save_fas(self, pass_path: PassPath) -> None:
-        index_dict: Dict[str, str] = dict()
-        for index, index_sub_dict, entry_dict in GeneAssembler.fas_to_dict_iter(self.gene_assembly):
-            index_dict.update(index_sub_dict)
-            with open(os.path.join(pass_path["fas_scores"], index), "w") as f:
+        """
+        Writes the FAS scores. Only the shards that hold a gene that was added, removed or changed since the last save
+        or load are rewritten, as well as the shards of genes that are not yet in their hashed shard. The fas_index.json
+        is only rewritten if it changed. Each file is replaced atomically and the index is written before shards that
+        became empty are removed, so the index never points to a missing shard.
+        """
+        self.check_loaded_component("fas")
+        self.load_lazy_genes()
+        old_index_dict: Dict[str, str] = dict()
+        if os.path.exists(pass_path["fas_index"]):
+            with open(pass_path["fas_index"], "r") as f:
+                old_index_dict = json.load(f)
+        index_dict: Dict[str, str] = {gene_id: GeneAssembler.get_fas_shard(gene_id) for gene_id in self.gene_assembly}
+
+        changed_gene_ids: Set[str] = set(self.gene_index.fas_changed_gene_ids)
+        changed_gene_ids.update(index_dict.keys() - old_index_dict.keys())
+        changed_gene_ids.update([gene_id for gene_id, shard in old_index_dict.items()
+                                 if index_dict.get(gene_id) != shard])
+        shards: Set[str] = {index_dict[gene_id] for gene_id in changed_gene_ids if gene_id in index_dict}
+        shards.update([old_index_dict[gene_id] for gene_id in changed_gene_ids if gene_id in old_index_dict])
+
+        written_shards: Set[str] = set()
+        for shard, _, entry_dict in GeneAssembler.fas_to_dict_iter(self.gene_assembly, shards):
+            with AtomicFile(os.path.join(pass_path["fas_scores"], shard)) as f:
                 json.dump(entry_dict, f, indent=4)
-        with open(pass_path["fas_index"], "w") as f:
-            json.dump(index_dict, f, indent=4)
+            written_shards.add(shard)
+        if index_dict != old_index_dict or not os.path.exists(pass_path["fas_index"]):
+            with AtomicFile(pass_path["fas_index"]) as f:
+                json.dump(index_dict, f, indent=4)
+        for shard in shards - written_shards:
+            if os.path.exists(os.path.join(pass_path["fas_scores"], shard)):
+                os.remove(os.path.join(pass_path["fas_scores"], shard))
+        self.gene_index.fas_changed_gene_ids = set()
+
+    def check_loaded_component(self, component: str) -> None:
+        if component not in self.loaded_components:
+            raise ValueError("The library was loaded without '" + component + "', it can not be saved.")
 
     def save_info(self, pass_path: PassPath) -> None:
+        self.load_lazy_genes()
         json_dict: Dict[str, Dict[str, Any]] = GeneAssembler.to_dict(self.gene_assembly, "info")
-        with open(pass_path["transcript_info"], "w") as f:
+        with AtomicFile(pass_path["transcript_info"]) as f:
             json.dump(json_dict, f, indent=4)
 
     def save_seq(self, pass_path: PassPath) -> None:
+        self.check_loaded_component("seq")
+        self.load_lazy_genes()
         json_dict: Dict[str, Dict[str, Any]] = GeneAssembler.to_dict(self.gene_assembly, "seq")
-        with open(pass_path["transcript_seq"], "w") as f:
+        with AtomicFile(pass_path["transcript_seq"]) as f:
             json.dump(json_dict, f, indent=4)
 
-    def load(self, pass_path: PassPath) -> None:
-        with open(pass_path["transcript_info"], "r") as f:
-            info_dict: Dict[str, Dict[str, Any]] = json.load(f)
-        with open(pass_path["transcript_seq"], "r") as f:
-            seq_dict: Dict[str, Dict[str, Any]] = json.load(f)
+    def load(self, pass_path: PassPath, components: Optional[List[str]] = None, cache: bool = False) -> None:
+        """
+        Loads the library, see read_library for the arguments. If the library has a binary library that was written
+        from the current JSON files, it is opened instead and genes are loaded from it on demand with all components.
+        """
+        if self.open_saved_binary(pass_path):
+            return
+        if components is None:
+            components = GeneAssembler.LIBRARY_COMPONENTS
+        self.set_gene_assembly(GeneAssembler.from_dict(*GeneAssembler.read_library(pass_path, components, cache),
+                                                       components))
+        self.loaded_components = ["info"] + [component for component in components if component != "info"]
+        # The FAS scores on disk match the loaded genes.
+        self.gene_index.fas_changed_gene_ids = set()
+
+    @staticmethod
+    def read_library(pass_path: PassPath,
+                     components: Optional[List[str]] = None,
+                     cache: bool = False) -> Tuple[Dict[str, Dict[str, Any]],
+                                                   Dict[str, Dict[str, Any]],
+                                                   Dict[str, Dict[str, Any]]]:
+        """
+        Reads the info, seq and fas dicts of a library.
+
+        :param components: The LIBRARY_COMPONENTS to read, all by default. The transcript info is always read. Genes
+         built without "seq" have no sequences and genes built without "fas" have an empty FAS matrix, so they must not
+         be saved back into the library.
+        :param cache: Keep the parsed files in memory and reuse them on later reads of the unchanged files. The
+         returned dicts are shared in that case and must not be modified.
+        """
+        if components is None:
+            components = GeneAssembler.LIBRARY_COMPONENTS
+        info_dict: Dict[str, Dict[str, Any]] = GeneAssembler.read_json(pass_path["transcript_info"], cache)
+        seq_dict: Dict[str, Dict[str, Any]] = dict()
+        if "seq" in components:
+            seq_dict = GeneAssembler.read_json(pass_path["transcript_seq"], cache)
         fas_dict: Dict[str, Dict[str, Any]] = dict()
-        with open(pass_path["fas_index"], "r") as f1:
-            fas_index: Dict[str, str] = json.load(f1)
+        if "fas" in components:
+            fas_index: Dict[str, str] = GeneAssembler.read_json(pass_path["fas_index"], cache)
             for path in set(fas_index.values()):
-                with open(os.path.join(pass_path["fas_scores"], path), "r") as f2:
-                    fas_sub_dict: Dict[str, Dict[str, Any]] = json.load(f2)
-                    fas_dict.update(fas_sub_dict)
-        self.gene_assembly = GeneAssembler.from_dict(info_dict, seq_dict, fas_dict)
+                fas_dict.update(GeneAssembler.read_json(os.path.join(pass_path["fas_scores"], path), cache))
+        return info_dict, seq_dict, fas_dict
+
+    @staticmethod
+    def read_json(path: str, cache: bool = False) -> Any:
+        if not cache:
+            with open(path, "r") as f:
+                return json.load(f)
+        stat: os.stat_result = os.stat(path)
+        file_key: Tuple[int, int] = (stat.st_mtime_ns, stat.st_size)
+        if path not in GeneAssembler.JSON_CACHE or GeneAssembler.JSON_CACHE[path][0] != file_key:
+            with open(path, "r") as f:
+                GeneAssembler.JSON_CACHE[path] = (file_key, json.load(f))
+        return GeneAssembler.JSON_CACHE[path][1]
+
+    def open_saved_binary(self, pass_path: PassPath) -> bool:
+        """
+        Replaces the genes with the binary library of the library if its fingerprint matches the current JSON files.
+        Returns False if there is no such binary library.
+        """
+        if "transcript_binary" not in pass_path or not os.path.exists(pass_path["transcript_binary"]):
+            return False
+        self.set_gene_assembly(dict())
+        self.open_binary(pass_path["transcript_binary"])
+        if self.binary_library.source_fingerprint == GeneAssembler.get_json_fingerprint(pass_path):
+            self.binary_is_saved = True
+            return True
+        print("\tThe binary library " + pass_path["transcript_binary"] + " is older than the JSON files and is not "
+              "used. It can be rebuilt with spice_patch.py --mode binary.")
+        self.close_binary()
+        return False
+
+    def open_binary(self, binary_path: str) -> None:
+        """
+        Opens a binary library without loading any gene. Genes are loaded when they are accessed by id. Iterating over
+        the genes, the counters and the lookups by transcript id load all remaining genes first.
+        """
+        self.close_binary()
+        self.binary_library = BinaryLibrary(binary_path)
+        self.loaded_components = list(GeneAssembler.LIBRARY_COMPONENTS)
+        self.lazy_gene_ids = set(self.binary_library.get_gene_ids()) - self.gene_assembly.keys()
+
+    def close_binary(self) -> None:
+        if self.binary_library is not None:
+            self.binary_library.close()
+        self.binary_library = None
+        self.lazy_gene_ids = set()
+        self.binary_is_saved = False
+
+    def load_binary(self, binary_path: str, gene_ids: Optional[Iterable[str]] = None) -> None:
+        """
+        Opens a binary library and loads the given genes, all genes if gene_ids is None.
+        """
+        self.open_binary(binary_path)
+        if gene_ids is None:
+            self.load_lazy_genes()
+        else:
+            for gene_id in gene_ids:
+                self.get_gene(gene_id)
+
+    def load_lazy_genes(self) -> None:
+        if len(self.lazy_gene_ids) == 0:
+            return
+        for gene in self.binary_library.iter_genes():
+            if gene.get_id() in self.lazy_gene_ids:
+                self.add_binary_gene(gene)
+
+    def save_binary(self, pass_path: PassPath) -> None:
+        """
+        Writes all genes into the binary library of the library, stamped with the fingerprint of the JSON files. The
+        genes have to match the saved JSON files. Genes of an opened binary library that were not loaded yet are loaded
+        first.
+        """
+        self.load_lazy_genes()
+        self.close_binary()
+        BinaryLibrary.write(self.iter_genes(),
+                            pass_path["transcript_binary"],
+                            GeneAssembler.get_json_fingerprint(pass_path))
+
+    @staticmethod
+    def get_json_fingerprint(pass_path: PassPath) -> str:
+        return LibraryManifest(pass_path, dict()).get_input_fingerprint("transcript_binary")
 
     def integrate_fas_json(self, input_path: str) -> None:
         with open(input_path, "r") as f:
@@ -112,123 +340,293 @@ class GeneAssembler:
                                 total=len(list(distance_dict.keys())),
                                 desc="Integrating FAS process"):
             if key_gene_id in self:
-                gene: Gene = self.gene_assembly[key_gene_id]
+                gene: Gene = self[key_gene_id]
+                fas_matrix: FASMatrix = gene.get_fas_matrix()
                 for key_prot_id1 in distance_dict[key_gene_id].keys():
-                    if key_prot_id1 in gene.get_fas_dict().keys():
+                    if key_prot_id1 in fas_matrix:
                         for key_prot_id2 in distance_dict[key_gene_id][key_prot_id1].keys():
-                            if key_prot_id2 in gene.get_fas_dict()[key_prot_id1].keys():
+                            if fas_matrix.has_score(key_prot_id1, key_prot_id2):
                                 count += 1
                                 value: float = distance_dict[key_gene_id][key_prot_id1][key_prot_id2]
-                                gene.get_fas_dict()[key_prot_id1][key_prot_id2] = value
+                                gene.set_fas_score(key_prot_id1, key_prot_id2, value)
         print("Integrated ", count, " FAS scores.")
 
     def extract_tags(self) -> List[str]:
         tag_set: Set[str] = set()
-        for transcript in self.get_transcripts():
+        for transcript in self.iter_transcripts():
             for tag in transcript.get_tags():
                 tag_set.add(tag)
         return list(tag_set)
 
-    def extract(self, gtf_path: str) -> None:
+    def extract(self, gtf_path: str, engine: str = "stream", threads: int = 1) -> None:
         """
         Method that extracts all genes, proteins, transcripts and exons from a gtf file and sorts them into the
         GeneAssembler.
 
-        :param gtf_path: The absolute path to a gtf file.
+        :param gtf_path: The absolute path to a gtf file. Can be gzip or bgzip compressed.
+        :param engine: "stream" walks the GTF line by line. "columnar" loads it into a DataFrame and applies the
+         filters as vectorized masks. Both engines produce the same assembly.
+        :param threads: Number of processes for the "stream" engine. With more than one process the GTF is split into
+         byte ranges at gene lines that are parsed in parallel. A compressed GTF is unpacked into a temporary file for
+         this. The "columnar" engine runs in one process.
         """
+        if engine == "stream":
+            if threads > 1:
+                self.extract_parallel(gtf_path, threads)
+            else:
+                self.extract_stream(gtf_path)
+        elif engine == "columnar":
+            if threads > 1:
+                raise ValueError("The 'columnar' GTF engine runs in one process, threads are only used by 'stream'.")
+            self.extract_columnar(gtf_path)
+        else:
+            raise ValueError("Unknown GTF engine '" + engine + "'. Choose from " + ", ".join(GeneAssembler.ENGINES))
 
+    def extract_stream(self, gtf_path: str) -> None:
         # GTF Boy takes the path and can now be used to stream the gtf line by line.
         gtf_boy: GTFBoy = GTFBoy(gtf_path)
+        self.extract_lines(gtf_boy.progress("Extract GTF Progress"))
 
-        # Iterate over the GTFBoys GTF file.
-        for line in tqdm(gtf_boy, ncols=100, total=gtf_boy.total_lines, desc="Extract GTF Progress"):
+    def extract_parallel(self, gtf_path: str, threads: int) -> None:
+        """
+        Parses the GTF in byte ranges that start at gene lines. This needs all lines of a gene to follow its gene line,
+        as in the Ensembl GTFs. If a range holds a transcript or CDS of a gene from another range the GTF is parsed in
+        one process instead.
+        """
+        gtf_boy: GTFBoy = GTFBoy(gtf_path)
+        if not gtf_boy.is_splittable():
+            # Compressed files can not be entered at a byte offset.
+            print("\tUnpacking the GTF to parse it in " + str(threads) + " processes.")
+            temp_path: str = gtf_boy.decompress(os.path.dirname(os.path.abspath(gtf_path)))
+            try:
+                self.extract_parallel(temp_path, threads)
+            finally:
+                os.remove(temp_path)
+            return
+        task_list: List[Tuple[str, int, int, str, str, Dict[str, List[str]]]] = list()
+        for start, end in gtf_boy.split_ranges(threads * GTFBoy.RANGES_PER_PROCESS, "gene"):
+            task_list.append((gtf_path, start, end, self.species, self.taxon_id, self.inclusion_filter_dict))
+        gene_assembly_list: List[Dict[str, Gene]] = list()
+        with multiprocessing.Pool(threads) as pool:
+            # imap returns the partial assemblies in the order of the ranges, which keeps the merge deterministic.
+            for gene_assembly in tqdm(pool.imap(GeneAssembler.extract_range, task_list),
+                                      ncols=100,
+                                      total=len(task_list),
+                                      desc="Extract GTF Progress"):
+                if gene_assembly is None:
+                    break
+                gene_assembly_list.append(gene_assembly)
+        if len(gene_assembly_list) < len(task_list):
+            print("\tThe GTF is not sorted by gene. Parsing it in one process.")
+            self.extract_stream(gtf_path)
+            return
+        for gene_assembly in gene_assembly_list:
+            for gene in gene_assembly.values():
+                self.add_gene(gene)
+
+    @staticmethod
+    def extract_range(task: Tuple[str, int, int, str, str, Dict[str, List[str]]]) -> Optional[Dict[str, Gene]]:
+        """
+        Returns None if the range holds a transcript or CDS whose gene line is not in the range.
+        """
+        gtf_path, start, end, species, taxon_id, inclusion_filter_dict = task
+        gene_assembler: GeneAssembler = GeneAssembler(species, taxon_id)
+        gene_assembler.inclusion_filter_dict = inclusion_filter_dict
+        missing_gene_ids: Set[str] = set()
+        gene_assembler.extract_lines(GTFBoy(gtf_path).iter_range(start, end), missing_gene_ids)
+        if len(missing_gene_ids) > 0:
+            return None
+        # The index of the worker is rebuilt by the parent process and does not need to be pickled.
+        for gene in gene_assembler.iter_genes():
+            gene.set_gene_index(None)
+        return gene_assembler.gene_assembly
+
+    def extract_lines(self, lines: Iterable[str], missing_gene_ids: Optional[Set[str]] = None) -> None:
+        """
+        :param missing_gene_ids: If given, transcripts and CDS of genes without a preceding gene line are skipped and
+         their gene ids are added to it. Otherwise such a line raises a KeyError.
+        """
+        # The CDS coordinates of each protein are collected here and attached once all lines were read.
+        cds_dict: Dict[str, List[Tuple[int, int]]] = dict()
+        protein_dict: Dict[str, Protein] = dict()
+        # Iterate over the lines of the GTF file.
+        for line in lines:
             # Skip the header.
-            if line.startswith("#!"):
+            if line.startswith("#"):
                 continue
-            else:
-                # Split each line.
-                split_line: List[str] = line.split("\t")
-                # Check the feature CDS for protein. (Coding Sequence?)
-                feature: str = split_line[2]
-                if not GTFBoy.has_values(self.inclusion_filter_dict, split_line):
+            # Split each line once. The attribute column is only decoded when it is needed.
+            record: GTFRecord = GTFRecord.from_line(line)
+            # Check the feature CDS for protein. (Coding Sequence?)
+            feature: str = record.feature
+            if feature not in GeneAssembler.EXTRACTED_FEATURES:
+                continue
+            elif not record.has_values(self.inclusion_filter_dict):
+                continue
+            elif feature == "gene":
+                self.add_gene_record(record)
+            elif missing_gene_ids is not None and record["gene_id"] not in self.gene_assembly:
+                missing_gene_ids.add(record["gene_id"])
+            elif feature == "transcript":
+                # Do not extract transcripts that will have a protein counterpart in the GTF due to their biotype.
+                if record.has_attribute_value("transcript_biotype", "protein_coding"):
+                    continue
+                else:
+                    self.add_transcript_record(record)
+            elif feature == "CDS":
+                # Do not extract transcripts that will have a protein counterpart in the GTF due to their biotype.
+                if record.has_attribute_value("transcript_biotype", "nonsense_mediated_decay"):
                     continue
-                elif feature == "gene":
-                    # Make gene
-                    gene: Gene = Gene()
-                    # Use Genes method to construct itself from a split gtf line.
-                    gene.from_gtf_line(split_line)
-                    # Externally set the taxon id and species.
-                    gene.set_id_taxon(self.taxon_id)
-                    gene.set_species(self.species)
-                    # Insert the gene into the SearchTree instance
-                    self.gene_assembly[gene.get_id()] = gene
-                elif feature == "transcript":
-                    # Do not extract transcripts that will have a protein counterpart in the GTF due to their biotype.
-                    if GTFBoy.has_attribute_value("transcript_biotype", "protein_coding", split_line[8]):
-                        continue
-                    else:
-                        # Make transcript
-                        transcript: Transcript = Transcript()
-                        # Use Transcripts method to construct itself from a split gtf line.
-                        transcript.from_gtf_line(split_line)
-                        # Externally set the taxon id.
-                        transcript.set_id_taxon(int(self.taxon_id))
-                    self.gene_assembly[transcript.get_id_gene()].add_transcript(transcript, True)
-                elif feature == "CDS":
-                    # Do not extract transcripts that will have a protein counterpart in the GTF due to their biotype.
-                    if GTFBoy.has_attribute_value("transcript_biotype", "nonsense_mediated_decay", split_line[8]):
-                        continue
-                    else:
-                        # Make protein
-                        protein: Protein = Protein()
-                        # Use Proteins method to construct itself from a split gtf line.
-                        protein.from_gtf_line(split_line)
-                        # Externally set the taxon id.
-                        protein.set_id_taxon(int(self.taxon_id))
-                        self.gene_assembly[protein.get_id_gene()].add_transcript(protein, True)
+                protein_id: str = record["protein_id"]
+                if protein_id in cds_dict:
+                    # Every further CDS of a known protein only adds its coordinates.
+                    cds_dict[protein_id].append((int(record.start), int(record.end)))
+                else:
+                    cds_dict[protein_id] = [(int(record.start), int(record.end))]
+                    protein_dict[protein_id] = self.add_protein_record(record)
+        for protein_id, protein in protein_dict.items():
+            protein.set_cds(cds_dict[protein_id])
+
+    def extract_columnar(self, gtf_path: str) -> None:
+        gtf_table: GTFTable = GTFTable(gtf_path, GeneAssembler.EXTRACTED_FEATURES)
+        frame: pandas.DataFrame = gtf_table.read("Extract GTF Progress")
+
+        # Every CDS line of a protein carries the same attributes, so only the first one is kept. This shrinks the
+        # frame before the remaining attributes are decoded. The coordinates of all CDS lines are kept per protein.
+        cds_mask: pandas.Series = frame["feature"] == "CDS"
+        protein_ids: pandas.Series = GTFTable.extract_attribute(frame.loc[cds_mask, "attribute"], "protein_id")
+        cds_dict: Dict[str, np.ndarray] = GeneAssembler.group_cds(protein_ids,
+                                                                  frame.loc[cds_mask, "start"],
+                                                                  frame.loc[cds_mask, "end"])
+        frame = frame.drop(protein_ids.index[protein_ids.duplicated()])
+
+        frame = GTFTable.add_attribute_columns(frame, GeneAssembler.EXTRACTED_ATTRIBUTES)
+        frame = frame[GTFTable.mask(frame, self.inclusion_filter_dict)]
+
+        # The same biotype rules as in extract_stream, applied as masks.
+        feature: pandas.Series = frame["feature"]
+        transcript_biotype: pandas.Series = frame["transcript_biotype"]
+        frame = frame[(feature == "gene")
+                      | ((feature == "transcript") & (transcript_biotype != "protein_coding"))
+                      | ((feature == "CDS") & (transcript_biotype != "nonsense_mediated_decay"))]
+
+        gene_mask: pandas.Series = frame["feature"] == "gene"
+        for record in GTFTable.iter_records(frame[gene_mask], GeneAssembler.EXTRACTED_ATTRIBUTES):
+            self.add_gene_record(record)
+
+        # Group the transcripts and proteins by gene in one pass. The stable sort keeps the file order within each
+        # gene, so that the transcripts end up in the same order as with the streaming engine.
+        entry_frame: pandas.DataFrame = frame[~gene_mask]
+        gene_codes, gene_ids = pandas.factorize(entry_frame["gene_id"])
+        entry_frame = entry_frame.iloc[gene_codes.argsort(kind="stable")]
+        for record in tqdm(GTFTable.iter_records(entry_frame, GeneAssembler.EXTRACTED_ATTRIBUTES),
+                           ncols=100,
+                           total=len(entry_frame),
+                           desc="Assemble genes progress"):
+            if record.feature == "transcript":
+                self.add_transcript_record(record)
+            else:
+                protein: Protein = self.add_protein_record(record)
+                protein.set_cds(cds_dict[protein.get_id()])
+
+    @staticmethod
+    def group_cds(protein_ids: pandas.Series, starts: pandas.Series, ends: pandas.Series) -> Dict[str, np.ndarray]:
+        """
+        Collects the (start, end) pairs of all CDS rows per protein id in one pass. The pairs keep the file order.
+        """
+        protein_codes, unique_protein_ids = pandas.factorize(protein_ids, use_na_sentinel=False)
+        order: np.ndarray = protein_codes.argsort(kind="stable")
+        coordinates: np.ndarray = np.column_stack([starts.to_numpy(dtype=np.int64),
+                                                   ends.to_numpy(dtype=np.int64)])[order]
+        split_points: np.ndarray = np.flatnonzero(np.diff(protein_codes[order])) + 1
+        return dict(zip(unique_protein_ids, np.split(coordinates, split_points)))
+
+    def add_gene_record(self, record: GTFRecord) -> None:
+        # Make gene
+        gene: Gene = Gene()
+        # Use Genes method to construct itself from a GTF record.
+        gene.from_gtf_record(record)
+        # Externally set the taxon id and species.
+        gene.set_id_taxon(self.taxon_id)
+        gene.set_species(self.species)
+        # Insert the gene into the SearchTree instance
+        self.add_gene(gene)
+
+    def add_transcript_record(self, record: GTFRecord) -> None:
+        # Make transcript
+        transcript: Transcript = Transcript()
+        # Use Transcripts method to construct itself from a GTF record.
+        transcript.from_gtf_record(record)
+        # Externally set the taxon id.
+        transcript.set_id_taxon(int(self.taxon_id))
+        self.gene_assembly[transcript.get_id_gene()].add_transcript(transcript, True)
+
+    def add_protein_record(self, record: GTFRecord) -> Protein:
+        # Make protein
+        protein: Protein = Protein()
+        # Use Proteins method to construct itself from a GTF record.
+        protein.from_gtf_record(record)
+        # Externally set the taxon id.
+        protein.set_id_taxon(int(self.taxon_id))
+        self.gene_assembly[protein.get_id_gene()].add_transcript(protein, True)
+        return protein
+
+    def iter_genes(self, predicate: Optional[Callable[[Gene], bool]] = None) -> Iterator[Gene]:
+        """
+        Lazy counterpart of get_genes. Genes must not be added or removed while iterating, use get_genes for that.
+
+        :param predicate: Only genes for which it returns True are yielded.
+        """
+        self.load_lazy_genes()
+        for gene in self.gene_assembly.values():
+            if predicate is None or predicate(gene):
+                yield gene
+
+    def iter_transcripts(self, predicate: Optional[Callable[[Transcript], bool]] = None) -> Iterator[Transcript]:
+        self.load_lazy_genes()
+        for gene in self.gene_assembly.values():
+            yield from gene.iter_transcripts(predicate)
+
+    def iter_proteins(self, predicate: Optional[Callable[[Protein], bool]] = None) -> Iterator[Protein]:
+        self.load_lazy_genes()
+        for gene in self.gene_assembly.values():
+            yield from gene.iter_proteins(predicate)
 
     def get_genes(self, no_sequence_flag: bool = False, no_fas_flag: bool = False) -> List[Gene]:
-        output_list: List[Gene] = list()
         if no_sequence_flag:
-            for key in list(self.gene_assembly.keys()):
-                gene: Gene = self.gene_assembly[key]
-                if not gene.is_sequence_complete():
-                    output_list.append(gene)
+            return list(self.iter_genes(lambda gene: not gene.is_sequence_complete()))
         elif no_fas_flag:
-            for key in list(self.gene_assembly.keys()):
-                gene: Gene = self.gene_assembly[key]
-                if len(gene.get_proteins(False, True)) > 0:
-                    output_list.append(gene)
-        else:
-            for key in list(self.gene_assembly.keys()):
-                gene: Gene = self.gene_assembly[key]
-                output_list.append(gene)
-        return output_list
+            return list(self.iter_genes(lambda gene: not gene.is_fas_complete()))
+        self.load_lazy_genes()
+        return list(self.gene_assembly.values())
 
     def get_transcripts(self) -> List[Transcript]:
-        output_list: List[Transcript] = list()
-        for key in self.gene_assembly.keys():
-            gene: Gene = self.gene_assembly[key]
-            output_list += gene.get_transcripts()
-        return output_list
+        return list(self.iter_transcripts())
 
     def clear_empty_genes(self) -> None:
         gene_list: List[Gene] = self.get_genes()
         for gene in gene_list:
-            if len(gene.get_proteins()) == 0:
-                del self.gene_assembly[gene.get_id()]
+            if gene.get_protein_count() == 0:
+                self.remove_gene(gene.get_id())
 
     def get_gene_count(self) -> int:
+        self.load_lazy_genes()
         return len(self.gene_assembly.keys())
 
     def get_transcript_count(self, no_sequence_flag: bool = False) -> int:
-        return sum([gene.get_transcript_count(no_sequence_flag) for gene in self.get_genes()])
+        self.load_lazy_genes()
+        if no_sequence_flag:
+            return self.gene_index.sequence_transcript_count
+        return self.gene_index.transcript_count
 
     def get_protein_count(self,
                           no_sequence_flag: bool = False,
                           no_fas_flag: bool = False) -> int:
-        return sum([gene.get_protein_count(no_sequence_flag,
-                                           no_fas_flag) for gene in self.get_genes()])
+        self.load_lazy_genes()
+        if no_sequence_flag:
+            return self.gene_index.missing_sequence_count
+        elif no_fas_flag:
+            return self.gene_index.unscored_protein_count
+        return self.gene_index.protein_count
 
     def get_collected_sequences_count(self) -> int:
         return self.get_protein_count() - self.get_protein_count(True)
@@ -236,35 +634,38 @@ class GeneAssembler:
     def get_fas_scored_count(self) -> int:
         return self.get_protein_count() - self.get_protein_count(False, True)
 
-    def get_fas_dist_matrix(self) -> Dict[str, Dict[str, Dict[str, float]]]:
-        dist_matrix: Dict[str, Dict[str, Dict[str, float]]] = dict()
-        for gene in self.get_genes():
-            dist_matrix[gene.get_id()] = gene.get_fas_dict()
+    def get_fas_dist_matrix(self) -> Dict[str, FASMatrix]:
+        dist_matrix: Dict[str, FASMatrix] = dict()
+        for gene in self.iter_genes():
+            dist_matrix[gene.get_id()] = gene.get_fas_matrix()
         return dist_matrix
 
     def reset_fas(self) -> None:
-        for gene in self.get_genes():
+        for gene in self.iter_genes():
             gene.reset_fas()
 
     @staticmethod
-    def fas_to_dict_iter(gene_assembly: Dict[str, Gene]) -> Iterator[List[Tuple[str, Dict[str, str], Dict[str, Dict[str, Any]]]]]:
-        json_dict: Dict[str, Dict[str, Any]] = dict()
-        index_dict: Dict[str, str] = dict()
-        count: int = 0
-        reset_count: int = 0
+    def get_fas_shard(gene_id: str) -> str:
+        shard: int = zlib.crc32(gene_id.encode("utf-8")) % GeneAssembler.FAS_SHARD_COUNT
+        return str(shard).zfill(9) + ".json"
 
-        for key in gene_assembly.keys():
-            json_dict[key] = gene_assembly[key].to_dict("fas")
-            index_dict[key] = "0" * (9 - len(str(count))) + str(count) + ".json"
-            reset_count += 1
-            if reset_count == 100:
-                yield "0" * (9 - len(str(count))) + str(count) + ".json", index_dict, json_dict
-                reset_count = 0
-                json_dict: Dict[str, Dict[str, Any]] = dict()
-                index_dict: Dict[str, str] = dict()
-                count += 1
-        if len(json_dict) > 0:
-            yield "0" * (9 - len(str(count))) + str(count) + ".json", index_dict, json_dict
+    @staticmethod
+    def fas_to_dict_iter(gene_assembly: Dict[str, Gene],
+                         shards: Optional[Set[str]] = None) -> Iterator[Tuple[str, Dict[str, str], Dict[str, Dict[str, Any]]]]:
+        """
+        Yields the shard name, the index entries and the FAS dicts of every shard that holds at least one gene. With
+        shards given only these shards are built.
+        """
+        shard_dict: Dict[str, List[str]] = dict()
+        for gene_id in gene_assembly.keys():
+            shard: str = GeneAssembler.get_fas_shard(gene_id)
+            if shards is None or shard in shards:
+                shard_dict.setdefault(shard, list()).append(gene_id)
+        for shard in sorted(shard_dict.keys()):
+            index_dict: Dict[str, str] = {gene_id: shard for gene_id in shard_dict[shard]}
+            json_dict: Dict[str, Dict[str, Any]] = {gene_id: gene_assembly[gene_id].to_dict("fas")
+                                                    for gene_id in shard_dict[shard]}
+            yield shard, index_dict, json_dict
 
     @staticmethod
     def to_dict(gene_assembly: Dict[str, Gene], mode: str) -> Dict[str, Dict[str, Any]]:
@@ -276,11 +677,22 @@ class GeneAssembler:
     @staticmethod
     def from_dict(info_dict: Dict[str, Dict[str, Any]],
                   seq_dict: Dict[str, Dict[str, Any]],
-                  fas_dict: Dict[str, Dict[str, Any]]) -> Dict[str, Gene]:
+                  fas_dict: Dict[str, Dict[str, Any]],
+                  components: Optional[List[str]] = None) -> Dict[str, Gene]:
+        """
+        :param components: The LIBRARY_COMPONENTS the dicts were read with, all by default. Every gene of the info dict
+         must be part of the seq and fas dict if these were read. Genes get no sequences or FAS scores otherwise.
+        """
+        if components is None:
+            components = GeneAssembler.LIBRARY_COMPONENTS
         output_dict: Dict[str, Gene] = dict()
         for key in info_dict.keys():
+            if "seq" in components and key not in seq_dict:
+                raise ValueError("Gene " + key + " is missing in the sequences of the library.")
+            if "fas" in components and key not in fas_dict:
+                raise ValueError("Gene " + key + " is missing in the FAS scores of the library.")
             new_gene: Gene = Gene()
-            new_gene.from_dict(info_dict[key], seq_dict[key], fas_dict[key])
+            new_gene.from_dict(info_dict[key], seq_dict.get(key, dict()), fas_dict.get(key, dict()))
             output_dict[new_gene.get_id()] = new_gene
         return output_dict
 
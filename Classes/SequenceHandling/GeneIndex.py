@@ -0,0 +1,107 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2023 Christian Bluemel
+#
+# This file is part of Spice.
+#
+#  GeneIndex is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  GeneIndex is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Spice.  If not, see <http://www.gnu.org/licenses/>.
+#
+#######################################################################
+
+from typing import Dict, Set, Optional, List
+
+from Classes.SequenceHandling.Gene import Gene
+from Classes.SequenceHandling.Transcript import Transcript
+from Classes.SequenceHandling.Protein import Protein
+
+
+class GeneIndex:
+    """
+    Library wide counters and lookup tables of a GeneAssembler. Genes that are registered with add_gene report every
+    added or deleted transcript, every new sequence and every change of their FAS status, so the counters never have to
+    be recomputed by walking the library.
+    """
+
+    def __init__(self) -> None:
+        self.transcript_count: int = 0
+        # Transcripts for which Transcript.has_sequence is True.
+        self.sequence_transcript_count: int = 0
+        self.protein_count: int = 0
+        self.missing_sequence_count: int = 0
+        # Rows of the FAS matrices that still contain an unscored pair.
+        self.unscored_protein_count: int = 0
+        # Transcript and protein ids as well as the transcript ids of proteins point to the gene id.
+        self.gene_ids: Dict[str, str] = dict()
+        # Synonyms of a transcript point to its id.
+        self.synonyms: Dict[str, str] = dict()
+        self.biotypes: Dict[str, Set[str]] = dict()
+        # Genes that were added, removed or had their FAS scores changed since the last save of the FAS scores.
+        self.fas_changed_gene_ids: Set[str] = set()
+
+    def add_gene(self, gene: Gene) -> None:
+        gene.set_gene_index(self)
+        self.fas_changed_gene_ids.add(gene.get_id())
+        for transcript in gene.get_transcripts():
+            self.count_transcript(gene.get_id(), transcript, 1)
+        self.unscored_protein_count += gene.get_protein_count(False, True)
+
+    def remove_gene(self, gene: Gene) -> None:
+        for transcript in gene.get_transcripts():
+            self.count_transcript(gene.get_id(), transcript, -1)
+        self.unscored_protein_count -= gene.get_protein_count(False, True)
+        self.fas_changed_gene_ids.add(gene.get_id())
+        gene.set_gene_index(None)
+
+    def count_transcript(self, gene_id: str, transcript: Transcript, step: int) -> None:
+        """
+        Adds (step 1) or removes (step -1) a transcript of the gene gene_id.
+        """
+        self.transcript_count += step
+        if transcript.has_sequence():
+            self.sequence_transcript_count += step
+        id_list: List[str] = [transcript.get_id()]
+        if isinstance(transcript, Protein):
+            self.protein_count += step
+            if not transcript.has_sequence():
+                self.missing_sequence_count += step
+            id_list.append(transcript.get_id_transcript())
+        if step > 0:
+            for transcript_id in id_list:
+                self.gene_ids[transcript_id] = gene_id
+            for synonym in transcript.get_synonyms():
+                self.synonyms[synonym] = transcript.get_id()
+            self.biotypes.setdefault(transcript.get_biotype(), set()).add(transcript.get_id())
+        else:
+            for transcript_id in id_list:
+                if self.gene_ids.get(transcript_id) == gene_id:
+                    del self.gene_ids[transcript_id]
+            for synonym in transcript.get_synonyms():
+                if self.synonyms.get(synonym) == transcript.get_id():
+                    del self.synonyms[synonym]
+            self.biotypes.get(transcript.get_biotype(), set()).discard(transcript.get_id())
+
+    def get_gene_id(self, transcript_id: str) -> Optional[str]:
+        return self.gene_ids.get(self.resolve_synonym(transcript_id))
+
+    def resolve_synonym(self, transcript_id: str) -> str:
+        """
+        Returns the id of the transcript that transcript_id is a synonym of, or transcript_id itself.
+        """
+        if transcript_id in self.gene_ids:
+            return transcript_id
+        return self.synonyms.get(transcript_id, transcript_id)
+
+    def get_ids_by_biotype(self, biotype: str) -> Set[str]:
+        return self.biotypes.get(biotype, set())
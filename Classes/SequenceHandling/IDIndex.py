@@ -0,0 +1,152 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2023 Christian Bluemel
+#
+# This file is part of Spice.
+#
+#  IDIndex is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  IDIndex is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Spice.  If not, see <http://www.gnu.org/licenses/>.
+#
+#######################################################################
+
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.Gene import Gene
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+from Classes.SequenceHandling.Protein import Protein
+from Classes.WriteGuard.AtomicFile import AtomicFile
+
+
+class IDIndex:
+    """
+    Persisted id lookup of a library, stored as id_index.json next to the paths.json. It maps synonyms to transcript
+    ids and transcript ids to their gene, protein and annotation, so that an expression import reads a single file
+    instead of loading the library. The index remembers size and modification time of the transcript_info.json it was
+    built from and is rebuilt by load when the transcript info changed.
+    """
+
+    FILE_NAME: str = "id_index.json"
+
+    # Order of the values that are stored per transcript id.
+    FIELDS: List[str] = ["gene_id", "protein_id", "biotype", "tsl", "tags", "synonyms"]
+
+    def __init__(self,
+                 genes: Dict[str, List[str]],
+                 transcripts: Dict[str, List[Any]],
+                 synonyms: Dict[str, str],
+                 fingerprint: List[int]) -> None:
+        # Transcript ids of each gene in the order of Gene.get_transcripts.
+        self.genes: Dict[str, List[str]] = genes
+        self.transcripts: Dict[str, List[Any]] = transcripts
+        # Transcript id of every synonym and of every transcript id itself.
+        self.synonyms: Dict[str, str] = synonyms
+        self.fingerprint: List[int] = fingerprint
+
+    def __contains__(self, transcript_id: str) -> bool:
+        return transcript_id in self.transcripts
+
+    def __getitem__(self, transcript_id: str) -> List[Any]:
+        return self.transcripts[transcript_id]
+
+    def resolve_synonym(self, transcript_id: str) -> Optional[str]:
+        return self.synonyms.get(transcript_id)
+
+    def get_gene_id(self, transcript_id: str) -> str:
+        return self.transcripts[transcript_id][0]
+
+    def get_protein_id(self, transcript_id: str) -> str:
+        """
+        Returns the protein id of a transcript, an empty string for transcripts without protein.
+        """
+        return self.transcripts[transcript_id][1]
+
+    def get_biotype(self, transcript_id: str) -> str:
+        return self.transcripts[transcript_id][2]
+
+    def iter_genes(self) -> Iterator[Tuple[str, List[str]]]:
+        return iter(self.genes.items())
+
+    def save(self, pass_path: PassPath) -> None:
+        # Replaced atomically, concurrent imports may rebuild and read the index at the same time.
+        with AtomicFile(IDIndex.get_path(pass_path)) as f:
+            json.dump({"transcript_info": self.fingerprint,
+                       "genes": self.genes,
+                       "transcripts": self.transcripts,
+                       "synonyms": self.synonyms}, f)
+
+    @staticmethod
+    def get_path(pass_path: PassPath) -> str:
+        return os.path.join(pass_path["root"], IDIndex.FILE_NAME)
+
+    @staticmethod
+    def get_fingerprint(pass_path: PassPath) -> List[int]:
+        stat: os.stat_result = os.stat(pass_path["transcript_info"])
+        return [stat.st_mtime_ns, stat.st_size]
+
+    @staticmethod
+    def from_genes(genes: Iterable[Gene], pass_path: PassPath) -> "IDIndex":
+        """
+        Builds the index of the given genes. They have to match the transcript_info.json of the library.
+        """
+        gene_dict: Dict[str, List[str]] = dict()
+        transcript_dict: Dict[str, List[Any]] = dict()
+        synonym_dict: Dict[str, str] = dict()
+        for gene in genes:
+            gene_dict[gene.get_id()] = list()
+            for transcript in gene.get_transcripts():
+                if isinstance(transcript, Protein):
+                    transcript_id: str = transcript.get_id_transcript()
+                    protein_id: str = transcript.get_id()
+                else:
+                    transcript_id: str = transcript.get_id()
+                    protein_id: str = ""
+                gene_dict[gene.get_id()].append(transcript_id)
+                transcript_dict[transcript_id] = [transcript.get_id_gene(),
+                                                  protein_id,
+                                                  transcript.get_biotype(),
+                                                  transcript.get_transcript_support_level(),
+                                                  list(transcript.get_tags()),
+                                                  list(transcript.get_synonyms())]
+                synonym_dict[transcript_id] = transcript_id
+                for synonym in transcript.get_synonyms():
+                    synonym_dict[synonym] = transcript_id
+        return IDIndex(gene_dict, transcript_dict, synonym_dict, IDIndex.get_fingerprint(pass_path))
+
+    @staticmethod
+    def build(pass_path: PassPath) -> "IDIndex":
+        gene_assembly: Dict[str, Gene] = GeneAssembler.from_dict(*GeneAssembler.read_library(pass_path, ["info"]),
+                                                                 ["info"])
+        return IDIndex.from_genes(gene_assembly.values(), pass_path)
+
+    @staticmethod
+    def load(pass_path: PassPath) -> "IDIndex":
+        """
+        Reads the index of a library. A missing or outdated index is rebuilt from the transcript info and saved.
+        """
+        index_path: str = IDIndex.get_path(pass_path)
+        if os.path.exists(index_path):
+            with open(index_path, "r") as f:
+                index_dict: Dict[str, Any] = json.load(f)
+            if index_dict["transcript_info"] == IDIndex.get_fingerprint(pass_path):
+                return IDIndex(index_dict["genes"],
+                               index_dict["transcripts"],
+                               index_dict["synonyms"],
+                               index_dict["transcript_info"])
+        print("Building the transcript id index of the library.")
+        id_index: IDIndex = IDIndex.build(pass_path)
+        id_index.save(pass_path)
+        return id_index
@@ -23,6 +23,8 @@
 import yaml
 from typing import Any, Dict
 
+from Classes.WriteGuard.AtomicFile import AtomicFile
+
 
 class LibraryInfo:
 
@@ -39,12 +41,15 @@ class LibraryInfo:
     def __setitem__(self, key: str, item: Any) -> None:
         self.info_dict[key] = item
 
+    def __contains__(self, key: str) -> bool:
+        return key in self.info_dict
+
     def __str__(self) -> str:
         output: str = LibraryInfo.format_dict(self.info_dict)
         return output
 
     def save(self):
-        with open(self.path, "w") as f:
+        with AtomicFile(self.path) as f:
             yaml.dump(self.info_dict, f)
 
     def set_self_path(self, new_path: str):
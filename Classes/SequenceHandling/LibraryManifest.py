@@ -0,0 +1,163 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2023 Christian Bluemel
+#
+# This file is part of Spice.
+#
+#  LibraryManifest is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  LibraryManifest is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Spice.  If not, see <http://www.gnu.org/licenses/>.
+#
+#######################################################################
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from Classes.PassPath.PassPath import PassPath
+from Classes.WriteGuard.AtomicFile import AtomicFile
+
+
+class ManifestFile(AtomicFile):
+    """
+    AtomicFile that hashes the text written into it, so a library output gets its content hash without being read back.
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path, "w")
+        self.hasher = hashlib.sha256()
+
+    def __enter__(self) -> "ManifestFile":
+        super().__enter__()
+        return self
+
+    def write(self, text: str) -> None:
+        self.hasher.update(text.encode("utf-8"))
+        self.file.write(text)
+
+    def get_digest(self) -> str:
+        return self.hasher.hexdigest()
+
+
+class LibraryManifest:
+    """
+    Record of the files the library pipeline generated from the transcript data, stored as manifest.json in the library
+    root. Each entry holds the content hash, size, modification time and record count of an output together with a
+    fingerprint of the inputs it was generated from. The status of an output is checked from file metadata alone, the
+    output itself is only hashed again if its modification time changed while its size did not, e.g. after a copy.
+    """
+
+    FILE_NAME: str = "manifest.json"
+
+    # PassPath keys of the files each output is generated from.
+    INPUTS: Dict[str, List[str]] = {"transcript_fasta": ["transcript_info", "transcript_seq"],
+                                    "transcript_pairings": ["transcript_info", "fas_index", "fas_scores"],
+                                    "transcript_ids": ["transcript_info", "fas_index", "fas_scores"],
+                                    "transcript_binary": ["transcript_info", "transcript_seq", "fas_index",
+                                                          "fas_scores"]}
+
+    def __init__(self, pass_path: PassPath, entries: Dict[str, Dict[str, Any]]) -> None:
+        self.pass_path: PassPath = pass_path
+        self.entries: Dict[str, Dict[str, Any]] = entries
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def get_records(self, key: str) -> int:
+        return self.entries[key]["records"]
+
+    def add_entry(self, key: str, digest: str, records: int) -> None:
+        """
+        Records an output after it was written. Its inputs have to be saved already.
+        """
+        stat: os.stat_result = os.stat(self.pass_path[key])
+        self.entries[key] = {"sha256": digest,
+                             "size": stat.st_size,
+                             "mtime_ns": stat.st_mtime_ns,
+                             "records": records,
+                             "inputs": self.get_input_fingerprint(key)}
+
+    def is_current(self, key: str, records: Optional[int] = None) -> bool:
+        """
+        True if the output of key is unchanged since it was recorded and was generated from the current inputs.
+
+        :param records: Expected record count of the output. Not checked if None.
+        """
+        if key not in self.entries:
+            return False
+        entry: Dict[str, Any] = self.entries[key]
+        if records is not None and entry["records"] != records:
+            return False
+        if entry["inputs"] != self.get_input_fingerprint(key):
+            return False
+        if not os.path.exists(self.pass_path[key]):
+            return False
+        stat: os.stat_result = os.stat(self.pass_path[key])
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns != entry["mtime_ns"]:
+            if LibraryManifest.hash_file(self.pass_path[key]) != entry["sha256"]:
+                return False
+            entry["mtime_ns"] = stat.st_mtime_ns
+        return True
+
+    def get_input_fingerprint(self, key: str) -> str:
+        hasher = hashlib.sha256()
+        for input_key in LibraryManifest.INPUTS[key]:
+            hasher.update(json.dumps([input_key, LibraryManifest.get_stat(self.pass_path[input_key])]).encode("utf-8"))
+        return hasher.hexdigest()
+
+    def save(self) -> None:
+        with AtomicFile(LibraryManifest.get_path(self.pass_path)) as f:
+            json.dump(self.entries, f, indent=4)
+
+    @staticmethod
+    def get_stat(path: str) -> List[Any]:
+        """
+        Size and modification time of a file. For a directory those of all files in it, so the FAS score shards are
+        covered by a single input.
+        """
+        if not os.path.exists(path):
+            return []
+        if os.path.isdir(path):
+            stat_list: List[Any] = list()
+            for entry in sorted(os.scandir(path), key=lambda dir_entry: dir_entry.name):
+                if entry.is_file():
+                    stat_list.append([entry.name, entry.stat().st_mtime_ns, entry.stat().st_size])
+            return stat_list
+        stat: os.stat_result = os.stat(path)
+        return [stat.st_mtime_ns, stat.st_size]
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    @staticmethod
+    def get_path(pass_path: PassPath) -> str:
+        return os.path.join(pass_path["root"], LibraryManifest.FILE_NAME)
+
+    @staticmethod
+    def load(pass_path: PassPath) -> "LibraryManifest":
+        """
+        Reads the manifest of a library. Libraries without one get an empty manifest, so all outputs count as outdated.
+        """
+        manifest_path: str = LibraryManifest.get_path(pass_path)
+        if not os.path.exists(manifest_path):
+            return LibraryManifest(pass_path, dict())
+        with open(manifest_path, "r") as f:
+            return LibraryManifest(pass_path, json.load(f))
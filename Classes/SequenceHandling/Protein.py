@@ -22,18 +22,24 @@
 
 
 from Classes.SequenceHandling.Transcript import Transcript
-from Classes.GTFBoy.GTFBoy import GTFBoy
+from Classes.GTFBoy.GTFRecord import GTFRecord
 
-from typing import List, Dict, Any
+from typing import Dict, Any, Tuple
+
+import numpy as np
 
 
 class Protein(Transcript):
 
+    __slots__ = ("id_protein", "sequence", "cds")
+
     def __init__(self) -> None:
         super().__init__()
         self.id_protein: str = ""
         self.sequence: str = ""
         self.feature: str = "protein"
+        # Genomic (start, end) pairs of the CDS features in GTF order. One row per coding exon.
+        self.cds: np.ndarray = np.empty((0, 2), dtype=np.int64)
 
     def set_id(self, id_protein: str) -> None:
         """
@@ -52,6 +58,13 @@ class Protein(Transcript):
         """
         self.sequence = seq
 
+    def set_cds(self, cds) -> None:
+        """
+
+        :param cds: (start, end) pairs of all CDS features of the protein.
+        """
+        self.cds = np.asarray(cds, dtype=np.int64).reshape(-1, 2)
+
     def get_id(self) -> str:
         return self.id_protein
 
@@ -61,6 +74,18 @@ class Protein(Transcript):
     def get_sequence(self) -> str:
         return self.sequence
 
+    def get_cds(self) -> np.ndarray:
+        return self.cds
+
+    def get_genomic_span(self) -> Tuple[int, int]:
+        if len(self.cds) == 0:
+            return 0, 0
+        return int(self.cds[:, 0].min()), int(self.cds[:, 1].max())
+
+    def get_coding_length(self) -> int:
+        # GTF coordinates are 1-based and inclusive.
+        return int((self.cds[:, 1] - self.cds[:, 0] + 1).sum())
+
     def from_dict(self, input_dict: Dict[str, Any]) -> None:
         self.set_id(input_dict["_id"])
         self.set_sequence(input_dict["sequence"])
@@ -73,7 +98,9 @@ class Protein(Transcript):
         self.set_tags(input_dict["tags"])
         self.set_transcript_support_level(input_dict["tsl"])
         if "synonyms" in input_dict.keys():
-            self.synonyms = input_dict["synonyms"]
+            self.set_synonyms(input_dict["synonyms"])
+        if "cds" in input_dict.keys():
+            self.set_cds(input_dict["cds"])
 
     def to_dict(self) -> Dict[str, Any]:
         output: Dict[str, Any] = dict()
@@ -84,29 +111,25 @@ class Protein(Transcript):
         output["transcript_id"] = self.get_id_transcript()
         output["taxon_id"] = self.get_id_taxon()
         output["biotype"] = self.get_biotype()
-        output["tags"] = self.get_tags()
+        output["tags"] = list(self.get_tags())
         output["tsl"] = self.get_transcript_support_level()
-        output["synonyms"] = self.get_synonyms()
+        output["synonyms"] = list(self.get_synonyms())
+        output["cds"] = self.get_cds().tolist()
         return output
 
-    def from_gtf_line(self, gtf_split_line: List[str]) -> None:
-        for i in range(len(self.GTF_MASK)):
-            field_name: str = self.GTF_MASK[i]
-            entry: str = gtf_split_line[i]
-            if field_name == "feature":
-                self.set_feature("protein")
-            elif field_name == "attribute":
-                attribute_dict: Dict[str, str] = GTFBoy.build_attribute_dict(entry)
-                self.set_id(attribute_dict["protein_id"])
-                self.set_tags(attribute_dict["tag"].split(";"))
-                try:
-                    self.set_name(attribute_dict["transcript_name"])
-                except KeyError:
-                    self.set_name(".")
-                self.set_biotype(attribute_dict["transcript_biotype"])
-                self.set_id_gene(attribute_dict["gene_id"])
-                self.set_id_transcript(attribute_dict["transcript_id"])
-                self.set_transcript_support_level(int(attribute_dict["transcript_support_level"]))
+    def from_gtf_record(self, record: GTFRecord) -> None:
+        self.set_feature("protein")
+        attribute_dict: Dict[str, str] = record.attributes
+        self.set_id(attribute_dict["protein_id"])
+        self.set_tags(attribute_dict["tag"].split(";"))
+        try:
+            self.set_name(attribute_dict["transcript_name"])
+        except KeyError:
+            self.set_name(".")
+        self.set_biotype(attribute_dict["transcript_biotype"])
+        self.set_id_gene(attribute_dict["gene_id"])
+        self.set_id_transcript(attribute_dict["transcript_id"])
+        self.set_transcript_support_level(int(attribute_dict["transcript_support_level"]))
 
     def make_header_pair(self, other: Transcript) -> str:
         return self.make_header() + "\t" + other.make_header()
@@ -20,13 +20,21 @@
 #
 #######################################################################
 
-from Classes.GTFBoy.GTFBoy import GTFBoy
+from Classes.GTFBoy.GTFRecord import GTFRecord
 
-from typing import Dict, Any, List
+import sys
+from typing import Dict, Any, List, Tuple, Iterable
 
 
 class Transcript:
 
+    # Millions of transcripts are held in memory at once. Slots drop the per instance __dict__.
+    __slots__ = ("id_transcript", "name_transcript", "feature", "id_gene", "id_taxon",
+                 "biotype", "transcript_support_level", "tags", "synonyms")
+
+    # Shared taxon id objects. Unlike strings, large ints can not be interned with sys.intern.
+    TAXON_IDS: Dict[int, int] = dict()
+
     GTF_MASK: List[str] = ["seqname", "source", "feature",
                            "start", "end", "score",
                            "strand", "frame", "attribute"]
@@ -39,8 +47,8 @@ class Transcript:
         self.id_taxon: int = 0
         self.biotype: str = ""
         self.transcript_support_level: int = 6
-        self.tags: List[str] = list()
-        self.synonyms: List[str] = list()
+        self.tags: Tuple[str, ...] = tuple()
+        self.synonyms: Tuple[str, ...] = tuple()
 
     def __str__(self):
         output: str = self.get_id() + " " + self.get_biotype()
@@ -55,8 +63,11 @@ class Transcript:
     def set_sequence(self, seq: str) -> None:
         pass
 
-    def set_tags(self, tag_list: List[str]):
-        self.tags = tag_list
+    def set_tags(self, tag_list: Iterable[str]):
+        self.tags = tuple(sys.intern(tag) for tag in tag_list)
+
+    def set_synonyms(self, synonym_list: Iterable[str]):
+        self.synonyms = tuple(synonym_list)
 
     def set_id(self, id_transcript: str) -> None:
         """
@@ -73,7 +84,7 @@ class Transcript:
 
         :type id_taxon: int
         """
-        self.id_taxon = id_taxon
+        self.id_taxon = Transcript.TAXON_IDS.setdefault(id_taxon, id_taxon)
 
     def set_id_gene(self, id_protein: str) -> None:
         """
@@ -83,16 +94,16 @@ class Transcript:
         self.id_gene = id_protein
 
     def set_feature(self, feature: str) -> None:
-        self.feature = feature
+        self.feature = sys.intern(feature)
 
     def set_biotype(self, biotype: str) -> None:
-        self.biotype = biotype
+        self.biotype = sys.intern(biotype)
 
     def set_transcript_support_level(self, tsl: int):
         self.transcript_support_level = tsl
 
     def add_synonym(self, synonym: str):
-        self.synonyms.append(synonym)
+        self.synonyms = self.synonyms + (synonym,)
 
     def get_id(self) -> str:
         return self.id_transcript
@@ -115,7 +126,7 @@ class Transcript:
     def get_transcript_support_level(self) -> int:
         return self.transcript_support_level
 
-    def get_tags(self) -> List[str]:
+    def get_tags(self) -> Tuple[str, ...]:
         return self.tags
 
     def has_tag(self, tag: str) -> bool:
@@ -124,7 +135,7 @@ class Transcript:
     def get_sequence(self):
         return ""
 
-    def get_synonyms(self):
+    def get_synonyms(self) -> Tuple[str, ...]:
         return self.synonyms
 
     def from_dict(self, input_dict: Dict[str, Any]) -> None:
@@ -137,7 +148,7 @@ class Transcript:
         self.set_tags((input_dict["tags"]))
         self.set_transcript_support_level(input_dict["tsl"])
         if "synonyms" in input_dict.keys():
-            self.synonyms = input_dict["synonyms"]
+            self.set_synonyms(input_dict["synonyms"])
 
     def to_dict(self) -> Dict[str, Any]:
         output: Dict[str, Any] = dict()
@@ -147,29 +158,26 @@ class Transcript:
         output["gene_id"] = self.get_id_gene()
         output["taxon_id"] = self.get_id_taxon()
         output["biotype"] = self.get_biotype()
-        output["tags"] = self.get_tags()
+        output["tags"] = list(self.get_tags())
         output["tsl"] = self.get_transcript_support_level()
-        output["synonyms"] = self.get_synonyms()
+        output["synonyms"] = list(self.get_synonyms())
         return output
 
     def from_gtf_line(self, gtf_split_line: List[str]) -> None:
-        for i in range(len(self.GTF_MASK)):
-            field_name: str = self.GTF_MASK[i]
-            entry: str = gtf_split_line[i]
-
-            if field_name == "feature":
-                self.set_feature(entry)
-            elif field_name == "attribute":
-                attribute_dict: Dict[str, str] = GTFBoy.build_attribute_dict(entry)
-                self.set_id(attribute_dict["transcript_id"])
-                self.set_tags(attribute_dict["tag"].split(";"))
-                try:
-                    self.set_name(attribute_dict["transcript_name"])
-                except KeyError:
-                    self.set_name(".")
-                self.set_biotype(attribute_dict["transcript_biotype"])
-                self.set_id_gene(attribute_dict["gene_id"])
-                self.set_transcript_support_level(int(attribute_dict["transcript_support_level"]))
+        self.from_gtf_record(GTFRecord(gtf_split_line))
+
+    def from_gtf_record(self, record: GTFRecord) -> None:
+        self.set_feature(record.feature)
+        attribute_dict: Dict[str, str] = record.attributes
+        self.set_id(attribute_dict["transcript_id"])
+        self.set_tags(attribute_dict["tag"].split(";"))
+        try:
+            self.set_name(attribute_dict["transcript_name"])
+        except KeyError:
+            self.set_name(".")
+        self.set_biotype(attribute_dict["transcript_biotype"])
+        self.set_id_gene(attribute_dict["gene_id"])
+        self.set_transcript_support_level(int(attribute_dict["transcript_support_level"]))
 
     def make_header(self) -> str:
         return "|".join([self.get_id_gene(), self.get_id(), str(self.get_id_taxon())])
@@ -0,0 +1,149 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2023 Christian Bluemel
+#
+# This file is part of Spice.
+#
+#  StepGraph is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  StepGraph is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Spice.  If not, see <http://www.gnu.org/licenses/>.
+#
+#######################################################################
+
+from typing import Callable, Dict, List, Optional, Set
+
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+from Classes.SequenceHandling.LibraryInfo import LibraryInfo
+
+
+class LibraryStep:
+    """
+    One step of the library setup. The function works on the genes in memory and sets its own status in the library
+    info, saving is left to the StepGraph. It may return False if it did not change anything.
+    """
+
+    def __init__(self,
+                 status_key: str,
+                 title: str,
+                 done_message: str,
+                 function: Callable[[GeneAssembler, LibraryInfo, PassPath], Optional[bool]],
+                 requires: Optional[List[str]] = None,
+                 writes: Optional[List[str]] = None,
+                 reads: Optional[List[str]] = None) -> None:
+        self.status_key: str = status_key
+        self.title: str = title
+        self.done_message: str = done_message
+        self.function: Callable[[GeneAssembler, LibraryInfo, PassPath], Optional[bool]] = function
+        # Status keys of the steps whose results this step builds on.
+        self.requires: List[str] = list() if requires is None else requires
+        # Library components (seq, fas, info) the step changes in memory.
+        self.writes: List[str] = list() if writes is None else writes
+        # Library components the step reads from disk. If one of them is unsaved, the library is saved before the step
+        # runs.
+        self.reads: List[str] = list() if reads is None else reads
+
+
+class StepGraph:
+    """
+    Runs the steps of the library setup in the order they were added. A step runs if its status in the library info is
+    not set or if one of the steps it requires ran before it. The changed library components are only kept in memory
+    and saved at the checkpoints, after the steps that are given as checkpoints, before a step that reads an unsaved
+    component from disk and once after the last step. A checkpoint always saves all changed components. The info yaml
+    with the step status is written after the components, so an interrupted run resumes at the last checkpoint.
+    """
+
+    # Save order of the library components.
+    COMPONENTS: List[str] = ["seq", "fas", "info"]
+
+    def __init__(self,
+                 gene_assembler: GeneAssembler,
+                 library_info: LibraryInfo,
+                 pass_path: PassPath,
+                 checkpoints: Optional[Set[str]] = None) -> None:
+        self.gene_assembler: GeneAssembler = gene_assembler
+        self.library_info: LibraryInfo = library_info
+        self.pass_path: PassPath = pass_path
+        # Status keys of the steps after which the library is saved. None saves after every step.
+        self.checkpoints: Optional[Set[str]] = checkpoints
+        self.steps: Dict[str, LibraryStep] = dict()
+        # Components that were changed since the last checkpoint.
+        self.unsaved_components: Set[str] = set()
+
+    def add_step(self, step: LibraryStep) -> None:
+        for status_key in step.requires:
+            if status_key not in self.steps and status_key not in self.library_info["status"]:
+                raise ValueError("Step " + step.status_key + " requires unknown step " + status_key + ".")
+        self.steps[step.status_key] = step
+
+    def is_stale(self, step: LibraryStep, rerun_keys: Set[str]) -> bool:
+        if not self.library_info["status"].get(step.status_key, False):
+            return True
+        return any(status_key in rerun_keys for status_key in step.requires)
+
+    def run(self) -> List[str]:
+        """
+        Runs all stale steps and returns the status keys of those that changed the library.
+        """
+        rerun_keys: Set[str] = set()
+        for status_key, step in self.steps.items():
+            print(step.title)
+            if not self.is_stale(step, rerun_keys):
+                print(step.done_message)
+                continue
+            if any(component in self.unsaved_components for component in step.reads):
+                # The components depend on each other, e.g. the FAS scores hold the ids of the transcript info. Saving
+                # only some of them would leave an inconsistent library behind if the run is interrupted.
+                self.checkpoint()
+            # A step that returns False changed nothing, the steps that require it do not have to run for it.
+            if step.function(self.gene_assembler, self.library_info, self.pass_path) is not False:
+                rerun_keys.add(status_key)
+                self.unsaved_components.update(step.writes)
+            if self.checkpoints is None or status_key in self.checkpoints:
+                self.checkpoint()
+        self.checkpoint()
+        return [status_key for status_key in self.steps if status_key in rerun_keys]
+
+    def save_components(self, components: List[str]) -> None:
+        for component in StepGraph.COMPONENTS:
+            if component in components and component in self.unsaved_components:
+                if component == "seq":
+                    self.gene_assembler.save_seq(self.pass_path)
+                elif component == "fas":
+                    self.gene_assembler.save_fas(self.pass_path)
+                else:
+                    self.gene_assembler.save_info(self.pass_path)
+                self.unsaved_components.remove(component)
+
+    def checkpoint(self) -> None:
+        self.save_components(StepGraph.COMPONENTS)
+        self.library_info.save()
+
+    @staticmethod
+    def parse_checkpoints(checkpoint_arg: str, status_keys: List[str]) -> Optional[Set[str]]:
+        """
+        Turns a comma separated list of step numbers like '02,05' into the status keys of these steps. 'all' returns
+        None, which checkpoints after every step, 'none' only keeps the checkpoint after the last step.
+        """
+        if checkpoint_arg == "all":
+            return None
+        checkpoints: Set[str] = set()
+        if checkpoint_arg == "none":
+            return checkpoints
+        for step_number in checkpoint_arg.split(","):
+            matches: List[str] = [status_key for status_key in status_keys
+                                  if status_key.split("_")[0] == step_number.strip().zfill(2)]
+            if len(matches) == 0:
+                raise ValueError("Unknown library step for a checkpoint: " + step_number + ".")
+            checkpoints.update(matches)
+        return checkpoints
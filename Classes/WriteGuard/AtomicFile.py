@@ -0,0 +1,48 @@
+#!/bin/env python
+
+#######################################################################
+# Copyright (C) 2023 Christian Bluemel
+#
+# This file is part of Spice.
+#
+#  AtomicFile is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  AtomicFile is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Spice.  If not, see <http://www.gnu.org/licenses/>.
+#
+#######################################################################
+
+import os
+from typing import IO, Any
+
+
+class AtomicFile:
+    """
+    Writes into a temporary file next to the target path, which replaces the target once the with block is left without
+    an exception. Readers see either the old or the new content, never a partially written file.
+    """
+
+    def __init__(self, path: str, mode: str = "w") -> None:
+        self.path: str = path
+        self.mode: str = mode
+        self.temp_path: str = path + "." + str(os.getpid()) + ".tmp"
+        self.file = None
+
+    def __enter__(self) -> IO[Any]:
+        self.file = open(self.temp_path, self.mode)
+        return self.file
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.file.close()
+        if exc_type is None:
+            os.replace(self.temp_path, self.path)
+        else:
+            os.remove(self.temp_path)
@@ -20,10 +20,16 @@
 #
 #######################################################################
 
+import heapq
 import json
+import math
+import multiprocessing
 import os
+import subprocess
 import sys
-from typing import Dict, Any, List
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from tqdm import tqdm
 
 from Classes.PassPath.PassPath import PassPath
 from Classes.ReduxArgParse.ReduxArgParse import ReduxArgParse
@@ -36,7 +42,8 @@ RAW_SCRIPT_1 = """#!/bin/bash
 #SBATCH --output=/dev/null 
 #SBATCH --error=/dev/null
 #SBATCH --array={7}-{8}
-gene=$(awk FNR==$SLURM_ARRAY_TASK_ID "{5}/gene_ids{9}.txt")
+for gene in $(awk FNR==$SLURM_ARRAY_TASK_ID "{5}/gene_ids{9}.txt")
+do
 {0} {1} \\
 --pairings_path {12} \\
 --mode unpack \\
@@ -67,7 +74,8 @@ RAW_SCRIPT_2 = """; \\
 {0} {1} \\
 --mode delete \\
 --gene_id $gene \\
---out_dir {2}"""
+--out_dir {2}
+done"""
 
 RAW_SCRIPT_3 = """#!/bin/bash
 #SBATCH --partition={2}
@@ -76,6 +84,10 @@ RAW_SCRIPT_3 = """#!/bin/bash
 #SBATCH --output=/dev/null 
 #SBATCH --error=/dev/null
 {0} {1} \\
+--mode merge \\
+--anno_dir {3} \\
+&& \\
+{0} {1} \\
 --mode integrate \\
 --anno_dir {3}
 """
@@ -108,6 +120,15 @@ DO_ANNO_SCRIPT = """#!/bin/bash
 
 class FASJobAssistant:
 
+    # Maximum number of tasks in one SLURM job array.
+    ARRAY_SIZE: int = 1000
+    # Number of tasks if neither a task count nor a wall time is given.
+    TASK_COUNT: int = 1000
+    # Rough throughput of fas.run in residues per second, counted as the pair count times the mean sequence length.
+    RESIDUES_PER_SECOND: float = 250.0
+    # Seconds per gene for unpacking, starting fas.run and concatenating the output.
+    GENE_OVERHEAD: float = 5.0
+
     def __init__(self, pass_path: PassPath, memory: str, partitions: List[str], fas_dir: str, out_dir: str,
                  anno_partitions: List[str], anno_cpus: int, anno_tools: str):
         self.fas_anno: str = os.path.join(fas_dir, "fas.doAnno")
@@ -129,23 +150,27 @@ class FASJobAssistant:
         self.anno_cpus: str = str(anno_cpus)
         self.phyloprofile_path: str = self.lib_pass_path["transcript_ids"]
 
-    def make_fas_run_jobs(self):
-        gene_count: int = FASJobAssistant.make_gene_txt(self.lib_pass_path)
-
-        with open(os.path.join(self.lib_pass_path["transcript_data"], "genes.txt"), "r") as f:
-            gene_ids: List[str] = f.read().split("\n")
-
-        jobs_ranges = FASJobAssistant.start_stop_range(gene_count, 1000)
-        for i, entry in enumerate(jobs_ranges):
-            start = 1
-            if (entry[1] + 1) % 1000 == 0:
-                stop = 1000
-            else:
-                stop = ((entry[1] + 1) % 1000)
-            output_ids = gene_ids[entry[0]:entry[1] + 1]
+    def make_fas_run_jobs(self, task_count: Optional[int] = None, wall_time: Optional[float] = None):
+        """
+        Packs the genes into array tasks of about equal estimated run time, see pack_genes. Each task runs fas.run for
+        its genes one after the other. The number of tasks is either given directly or derived from a target wall time
+        per task in minutes, by default there are TASK_COUNT tasks.
+        """
+        FASJobAssistant.make_gene_txt(self.lib_pass_path)
+        gene_costs: Dict[str, float] = FASJobAssistant.estimate_gene_costs(self.lib_pass_path)
+        if task_count is None:
+            task_count = FASJobAssistant.get_task_count(gene_costs, wall_time)
+        tasks: List[List[str]] = FASJobAssistant.pack_genes(gene_costs, task_count)
+        if len(tasks) > 0:
+            task_costs: List[float] = [sum(gene_costs[gene_id] for gene_id in task) for task in tasks]
+            print("Packed", len(gene_costs), "genes into", len(tasks), "tasks. Estimated task run time:",
+                  round(min(task_costs) / 60, 1), "to", round(max(task_costs) / 60, 1), "minutes.")
+
+        for i, start in enumerate(range(0, len(tasks), FASJobAssistant.ARRAY_SIZE)):
+            array_tasks: List[List[str]] = tasks[start:start + FASJobAssistant.ARRAY_SIZE]
             with open(os.path.join(self.lib_pass_path["fas_temp"], "gene_ids{0}.txt".format(str(i))),
                       "w") as gene_chunk:
-                gene_chunk.write("\n".join(output_ids))
+                gene_chunk.write("\n".join([" ".join(task) for task in array_tasks]))
 
             output = RAW_SCRIPT_1.format(self.python_path,  # 0
                                          self.fas_result_handler,  # 1
@@ -154,8 +179,8 @@ class FASJobAssistant:
                                          self.lib_pass_path["fas_data"],  # 4
                                          self.lib_pass_path["fas_temp"],  # 5
                                          self.phyloprofile_path,  # 6
-                                         str(start),  # 7
-                                         str(stop),  # 8
+                                         "1",  # 7
+                                         str(len(array_tasks)),  # 8
                                          str(i),  # 9
                                          self.partitions,  # 10
                                          self.memory,  # 11
@@ -217,19 +242,199 @@ class FASJobAssistant:
         return len(genes_list)
 
     @staticmethod
-    def start_stop_range(length: int, chunk_size: int):
-        for i in range(0, length, chunk_size):
-            yield i, min(i + chunk_size - 1, length)
+    def estimate_gene_costs(pass_path: PassPath) -> Dict[str, float]:
+        """
+        Estimates the fas.run time in seconds of each gene in the pairings. The work of a gene grows with the number of
+        its protein pairs times their length.
+        """
+        with open(pass_path["transcript_pairings"], "r") as f:
+            pairings_dict: Dict[str, str] = json.load(f)
+        with open(pass_path["transcript_seq"], "r") as f:
+            seq_dict: Dict[str, Dict[str, str]] = json.load(f)
+
+        gene_costs: Dict[str, float] = dict()
+        for gene_id, pairings in pairings_dict.items():
+            pair_count: int = pairings.count("\n") + 1 if len(pairings) > 0 else 0
+            sequences: List[str] = list(seq_dict.get(gene_id, dict()).values())
+            mean_length: float = sum(len(sequence) for sequence in sequences) / max(len(sequences), 1)
+            gene_costs[gene_id] = (FASJobAssistant.GENE_OVERHEAD
+                                   + pair_count * mean_length / FASJobAssistant.RESIDUES_PER_SECOND)
+        return gene_costs
+
+    @staticmethod
+    def get_task_count(gene_costs: Dict[str, float], wall_time: Optional[float] = None) -> int:
+        """
+        :param wall_time: Target run time of a task in minutes. If None, TASK_COUNT tasks are used.
+        """
+        if wall_time is None:
+            task_count: int = FASJobAssistant.TASK_COUNT
+        else:
+            task_count: int = math.ceil(sum(gene_costs.values()) / (wall_time * 60))
+        return max(1, min(task_count, len(gene_costs)))
+
+    @staticmethod
+    def pack_genes(gene_costs: Dict[str, float], task_count: int) -> List[List[str]]:
+        """
+        Longest processing time first packing: the genes are handed out from the most to the least expensive, each to
+        the task with the lowest estimated cost so far. The tasks are returned from the most to the least expensive,
+        so that the array starts the long tasks first, and their genes in the order they were packed.
+        """
+        task_count = min(task_count, len(gene_costs))
+        tasks: List[List[str]] = [list() for _ in range(task_count)]
+        task_heap: List[Tuple[float, int]] = [(0.0, i) for i in range(task_count)]
+        for gene_id in sorted(gene_costs, key=lambda key: gene_costs[key], reverse=True):
+            task_cost, i = heapq.heappop(task_heap)
+            tasks[i].append(gene_id)
+            heapq.heappush(task_heap, (task_cost + gene_costs[gene_id], i))
+        task_heap.sort(reverse=True)
+        return [tasks[i] for _, i in task_heap]
+
+
+def run_command(command: List[str]) -> int:
+    """
+    Default command runner of the LocalFASRunner. Like in the SLURM jobs the output of the commands is discarded.
+    """
+    return subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+
+
+class LocalFASRunner:
+    """
+    Runs the pipeline of the SLURM jobs on the local machine. Up to workers genes are processed at the same time, the
+    longest genes first. Each gene keeps its own result files, which are merged and integrated into the library at the
+    end. Genes with a failing command are written to the retry list, which a later run can be restricted to.
+
+    The commands are executed by the command runner, a picklable function that takes the command as list and returns
+    its exit code. It can be replaced, e.g. by one that stands in for fas.run.
+    """
+
+    RETRY_FILE: str = "retry_gene_ids.txt"
+
+    def __init__(self, job_assistant: FASJobAssistant, workers: int,
+                 command_runner: Callable[[List[str]], int] = run_command):
+        self.job_assistant: FASJobAssistant = job_assistant
+        self.lib_pass_path: PassPath = job_assistant.lib_pass_path
+        self.workers: int = workers
+        self.command_runner: Callable[[List[str]], int] = command_runner
+
+    def get_retry_path(self) -> str:
+        return os.path.join(self.lib_pass_path["fas_temp"], LocalFASRunner.RETRY_FILE)
+
+    def make_annotation_commands(self) -> List[List[str]]:
+        fas_data: str = self.lib_pass_path["fas_data"]
+        return [[self.job_assistant.fas_anno,
+                 "-i", self.lib_pass_path["transcript_fasta"],
+                 "-o", fas_data,
+                 "-t", self.job_assistant.anno_tools,
+                 "-n", "annotations",
+                 "--cpus", self.job_assistant.anno_cpus],
+                [self.job_assistant.python_path, self.job_assistant.get_domain_importance,
+                 "-i", os.path.join(fas_data, "annotations.json"),
+                 "-o", fas_data],
+                [self.job_assistant.python_path, self.job_assistant.restructure_anno,
+                 "-i", os.path.join(fas_data, "annotations.json"),
+                 "-o", os.path.join(fas_data, "architectures")]]
+
+    def make_run_commands(self, gene_id: str) -> List[List[str]]:
+        fas_temp: str = self.lib_pass_path["fas_temp"]
+        annotation_fasta: str = os.path.join(self.lib_pass_path["transcript_data"], "annotations.fasta")
+        return [[self.job_assistant.python_path, self.job_assistant.fas_result_handler,
+                 "--pairings_path", self.lib_pass_path["transcript_pairings"],
+                 "--mode", "unpack",
+                 "--gene_id", gene_id,
+                 "--out_dir", fas_temp],
+                [self.job_assistant.fas_run,
+                 "--seed", annotation_fasta,
+                 "--query", annotation_fasta,
+                 "--annotation_dir", self.lib_pass_path["fas_data"],
+                 "--out_dir", fas_temp,
+                 "--bidirectional",
+                 "--pairwise", os.path.join(fas_temp, gene_id + ".tsv"),
+                 "--out_name", gene_id,
+                 "--tsv",
+                 "--phyloprofile", self.job_assistant.phyloprofile_path,
+                 "--empty_as_1",
+                 "--featuretypes", self.lib_pass_path["fas_annoTools"]]]
+
+    def make_concat_commands(self, gene_id: str) -> List[List[str]]:
+        return [[self.job_assistant.python_path, self.job_assistant.fas_result_handler,
+                 "--mode", "concat",
+                 "--gene_id", gene_id,
+                 "--out_dir", self.lib_pass_path["fas_temp"],
+                 "--anno_dir", self.lib_pass_path["fas_data"]],
+                [self.job_assistant.python_path, self.job_assistant.fas_result_handler,
+                 "--mode", "delete",
+                 "--gene_id", gene_id,
+                 "--out_dir", self.lib_pass_path["fas_temp"]]]
+
+    def make_final_commands(self) -> List[List[str]]:
+        return [[self.job_assistant.python_path, self.job_assistant.fas_result_handler,
+                 "--mode", mode,
+                 "--anno_dir", self.lib_pass_path["fas_data"]] for mode in ["merge", "integrate"]]
+
+    def annotate(self) -> bool:
+        for command in self.make_annotation_commands():
+            if self.command_runner(command) != 0:
+                print("Annotation command failed:", " ".join(command))
+                return False
+        return True
+
+    def run(self, retry: bool = False) -> List[str]:
+        """
+        Scores all genes of the pairings or, with retry, only those of the retry list. Returns the genes that failed.
+        """
+        self.job_assistant.make_fas_run_output()
+        gene_costs: Dict[str, float] = FASJobAssistant.estimate_gene_costs(self.lib_pass_path)
+        if retry:
+            with open(self.get_retry_path(), "r") as f:
+                retry_ids: List[str] = [gene_id for gene_id in f.read().split("\n") if len(gene_id) > 0]
+            gene_costs = {gene_id: gene_costs[gene_id] for gene_id in retry_ids if gene_id in gene_costs}
+        gene_ids: List[str] = sorted(gene_costs, key=lambda gene_id: gene_costs[gene_id], reverse=True)
+        task_list: List[Tuple[str, List[List[str]], Callable[[List[str]], int]]] = [
+            (gene_id, self.make_run_commands(gene_id) + self.make_concat_commands(gene_id), self.command_runner)
+            for gene_id in gene_ids]
+
+        failed_ids: List[str] = list()
+        with multiprocessing.Pool(self.workers) as pool:
+            for gene_id, success in tqdm(pool.imap_unordered(LocalFASRunner.run_gene, task_list),
+                                         ncols=100,
+                                         total=len(task_list),
+                                         desc="FAS run progress"):
+                if not success:
+                    failed_ids.append(gene_id)
+
+        with open(self.get_retry_path(), "w") as f:
+            f.write("\n".join(failed_ids))
+        if len(failed_ids) > 0:
+            print(len(failed_ids), "genes failed. They are listed in", self.get_retry_path() + ".")
+        for command in self.make_final_commands():
+            if self.command_runner(command) != 0:
+                print("FAS result command failed:", " ".join(command))
+                break
+        return failed_ids
+
+    @staticmethod
+    def run_gene(task: Tuple[str, List[List[str]], Callable[[List[str]], int]]) -> Tuple[str, bool]:
+        """
+        Runs the commands of a gene one after the other and stops at the first one that fails.
+        """
+        gene_id, commands, command_runner = task
+        for command in commands:
+            if command_runner(command) != 0:
+                return gene_id, False
+        return gene_id, True
 
 
 def main():
     argument_parser: ReduxArgParse = ReduxArgParse(["--Lib_dir", "--memory", "--partitions",
                                                     "--dir_fas", "--outdir",
-                                                    "--anno_partitions", "--Anno_cpus", "--tools_anno"],
-                                                   [str, str, str, str, str, str, int, str],
+                                                    "--anno_partitions", "--Anno_cpus", "--tools_anno",
+                                                    "--jobs", "--wall_time", "--backend", "--Workers", "--retry"],
+                                                   [str, str, str, str, str, str, int, str, int, float, str, int,
+                                                    None],
                                                    ["store", "store", "store", "store", "store",
-                                                    "store", "store", "store"],
-                                                   [1, 1, "*", 1, 1, "*", 1, 1],
+                                                    "store", "store", "store", "store", "store", "store", "store",
+                                                    "store_true"],
+                                                   [1, 1, "*", 1, 1, "*", 1, 1, None, None, None, None, None],
                                                    ["Path to a config file of a library.",
                                                     "Required memory specified in the SLURM script.",
                                                     "Set of partitions to be used for the job.",
@@ -237,16 +442,37 @@ def main():
                                                     "Directory to which the jobs will be saved.",
                                                     "Partitions that shall be used for the annotation job.",
                                                     "Number of CPUs that shall be used for the annotation job.",
-                                                    "Path to the directory containing the annotation tools."])
+                                                    "Path to the directory containing the annotation tools.",
+                                                    """Number of array tasks the genes are packed into. Tasks get 
+                                                    about the same estimated FAS run time.""",
+                                                    """Target run time of an array task in minutes. Used to derive 
+                                                    the number of tasks if --jobs is not given. Without both, 
+                                                    1000 tasks are used.""",
+                                                    """'slurm' (default) writes SLURM job arrays, 'local' runs the 
+                                                    annotation and the FAS runs on this machine.""",
+                                                    "Number of parallel fas.run processes of the local backend.",
+                                                    """Local backend only. Skips the annotation and only runs the 
+                                                    genes that failed in the last local run."""])
     argument_parser.generate_parser()
     argument_parser.execute()
     argument_dict: Dict[str, Any] = argument_parser.get_args()
     argument_dict['Lib_dir'] = argument_dict['Lib_dir'][0]
-    argument_dict['memory'] = argument_dict['memory'][0]
     argument_dict['dir_fas'] = argument_dict['dir_fas'][0]
-    argument_dict['outdir'] = argument_dict['outdir'][0]
     argument_dict['Anno_cpus'] = argument_dict['Anno_cpus'][0]
     argument_dict['tools_anno'] = argument_dict['tools_anno'][0]
+    if argument_dict['backend'] is None:
+        argument_dict['backend'] = "slurm"
+    if argument_dict['Workers'] is None:
+        argument_dict['Workers'] = 1
+    # Only the SLURM backend needs the memory, partitions and an output directory for the jobs.
+    if argument_dict['backend'] == "slurm":
+        argument_dict['memory'] = argument_dict['memory'][0]
+        argument_dict['outdir'] = argument_dict['outdir'][0]
+    else:
+        argument_dict['memory'] = ""
+        argument_dict['outdir'] = ""
+        argument_dict['partitions'] = list()
+        argument_dict['anno_partitions'] = list()
 
     with open(os.path.join(argument_dict['Lib_dir'], "paths.json"), "r") as f:
         lib_pass_path: PassPath = PassPath(json.load(f))
@@ -260,9 +486,17 @@ def main():
                                                       argument_dict['Anno_cpus'],
                                                       argument_dict['tools_anno'])
 
-    fas_job_assist.make_fas_run_jobs()
-    fas_job_assist.make_fas_run_output()
-    fas_job_assist.make_fas_do_anno_jobs()
+    if argument_dict['backend'] == "local":
+        local_runner: LocalFASRunner = LocalFASRunner(fas_job_assist, argument_dict['Workers'])
+        if not argument_dict['retry'] and not local_runner.annotate():
+            return
+        local_runner.run(argument_dict['retry'])
+    elif argument_dict['backend'] == "slurm":
+        fas_job_assist.make_fas_run_jobs(argument_dict['jobs'], argument_dict['wall_time'])
+        fas_job_assist.make_fas_run_output()
+        fas_job_assist.make_fas_do_anno_jobs()
+    else:
+        raise ValueError("Unknown backend '" + argument_dict['backend'] + "'. Choose from slurm, local.")
 
 
 if __name__ == "__main__":
@@ -21,14 +21,109 @@
 #######################################################################
 
 import json
+import multiprocessing
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
 
+from Classes.FASTools.FASIntegrator import FASIntegrator
+from Classes.FASTools.FASScoreCache import FASScoreCache
 from Classes.PassPath.PassPath import PassPath
 from Classes.ReduxArgParse.ReduxArgParse import ReduxArgParse
-from Classes.SequenceHandling.GeneAssembler import GeneAssembler
 from Classes.SequenceHandling.LibraryInfo import LibraryInfo
-from Classes.WriteGuard.WriteGuard import WriteGuard
+from Classes.WriteGuard.AtomicFile import AtomicFile
+
+# Directory in the annotation directory that holds the FAS results of each gene.
+RESULT_DIR: str = "fas_results"
+
+PHYLOPROFILE_HEADER: str = "geneID\tncbiID\torthoID\tFAS_F\tFAS_B\n"
+
+# Size and modification time of the phyloprofile files that were already integrated, by file name.
+INTEGRATED_FILE: str = "integrated.json"
+
+# Suffix of the result files of a gene and the combined file they are merged into.
+RESULT_FILES: List[Tuple[str, str]] = [(".phyloprofile", "fas.phyloprofile"),
+                                       ("_forward.domains", "forward.domains"),
+                                       ("_reverse.domains", "reverse.domains")]
+
+
+def get_result_dir(anno_dir: str) -> str:
+    return os.path.join(anno_dir, RESULT_DIR)
+
+
+def iter_result_shards(anno_dir: str, suffix: str) -> Iterator[str]:
+    """
+    Paths of the result files with the given suffix, sorted by gene id.
+    """
+    result_dir: str = get_result_dir(anno_dir)
+    if not os.path.isdir(result_dir):
+        return
+    for file_name in sorted(os.listdir(result_dir)):
+        if file_name.endswith(suffix):
+            yield os.path.join(result_dir, file_name)
+
+
+def merge_results(task: Tuple[str, str, str]) -> int:
+    """
+    Builds one combined file from the result files of all genes, in the order of the gene ids. The header of the
+    phyloprofile files is only written once. Rows of an existing combined file, e.g. from a run before the results
+    were kept per gene, are carried over first for the genes that have no result file. Returns the number of merged
+    genes.
+    """
+    anno_dir, suffix, combined_name = task
+    combined_path: str = os.path.join(anno_dir, combined_name)
+    shard_paths: List[str] = list(iter_result_shards(anno_dir, suffix))
+    shard_gene_ids: Set[str] = {os.path.basename(shard_path)[:-len(suffix)] for shard_path in shard_paths}
+    kept_gene_ids: Set[str] = set()
+    with AtomicFile(combined_path) as f_out:
+        if suffix == ".phyloprofile":
+            f_out.write(PHYLOPROFILE_HEADER)
+        if os.path.exists(combined_path):
+            with open(combined_path, "r") as f_in:
+                for line in f_in:
+                    # Skips the header, comments and empty lines.
+                    if line == PHYLOPROFILE_HEADER or line.startswith("#") or len(line.strip()) == 0:
+                        continue
+                    gene_id: str = line.split("|")[0]
+                    if gene_id not in shard_gene_ids:
+                        f_out.write(line if line.endswith("\n") else line + "\n")
+                        kept_gene_ids.add(gene_id)
+        for shard_path in shard_paths:
+            with open(shard_path, "r") as f_in:
+                if suffix == ".phyloprofile":
+                    f_out.write("\n".join(f_in.read().split("\n")[1:]))
+                else:
+                    f_out.write(f_in.read())
+    return len(shard_gene_ids) + len(kept_gene_ids)
+
+
+def get_pending_results(anno_dir: str) -> Dict[str, str]:
+    """
+    Phyloprofile files of the genes whose results were added or changed since the last integration, by gene id.
+    """
+    integrated_dict: Dict[str, List[int]] = load_integrated(anno_dir)
+    pending_dict: Dict[str, str] = dict()
+    for shard_path in iter_result_shards(anno_dir, ".phyloprofile"):
+        stat: os.stat_result = os.stat(shard_path)
+        if integrated_dict.get(os.path.basename(shard_path)) != [stat.st_mtime_ns, stat.st_size]:
+            pending_dict[os.path.basename(shard_path)[:-len(".phyloprofile")]] = shard_path
+    return pending_dict
+
+
+def load_integrated(anno_dir: str) -> Dict[str, List[int]]:
+    integrated_path: str = os.path.join(get_result_dir(anno_dir), INTEGRATED_FILE)
+    if not os.path.exists(integrated_path):
+        return dict()
+    with open(integrated_path, "r") as f:
+        return json.load(f)
+
+
+def save_integrated(anno_dir: str, result_paths: List[str]) -> None:
+    integrated_dict: Dict[str, List[int]] = load_integrated(anno_dir)
+    for result_path in result_paths:
+        stat: os.stat_result = os.stat(result_path)
+        integrated_dict[os.path.basename(result_path)] = [stat.st_mtime_ns, stat.st_size]
+    with AtomicFile(os.path.join(get_result_dir(anno_dir), INTEGRATED_FILE)) as f:
+        json.dump(integrated_dict, f)
 
 
 def main():
@@ -40,7 +135,7 @@ def main():
                                                     "Gene id to operate on.",
                                                     "Directory the FAS results will get stored in.",
                                                     """What operation shall be done on the results? 
-                                                    'unpack', 'concat' or 'delete'""",
+                                                    'unpack', 'concat', 'delete', 'merge' or 'integrate'""",
                                                     """Annotation directory that also contains
                                                      the concatenated FAS index JSON file."""])
 
@@ -54,70 +149,46 @@ def main():
         with open(os.path.join(argument_dict["out_dir"], argument_dict['gene_id'] + ".tsv"), "w") as f:
             f.write(gene_id_txt)
     elif argument_dict['mode'] == "delete":
-        os.remove(os.path.join(argument_dict["out_dir"], argument_dict['gene_id'] + ".tsv"))
-        os.remove(os.path.join(argument_dict["out_dir"], argument_dict['gene_id'] + "_forward.domains"))
-        os.remove(os.path.join(argument_dict["out_dir"], argument_dict['gene_id'] + "_reverse.domains"))
-        os.remove(os.path.join(argument_dict["out_dir"], argument_dict['gene_id'] + "_config.yml"))
-        os.remove(os.path.join(argument_dict["out_dir"], argument_dict['gene_id'] + ".phyloprofile"))
+        # The result files are already gone if the gene was concatenated.
+        for suffix in [".tsv", "_forward.domains", "_reverse.domains", "_config.yml", ".phyloprofile"]:
+            if os.path.exists(os.path.join(argument_dict["out_dir"], argument_dict['gene_id'] + suffix)):
+                os.remove(os.path.join(argument_dict["out_dir"], argument_dict['gene_id'] + suffix))
     elif argument_dict['mode'] == "concat":
-        with WriteGuard(os.path.join(argument_dict["anno_dir"], "fas.phyloprofile"), argument_dict["anno_dir"]):
-            with open(os.path.join(argument_dict["out_dir"], argument_dict['gene_id'] + ".phyloprofile"), "r") as f_in:
-                fas_scores: str = "\n".join(f_in.read().split("\n")[1:])
-            with open(os.path.join(argument_dict["anno_dir"], "fas.phyloprofile"), "a") as f_out:
-                f_out.write(fas_scores)
-        with WriteGuard(os.path.join(argument_dict["anno_dir"], "forward.domains"), argument_dict["anno_dir"]):
-            with open(os.path.join(argument_dict["out_dir"],
-                                   argument_dict['gene_id'] + "_forward.domains"), "r") as f_in:
-                domains_input: str = f_in.read()
-                with open(os.path.join(argument_dict["anno_dir"], "forward.domains"), "a") as f_out:
-                    f_out.write(domains_input)
-        with WriteGuard(os.path.join(argument_dict["anno_dir"], "reverse.domains"), argument_dict["anno_dir"]):
-            with open(os.path.join(argument_dict["out_dir"],
-                                   argument_dict['gene_id'] + "_reverse.domains"), "r") as f_in:
-                domains_input: str = f_in.read()
-                with open(os.path.join(argument_dict["anno_dir"], "reverse.domains"), "a") as f_out:
-                    f_out.write(domains_input)
+        # Each gene keeps its own result files, so no lock is needed. They are moved in one rename each, a gene is
+        # never seen half written.
+        os.makedirs(get_result_dir(argument_dict["anno_dir"]), exist_ok=True)
+        for suffix, _ in RESULT_FILES:
+            os.replace(os.path.join(argument_dict["out_dir"], argument_dict['gene_id'] + suffix),
+                       os.path.join(get_result_dir(argument_dict["anno_dir"]), argument_dict['gene_id'] + suffix))
+    elif argument_dict['mode'] == "merge":
+        task_list: List[Tuple[str, str, str]] = [(argument_dict["anno_dir"], suffix, combined_name)
+                                                 for suffix, combined_name in RESULT_FILES]
+        with multiprocessing.Pool(len(task_list)) as pool:
+            gene_counts: List[int] = pool.map(merge_results, task_list)
+        print("Merged the FAS results of", gene_counts[0], "genes.")
     elif argument_dict['mode'] == "integrate":
         lib_path_dir = os.path.join("/".join(argument_dict["anno_dir"].split("/")[:-1]), "paths.json")
         with open(lib_path_dir, "r") as f:
             path_dict = json.load(f)
         pass_path: PassPath = PassPath(path_dict)
         lib_info: LibraryInfo = LibraryInfo(pass_path["info"])
-        gene_assembler: GeneAssembler = GeneAssembler(lib_info["info"]["species"],
-                                                      str(lib_info["info"]["taxon_id"]))
-        gene_assembler.load(pass_path)
-        with open(os.path.join(argument_dict["anno_dir"], "fas.phyloprofile")) as f_in:
-            fas_score_list: List[str] = f_in.read().split("\n")[1:]
-        fas_scores_dict: Dict[str, Dict[str, Dict[str, float]]] = dict()
-        for line in fas_score_list:
-            if len(line) == 0:
-                continue
-            split_line: List[str] = line.split("\t")
-            seed: str = split_line[0]
-            query: str = split_line[2]
-            fas_1: float = float(split_line[3])
-            fas_2: float = float(split_line[4])
-            split_seed: List[str] = seed.split("|")
-            split_query: List[str] = query.split("|")
-            gene_id: str = split_seed[0]
-            seed_prot_id: str = split_seed[1]
-            query_prot_id: str = split_query[1]
-            if gene_id not in fas_scores_dict.keys():
-                fas_scores_dict[gene_id] = dict()
-            if seed_prot_id not in fas_scores_dict[gene_id].keys():
-                fas_scores_dict[gene_id][seed_prot_id] = dict()
-            if query_prot_id not in fas_scores_dict[gene_id].keys():
-                fas_scores_dict[gene_id][query_prot_id] = dict()
-            fas_scores_dict[gene_id][seed_prot_id][query_prot_id] = fas_2
-            fas_scores_dict[gene_id][query_prot_id][seed_prot_id] = fas_1
-
-        for gene in gene_assembler.get_genes():
-            if gene.get_id() in fas_scores_dict.keys():
-                for prot_id_1 in fas_scores_dict[gene.get_id()].keys():
-                    for prot_id_2 in fas_scores_dict[gene.get_id()][prot_id_1].keys():
-                        gene.get_fas_dict()[prot_id_1][prot_id_2] = fas_scores_dict[gene.get_id()][prot_id_1][prot_id_2]
-
-        gene_assembler.save_fas(pass_path)
+        fas_score_cache: Optional[FASScoreCache] = None
+        if "fas_cache" in lib_info and lib_info["fas_cache"] is not None:
+            fas_score_cache = FASScoreCache(lib_info["fas_cache"]["path"],
+                                            lib_info["info"]["fas_mode"],
+                                            lib_info["fas_cache"]["tools_version"])
+        fas_integrator: FASIntegrator = FASIntegrator(pass_path, fas_score_cache)
+        if os.path.isdir(get_result_dir(argument_dict["anno_dir"])):
+            # Only genes that finished since the last integration are added, so this can run while jobs are running.
+            pending_dict: Dict[str, str] = get_pending_results(argument_dict["anno_dir"])
+            row_count: int = fas_integrator.integrate_genes(pending_dict)
+            save_integrated(argument_dict["anno_dir"], list(pending_dict.values()))
+            print("Integrated", row_count, "FAS score rows of", len(pending_dict), "genes.")
+        else:
+            row_count: int = fas_integrator.integrate_file(os.path.join(argument_dict["anno_dir"], "fas.phyloprofile"))
+            print("Integrated", row_count, "FAS score rows.")
+        if fas_score_cache is not None:
+            fas_score_cache.close()
 
 
 if __name__ == "__main__":
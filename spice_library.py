@@ -23,23 +23,30 @@
 from Classes.ReduxArgParse.ReduxArgParse import ReduxArgParse
 from Classes.API.ensembl_mod.LocalEnsembl import LocalEnsembl
 from Classes.FASTools.FASModeHex import FASModeHex
+from Classes.FASTools.FASScoreCache import FASScoreCache
 from Classes.SequenceHandling.Gene import Gene
 from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+from Classes.SequenceHandling.IDIndex import IDIndex
+from Classes.SequenceHandling.FASMatrix import FASMatrix
 from Classes.SequenceHandling.LibraryInfo import LibraryInfo
+from Classes.SequenceHandling.LibraryManifest import LibraryManifest, ManifestFile
 from Classes.SequenceHandling.Protein import Protein
 from Classes.SequenceHandling.Transcript import Transcript
+from Classes.StepGraph.StepGraph import LibraryStep, StepGraph
 from Classes.TreeGrow.TreeGrow import TreeGrow
 from Classes.WriteGuard.WriteGuard import WriteGuard
 from Classes.PassPath.PassPath import PassPath
-from Classes.FastaBoy.FastaBoy import EnsemblFastaBoy
+from Classes.FastaBoy.FastaBoy import IndexedFastaBoy
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterator, Iterable, Optional, Tuple
 from tqdm import tqdm
 from datetime import date
 
+import functools
 import os.path
 import shutil
 import json
+import numpy as np
 
 
 def check_library_status(gene_assembler: GeneAssembler, library_info: LibraryInfo, pass_path: PassPath) -> None:
@@ -59,8 +66,7 @@ def check_library_status(gene_assembler: GeneAssembler, library_info: LibraryInf
         library_info["status"]["02_sequence_collection"] = True
 
     # Check small protein removal
-    flag: bool = all([len(transcript) > 10 for transcript in gene_assembler.get_transcripts() if isinstance(transcript,
-                                                                                                            Protein)])
+    flag: bool = all(len(protein) > 10 for protein in gene_assembler.iter_proteins())
     if not flag:
         if library_info["status"]["03_small_protein_removing"]:
             print("Protein sequences below length threshold found.")
@@ -70,11 +76,9 @@ def check_library_status(gene_assembler: GeneAssembler, library_info: LibraryInf
         library_info["status"]["03_small_protein_removing"] = True
 
     # Check incorrect entries
-    gene_list: List[Gene] = gene_assembler.get_genes()
     flag: bool = True
-    for gene in gene_list:
-        transcript_list: List[Transcript] = gene.get_transcripts()
-        for transcript in transcript_list:
+    for gene in gene_assembler.iter_genes():
+        for transcript in gene.iter_transcripts():
             if transcript.get_biotype() == "protein_coding":
                 if transcript.get_id_taxon() == 9606:
                     if transcript.get_id()[3] == "T":
@@ -93,12 +97,11 @@ def check_library_status(gene_assembler: GeneAssembler, library_info: LibraryInf
     library_info["status"]["04_incorrect_entry_removing"] = flag
 
     # Check implicit FAS scoring
-    fas_dict_list: List[Dict[str, Dict[str, float]]] = [gene.fas_dict for gene in gene_assembler.get_genes(False, True)]
     flag = True
-    for fas_dict in fas_dict_list:
-        for key in fas_dict.keys():
-            if fas_dict[key][key] == -1.0:
-                flag = False
+    for gene in gene_assembler.iter_genes(lambda unscored_gene: not unscored_gene.is_fas_complete()):
+        if (np.diagonal(gene.get_fas_matrix().matrix) == FASMatrix.UNSCORED).any():
+            flag = False
+            break
     if not flag:
         if library_info["status"]["05_implicit_fas_scoring"]:
             print("Not yet computed implicit FAS scores found.")
@@ -107,61 +110,45 @@ def check_library_status(gene_assembler: GeneAssembler, library_info: LibraryInf
     else:
         library_info["status"]["05_implicit_fas_scoring"] = True
 
+    # The outputs of steps #06 to #08 are checked against the manifest they were recorded in, without generating them
+    # again. If one of the steps before is repeated, the StepGraph generates them again as well.
+    manifest: LibraryManifest = LibraryManifest.load(pass_path)
+
     # Check fasta generation
-    with open(pass_path["transcript_fasta"], "r") as f:
-        fasta_length = len(f.read().split("\n"))
-    gene_list: List[Gene] = gene_assembler.get_genes()
-    output_list: List[str] = list()
-    for gene in gene_list:
-        output_list.append(gene.fasta)
-    new_fasta_length = len("\n".join(output_list).split("\n"))
-    if fasta_length != new_fasta_length:
+    if not manifest.is_current("transcript_fasta", gene_assembler.get_protein_count()):
         if library_info["status"]["06_fasta_generation"]:
-            print("Fasta file differs in size from what was expected.")
+            print("Fasta file does not match the library.")
             print("Will regenerate it.")
         library_info["status"]["06_fasta_generation"] = False
     else:
         library_info["status"]["06_fasta_generation"] = True
 
     # Check pairing generation
-    pairings_dict: Dict[str, str] = dict()
-    gene_list: List[Gene] = gene_assembler.get_genes(False, True)
-    for gene in gene_list:
-        pairings_dict[gene.get_id()] = gene.make_pairings()
-    with open(pass_path["transcript_pairings"], "r") as f:
-        old_pairing_length = len(str(json.load(f)))
-    new_pairing_length = len(str(pairings_dict))
-    if old_pairing_length != new_pairing_length:
+    if not manifest.is_current("transcript_pairings"):
         if library_info["status"]["07_pairing_generation"]:
-            print("Pairing file differs in size from what was expected.")
+            print("Pairing file does not match the library.")
             print("Will regenerate it.")
         library_info["status"]["07_pairing_generation"] = False
     else:
         library_info["status"]["07_pairing_generation"] = True
 
     # Check ids tsv generation
-    with open(pass_path["transcript_ids"], "r") as f:
-        old_length = len(f.read())
-    id_list: List[str] = list()
-    gene_list: List[Gene] = gene_assembler.get_genes()
-    for gene in gene_list:
-        protein_list: List[Protein] = gene.get_proteins()
-        for protein in protein_list:
-            id_list.append(protein.make_header() + "\tncbi" + str(protein.get_id_taxon()))
-    new_length = len(id_list)
-    if old_length != new_length:
+    if not manifest.is_current("transcript_ids"):
         if library_info["status"]["08_id_tsv_generation"]:
-            print("ID tsv differs in size from what was expected.")
+            print("ID tsv does not match the library.")
             print("Will regenerate it.")
         library_info["status"]["08_id_tsv_generation"] = False
     else:
         library_info["status"]["08_id_tsv_generation"] = True
+    manifest.save()
 
     # Check FAS calculation
     if library_info["info"]["fas_scored_sequences_count"] < library_info["info"]["protein_count"]:
         library_info["status"]["10_fas_scoring"] = False
     else:
         library_info["status"]["10_fas_scoring"] = True
+    # Other libraries may have added scores to the cache since, so it is asked again for the missing ones.
+    library_info["status"]["09_cached_fas_scoring"] = library_info["status"]["10_fas_scoring"]
     library_info.save()
 
 
@@ -170,29 +157,19 @@ def collect_sequences(gene_assembler: GeneAssembler,
                       pass_path: PassPath,
                       protein_fasta: str) -> None:
 
-    fasta_iterator: EnsemblFastaBoy = EnsemblFastaBoy(protein_fasta)
-    fasta_iterator.set_filter("transcript_biotype", "protein_coding")
-    fasta_iterator.set_filter("gene_biotype", "protein_coding")
-    fasta_iterator.parse_fasta()
-    fasta_dict: Dict[str, Dict[str, str]] = fasta_iterator.get_fasta_dict()
-
-    gene_list: List[Gene] = gene_assembler.get_genes()
-
-    for gene in tqdm(gene_list, ncols=100,
-                     total=len(gene_list), desc="Sequence collection progress"):
-        protein_list: List[Protein] = gene.get_proteins()
-        for protein in protein_list:
-            protein.set_sequence(fasta_dict[gene.get_id()][protein.get_id()])
+    # The pep FASTA is indexed instead of parsed, so only the sequences of the library are read. Ensembl names the
+    # sequences by versioned protein id, the library uses them without version.
+    with IndexedFastaBoy(protein_fasta, IndexedFastaBoy.strip_version) as fasta_index:
+        for gene in tqdm(gene_assembler.iter_genes(), ncols=100,
+                         total=gene_assembler.get_gene_count(), desc="Sequence collection progress"):
+            for protein in gene.iter_proteins():
+                gene.set_sequence_of_transcript(protein.get_id(), fasta_index[protein.get_id()])
     gene_assembler.clear_empty_genes()
-    gene_assembler.save_seq(pass_path)
-    gene_assembler.save_fas(pass_path)
-    gene_assembler.save_info(pass_path)
     info: Dict[str, Any] = library_info["info"]
     library_info["info"]["collected_sequences_count"] = gene_assembler.get_collected_sequences_count()
     sequence_collection_flag: bool = info["protein_count"] == info["collected_sequences_count"]
     library_info["status"]["02_sequence_collection"] = sequence_collection_flag
     library_info["info"]["gene_count"] = gene_assembler.get_gene_count()
-    library_info.save()
 
 
 def remove_small_proteins(gene_assembler: GeneAssembler, library_info: LibraryInfo, pass_path: PassPath):
@@ -203,16 +180,12 @@ def remove_small_proteins(gene_assembler: GeneAssembler, library_info: LibraryIn
             if len(protein) < 11:
                 gene.delete_transcript(protein.get_id())
     gene_assembler.clear_empty_genes()
-    gene_assembler.save_seq(pass_path)
-    gene_assembler.save_fas(pass_path)
-    gene_assembler.save_info(pass_path)
     library_info["info"]["gene_count"] = gene_assembler.get_gene_count()
     library_info["info"]["transcript_count"] = gene_assembler.get_transcript_count()
     library_info["info"]["protein_count"] = gene_assembler.get_protein_count()
     library_info["info"]["collected_sequences_count"] = gene_assembler.get_collected_sequences_count()
     library_info["info"]["fas_scored_sequences_count"] = gene_assembler.get_fas_scored_count()
     library_info["status"]["03_small_protein_removing"] = True
-    library_info.save()
 
 
 def remove_incorrect_entries(gene_assembler: GeneAssembler, library_info: LibraryInfo, pass_path: PassPath):
@@ -228,64 +201,106 @@ def remove_incorrect_entries(gene_assembler: GeneAssembler, library_info: Librar
                     if transcript.get_id()[6] == "T" and "NOVEL" not in transcript.get_tags():
                         gene.delete_transcript(transcript.get_id())
     gene_assembler.clear_empty_genes()
-    gene_assembler.save_seq(pass_path)
-    gene_assembler.save_fas(pass_path)
-    gene_assembler.save_info(pass_path)
     library_info["info"]["gene_count"] = gene_assembler.get_gene_count()
     library_info["info"]["transcript_count"] = gene_assembler.get_transcript_count()
     library_info["info"]["protein_count"] = gene_assembler.get_protein_count()
     library_info["info"]["collected_sequences_count"] = gene_assembler.get_collected_sequences_count()
     library_info["info"]["fas_scored_sequences_count"] = gene_assembler.get_fas_scored_count()
     library_info["status"]["04_incorrect_entry_removing"] = True
-    library_info.save()
 
 
 def calculate_implicit_fas_scores(gene_assembler: GeneAssembler, library_info: LibraryInfo, pass_path: PassPath):
-    gene_list: List[Gene] = gene_assembler.get_genes()
-    for gene in tqdm(gene_list, ncols=100, total=len(gene_list), desc="Implicit FAS score collection progress"):
+    for gene in tqdm(gene_assembler.iter_genes(), ncols=100, total=gene_assembler.get_gene_count(),
+                     desc="Implicit FAS score collection progress"):
         gene.calculate_implicit_fas_scores()
-    gene_assembler.save_fas(pass_path)
     library_info["status"]["05_implicit_fas_scoring"] = True
-    library_info.save()
+
+
+def fill_cached_fas_scores(gene_assembler: GeneAssembler, library_info: LibraryInfo, pass_path: PassPath) -> bool:
+    """
+    Takes the scores of all unscored protein pairs that are in the FAS score cache, so only the missing pairs end up in
+    the pairings. Also saves the sequence hashes the FAS integration needs to add new scores to the cache.
+    """
+    library_info["status"]["09_cached_fas_scoring"] = True
+    if library_info["fas_cache"] is None:
+        return False
+    FASScoreCache.save_hashes(gene_assembler.iter_genes(), pass_path)
+    score_count: int = 0
+    with FASScoreCache(library_info["fas_cache"]["path"],
+                       library_info["info"]["fas_mode"],
+                       library_info["fas_cache"]["tools_version"]) as fas_score_cache:
+        for gene in tqdm(gene_assembler.iter_genes(lambda unscored_gene: not unscored_gene.is_fas_complete()),
+                         ncols=100, total=gene_assembler.get_gene_count(), desc="FAS score cache progress"):
+            score_count += fas_score_cache.fill_gene(gene)
+    print("\tTook", score_count, "FAS scores from the cache.")
+    library_info["info"]["fas_scored_sequences_count"] = gene_assembler.get_fas_scored_count()
+    return score_count > 0
 
 
 def generate_fasta_file(gene_assembler: GeneAssembler, library_info: LibraryInfo, pass_path: PassPath):
-    gene_list: List[Gene] = gene_assembler.get_genes()
-    output_list: List[str] = list()
-    for gene in tqdm(gene_list, ncols=100, total=len(gene_list), desc="Fasta generation process"):
-        output_list.append(gene.fasta)
-    with open(pass_path["transcript_fasta"], "w") as f:
-        f.write("\n".join(output_list))
+    record_count: int = 0
+    with ManifestFile(pass_path["transcript_fasta"]) as f:
+        for i, gene in enumerate(tqdm(gene_assembler.iter_genes(), ncols=100, total=gene_assembler.get_gene_count(),
+                                      desc="Fasta generation process")):
+            if i > 0:
+                f.write("\n")
+            f.write(gene.fasta)
+            record_count += len(gene.get_proteins())
+    manifest: LibraryManifest = LibraryManifest.load(pass_path)
+    manifest.add_entry("transcript_fasta", f.get_digest(), record_count)
+    manifest.save()
     library_info["status"]["06_fasta_generation"] = True
-    library_info.save()
+
+
+def iter_pairings(genes: Iterable[Gene]) -> Iterator[Tuple[str, str]]:
+    for gene in genes:
+        yield gene.get_id(), gene.make_pairings()
+
+
+def write_pairings(pairing_iter: Iterable[Tuple[str, str]], pairings_path: str) -> Tuple[str, int]:
+    """
+    Streams the pairings of one gene after the other into the pairings JSON. The layout is the same as of json.dump
+    with an indent of 4, so the whole pairings dict never has to be held in memory. Returns the content hash and the
+    number of genes written.
+    """
+    gene_count: int = 0
+    with ManifestFile(pairings_path) as f:
+        separator: str = "{\n    "
+        for gene_id, pairings in pairing_iter:
+            f.write(separator + json.dumps(gene_id) + ": " + json.dumps(pairings))
+            separator = ",\n    "
+            gene_count += 1
+        f.write("{}" if separator == "{\n    " else "\n}")
+    return f.get_digest(), gene_count
 
 
 def generate_pairings(gene_assembler: GeneAssembler, library_info: LibraryInfo, pass_path: PassPath):
     gene_list: List[Gene] = gene_assembler.get_genes(False, True)
-    pairings_dict: Dict[str, str] = dict()
-    for gene in tqdm(gene_list, ncols=100, total=len(gene_list), desc="Pairing generation process"):
-        pairings_dict[gene.get_id()] = gene.make_pairings()
-
-    with open(pass_path["transcript_pairings"], "w") as f:
-        json.dump(pairings_dict, f, indent=4)
+    digest, gene_count = write_pairings(tqdm(iter_pairings(gene_list), ncols=100, total=len(gene_list),
+                                             desc="Pairing generation process"),
+                                        pass_path["transcript_pairings"])
+    manifest: LibraryManifest = LibraryManifest.load(pass_path)
+    manifest.add_entry("transcript_pairings", digest, gene_count)
+    manifest.save()
 
     library_info["status"]["07_pairing_generation"] = True
-    library_info.save()
 
 
 def generate_ids_tsv(gene_assembler: GeneAssembler, library_info: LibraryInfo, pass_path: PassPath):
-    gene_list: List[Gene] = gene_assembler.get_genes()
-    output_list: List[str] = list()
-    for gene in tqdm(gene_list, ncols=100, total=len(gene_list), desc="Generating phyloprofile ids"):
-        protein_list: List[Protein] = gene.get_proteins(False, True)
-        for protein in protein_list:
-            output_list.append(protein.make_header() + "\tncbi" + str(protein.get_id_taxon()))
-
-    with open(pass_path["transcript_ids"], "w") as f:
-        f.write("\n".join(output_list))
+    row_count: int = 0
+    with ManifestFile(pass_path["transcript_ids"]) as f:
+        separator: str = ""
+        for gene in tqdm(gene_assembler.iter_genes(), ncols=100, total=gene_assembler.get_gene_count(),
+                         desc="Generating phyloprofile ids"):
+            for protein in gene.get_proteins(False, True):
+                f.write(separator + protein.make_header() + "\tncbi" + str(protein.get_id_taxon()))
+                separator = "\n"
+                row_count += 1
+    manifest: LibraryManifest = LibraryManifest.load(pass_path)
+    manifest.add_entry("transcript_ids", f.get_digest(), row_count)
+    manifest.save()
 
     library_info["status"]["08_id_tsv_generation"] = True
-    library_info.save()
 
 
 def main():
@@ -294,11 +309,13 @@ def main():
 
     # Set up the args parser.
     argument_parser: ReduxArgParse = ReduxArgParse(["--outdir", "--species", "--release", "--force",
-                                                    "--keepgtf", "--modefas", "--copylib"],
-                                                   [str, str, str, None, None, str, str],
+                                                    "--keepgtf", "--modefas", "--copylib", "--engine", "--threads",
+                                                    "--persist", "--Cache", "--anno_version"],
+                                                   [str, str, str, None, None, str, str, str, int, str, str, str],
                                                    ["store", "store", "store", "store_true",
-                                                    "store_true", "store", "store"],
-                                                   [1, 1, 1, None, None, None, None],
+                                                    "store_true", "store", "store", "store", "store", "store",
+                                                    "store", "store"],
+                                                   [1, 1, 1, None, None, None, None, None, None, None, None, None],
                                                    ["Directory the library will be generated in.",
                                                     "Species of the library.",
                                                     "Ensembl release of the library.",
@@ -306,7 +323,24 @@ def main():
                                                     "Keeps the ensembl GTF on the system after library setup.",
                                                     """Path to a FAS mode file that shall be 
                                                     used to configure FAS in this library.""",
-                                                    "Path to a library that shall be copied."])
+                                                    "Path to a library that shall be copied.",
+                                                    """GTF extraction engine. 'stream' (default) parses the GTF 
+                                                    line by line, 'columnar' loads it into a DataFrame and filters 
+                                                    it with vectorized masks.""",
+                                                    """Number of processes used to parse the GTF with the 'stream' 
+                                                    engine. A compressed GTF is unpacked into a temporary file 
+                                                    for this. 1 by default.""",
+                                                    """Comma separated numbers of the library steps after which 
+                                                    the library is saved, e.g. '02,05'. 'all' saves after every 
+                                                    step, 'none' only after the last one. '02' by default.""",
+                                                    """Path to a FAS score cache that is shared between libraries, 
+                                                    e.g. fas_score_cache.sqlite in the output directory. No cache 
+                                                    is used by default.""",
+                                                    """Path to the annoTools directory or a version label of the 
+                                                    annotation tools. Required with --Cache. The 
+                                                    label of a directory is a hash of its file names and sizes. 
+                                                    Cached FAS scores are only reused for libraries with the same 
+                                                    label."""])
     argument_parser.generate_parser()
     argument_parser.execute()
     argument_dict: Dict[str, Any] = argument_parser.get_args()
@@ -317,10 +351,33 @@ def main():
     if argument_dict["keepgtf"] is None:
         argument_dict["keepgtf"] = False
 
+    if argument_dict["engine"] is None:
+        argument_dict["engine"] = "stream"
+
+    if argument_dict["threads"] is None:
+        argument_dict["threads"] = 1
+
+    if argument_dict["engine"] == "columnar" and argument_dict["threads"] > 1:
+        raise ValueError("The 'columnar' GTF engine runs in one process, --threads only applies to 'stream'.")
+
+    if argument_dict["persist"] is None:
+        argument_dict["persist"] = "02"
+
     argument_dict["outdir"] = argument_dict["outdir"][0]
     argument_dict["species"] = argument_dict["species"][0]
     argument_dict["release"] = argument_dict["release"][0]
 
+    if argument_dict["Cache"] is None:
+        fas_cache: Optional[Dict[str, str]] = None
+    else:
+        # Scores of different annotation tools must not be mixed, so the cache needs to know their version.
+        if argument_dict["anno_version"] is None:
+            raise ValueError("--anno_version is required with --Cache. Pass the annoTools directory or a version "
+                             "label.")
+        fas_cache: Optional[Dict[str, str]] = {"path": os.path.abspath(argument_dict["Cache"]),
+                                               "tools_version": FASScoreCache.get_tools_label(
+                                                   argument_dict["anno_version"])}
+
     ####################################################################
     # LocalEnsembl SETUP.
 
@@ -362,13 +419,26 @@ def main():
             path_dict["root"] = os.path.join(argument_dict["outdir"], library_name)
             pass_path: PassPath = PassPath(path_dict)
         library_info: LibraryInfo = LibraryInfo(pass_path["info"])
+        gene_assembler.load(pass_path)
+        if fas_cache is not None and ("fas_cache" not in library_info or library_info["fas_cache"] is None):
+            # The annotation tools the old scores were computed with are unknown.
+            print("\tThe old library records no annotation tools version, its FAS scores are not added to the cache.")
+        elif fas_cache is not None:
+            # The scores of the old library are kept in the cache under its own FAS mode and tools version, so the copy
+            # gets them back if neither changed.
+            print("\tAdding the FAS scores of the old library to the cache.")
+            with FASScoreCache(fas_cache["path"],
+                               library_info["info"]["fas_mode"],
+                               library_info["fas_cache"]["tools_version"]) as fas_score_cache:
+                for gene in gene_assembler.iter_genes():
+                    fas_score_cache.add_gene(gene)
         library_info["info"]["fas_mode"] = mode_hex
         library_info["commandline_args"] = argument_dict
+        library_info["fas_cache"] = fas_cache
 
         with open(pass_path["fas_annoTools"], "w") as f:
             f.write(str(fas_mode_hex))
 
-        gene_assembler.load(pass_path)
         gene_assembler.reset_fas()
         gene_assembler.save_fas(pass_path)
         check_library_status(gene_assembler, library_info, pass_path)
@@ -385,6 +455,7 @@ def main():
         print("#01 Collecting transcripts information.")
         print("\tTranscript information already collected.")
         library_info: LibraryInfo = LibraryInfo(pass_path["info"])
+        library_info["fas_cache"] = fas_cache
         check_library_status(gene_assembler, library_info, pass_path)
         library_info["last_edit"] = str(date.today())
         library_info.save()
@@ -433,7 +504,7 @@ def main():
         # Extract the file
         gene_assembler.update_inclusion_filter("gene_biotype", ["protein_coding"])
         gene_assembler.update_inclusion_filter("transcript_biotype", ["protein_coding", "nonsense_mediated_decay"])
-        gene_assembler.extract(gtf_path)
+        gene_assembler.extract(gtf_path, argument_dict["engine"], argument_dict["threads"])
         gene_assembler.clear_empty_genes()
 
         gene_assembler.save_seq(pass_path)
@@ -451,6 +522,7 @@ def main():
         library_info["init_date"] = str(date.today())
         library_info["last_edit"] = str(date.today())
         library_info["commandline_args"] = argument_dict
+        library_info["fas_cache"] = fas_cache
         library_info["info"] = {"species": local_ensembl.get_species_name(),
                                 "taxon_id": local_ensembl.get_taxon_id(),
                                 "release": local_ensembl.get_release_num(),
@@ -466,66 +538,72 @@ def main():
                                   "03_small_protein_removing": False,
                                   "04_incorrect_entry_removing": False,
                                   "05_implicit_fas_scoring": False,
+                                  "09_cached_fas_scoring": False,
                                   "06_fasta_generation": False,
                                   "07_pairing_generation": False,
                                   "08_id_tsv_generation": False
                                   }
         library_info.save()
     ####################################################################
-    # COLLECT SEQUENCES
-    print("#02 Collecting sequences.")
-    if not library_info["status"]["02_sequence_collection"]:
-        # Collect sequences.
-        with WriteGuard(pass_path["transcript_seq"], pass_path["transcript_data"]):
-            print("\tSequence Collection.")
-            collect_sequences(gene_assembler, library_info, pass_path, gtf_pep_path)
-        if not argument_dict["keepgtf"]:
-            # Delete the file after successful extraction.
-            local_ensembl.remove_pep()
-    else:
-        print("\tSequences already collected.")
-    ####################################################################
-    # CLEAR SMALL PROTEINS
-    print("#03 Removing small proteins.")
-    if not library_info["status"]["03_small_protein_removing"]:
-        remove_small_proteins(gene_assembler, library_info, pass_path)
-    else:
-        print("\tSmall proteins already removed.")
-    ####################################################################
-    # REMOVE INCORRECT ENTRIES
-    print("#04 Removing incorrect entries.")
-    if not library_info["status"]["04_incorrect_entry_removing"]:
-        remove_incorrect_entries(gene_assembler, library_info, pass_path)
-    else:
-        print("\tIncorrect entries already removed.")
+    # LIBRARY STEPS
+    # The steps change the genes in memory. The StepGraph saves the library at the checkpoints and after the last step.
+    step_graph: StepGraph = StepGraph(gene_assembler, library_info, pass_path,
+                                      StepGraph.parse_checkpoints(argument_dict["persist"],
+                                                                  list(library_info["status"])))
+    step_graph.add_step(LibraryStep("02_sequence_collection",
+                                    "#02 Collecting sequences.",
+                                    "\tSequences already collected.",
+                                    functools.partial(collect_sequences, protein_fasta=gtf_pep_path),
+                                    ["01_id_collection"], ["seq", "fas", "info"]))
+    step_graph.add_step(LibraryStep("03_small_protein_removing",
+                                    "#03 Removing small proteins.",
+                                    "\tSmall proteins already removed.",
+                                    remove_small_proteins,
+                                    ["02_sequence_collection"], ["seq", "fas", "info"]))
+    step_graph.add_step(LibraryStep("04_incorrect_entry_removing",
+                                    "#04 Removing incorrect entries.",
+                                    "\tIncorrect entries already removed.",
+                                    remove_incorrect_entries,
+                                    ["01_id_collection"], ["seq", "fas", "info"]))
+    step_graph.add_step(LibraryStep("05_implicit_fas_scoring",
+                                    "#05 Calculating implicit FAS scores.",
+                                    "\tImplicit FAS scores already calculated.",
+                                    calculate_implicit_fas_scores,
+                                    ["03_small_protein_removing", "04_incorrect_entry_removing"], ["fas"]))
+    step_graph.add_step(LibraryStep("09_cached_fas_scoring",
+                                    "#09 Taking FAS scores from the score cache.",
+                                    "\tCached FAS scores already taken.",
+                                    fill_cached_fas_scores,
+                                    ["05_implicit_fas_scoring"], ["fas"]))
+    # The outputs of steps #06 to #08 are recorded in the manifest together with the state of the library files they
+    # are generated from, so these files are saved before.
+    step_graph.add_step(LibraryStep("06_fasta_generation",
+                                    "#06 Generating FASTA file for all sequences.",
+                                    "\tFasta file already generated.",
+                                    generate_fasta_file,
+                                    ["03_small_protein_removing", "04_incorrect_entry_removing"],
+                                    reads=["seq", "info"]))
+    step_graph.add_step(LibraryStep("07_pairing_generation",
+                                    "#07 Creating protein pairings for all genes.",
+                                    "\tPairings already generated.",
+                                    generate_pairings,
+                                    ["05_implicit_fas_scoring", "09_cached_fas_scoring"],
+                                    reads=["fas", "info"]))
+    step_graph.add_step(LibraryStep("08_id_tsv_generation",
+                                    "#08 Generating phyloprofile IDs for all proteins.",
+                                    "\tIDs already generated.",
+                                    generate_ids_tsv,
+                                    ["05_implicit_fas_scoring", "09_cached_fas_scoring"],
+                                    reads=["fas", "info"]))
+    with WriteGuard(pass_path["transcript_seq"], pass_path["transcript_data"]):
+        step_graph.run()
+    if not argument_dict["keepgtf"]:
+        # Delete the file after successful extraction.
+        local_ensembl.remove_pep()
     ####################################################################
-    # IMPLICIT FAS SCORING
-    print("#05 Calculating implicit FAS scores.")
-    if not library_info["status"]["05_implicit_fas_scoring"]:
-        calculate_implicit_fas_scores(gene_assembler, library_info, pass_path)
-    else:
-        print("\tImplicit FAS scores already calculated.")
-    ####################################################################
-    # CREATE FASTA FILE
-    print("#06 Generating FASTA file for all sequences.")
-    if not library_info["status"]["06_fasta_generation"]:
-        generate_fasta_file(gene_assembler, library_info, pass_path)
-    else:
-        print("\tFasta file already generated.")
-    ####################################################################
-    # CREATE PAIRINGS FOR ALL GENES
-    print("#07 Creating protein pairings for all genes.")
-    if not library_info["status"]["07_pairing_generation"]:
-        generate_pairings(gene_assembler, library_info, pass_path)
-    else:
-        print("\tPairings already generated.")
-    ####################################################################
-    # CREATE OF ALL IDS.
-    print("#08 Generating phyloprofile IDs for all proteins.")
-    if not library_info["status"]["08_id_tsv_generation"]:
-        generate_ids_tsv(gene_assembler, library_info, pass_path)
-    else:
-        print("\tIDs already generated.")
+    # ID INDEX FOR THE EXPRESSION IMPORT.
+    print("Saving the transcript id index.")
+    IDIndex.from_genes(gene_assembler.iter_genes(), pass_path).save(pass_path)
     ####################################################################
 
 
@@ -27,8 +27,9 @@ from Classes.SequenceHandling.GeneAssembler import GeneAssembler
 from Classes.SequenceHandling.LibraryInfo import LibraryInfo
 from Classes.SequenceHandling.Transcript import Transcript
 from Classes.TSVBoy.TSVBoy import DiamondTSVBoy
+from Classes.ORFFinder.ORFFinder import ORFFinder
 from Classes.PassPath.PassPath import PassPath
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple, TextIO
 import json
 import os
 import shutil
@@ -39,6 +40,9 @@ from pathlib import Path
 from spice_library import remove_small_proteins, remove_incorrect_entries, calculate_implicit_fas_scores, \
     generate_fasta_file, generate_pairings, generate_ids_tsv
 
+# Number of transcripts that are handed to the ORFFinder at once.
+ORF_BATCH_SIZE: int = 5000
+
 
 def merge_mode(argument_dict: Dict[str, Any]):
     with open(argument_dict["input"], "r") as f:
@@ -62,6 +66,43 @@ def merge_mode(argument_dict: Dict[str, Any]):
     annotation_parser.save_json(argument_dict["out_path"])
 
 
+def orf_mode(argument_dict: Dict[str, Any]):
+    orf_finder: ORFFinder = ORFFinder()
+    output_filepath: str = os.path.join(argument_dict["out_path"], argument_dict["name"] + ".pep")
+    transcript_count: int = 0
+    orf_count: int = 0
+    print("Predicting ORFs.", flush=True)
+    with open(output_filepath, "w") as f:
+        batch: List[Tuple[str, str]] = list()
+        for entry in ORFFinder.iter_fasta(argument_dict["input"]):
+            batch.append(entry)
+            if len(batch) == ORF_BATCH_SIZE:
+                orf_count += write_orf_batch(orf_finder, batch, f)
+                transcript_count += len(batch)
+                batch = list()
+        orf_count += write_orf_batch(orf_finder, batch, f)
+        transcript_count += len(batch)
+    print(orf_count, "ORFs predicted for", transcript_count, "transcripts.")
+    print("All ORFs saved to:")
+    print(output_filepath)
+
+
+def write_orf_batch(orf_finder: ORFFinder, batch: List[Tuple[str, str]], f: TextIO) -> int:
+    orf_dict: Dict[str, Any] = orf_finder.find_orfs([sequence for _, sequence in batch])
+    orf_number_dict: Dict[int, int] = dict()
+    for i in range(len(orf_dict["peptide"])):
+        sequence_index: int = int(orf_dict["sequence_index"][i])
+        orf_number_dict[sequence_index] = orf_number_dict.get(sequence_index, 0) + 1
+        f.write(ORFFinder.make_transdecoder_entry(batch[sequence_index][0],
+                                                  orf_number_dict[sequence_index],
+                                                  str(orf_dict["orf_type"][i]),
+                                                  int(orf_dict["start"][i]),
+                                                  int(orf_dict["end"][i]),
+                                                  str(orf_dict["strand"][i]),
+                                                  orf_dict["peptide"][i]))
+    return len(orf_dict["peptide"])
+
+
 def prep_mode(argument_dict: Dict[str, Any]):
     no_complete_orf_count: int = 0
     no_diamond_match_count: int = 0
@@ -319,10 +360,9 @@ def novlib_mode(argument_dict: Dict[str, Any]):
     novel_transcript_dict: Dict[str, List[Transcript]] = fasta_iterator.get_fasta_dict()
 
     print("Updating old library with novel transcripts.")
-    for gene in gene_assembler.get_genes():
-        if gene.get_id() in novel_transcript_dict.keys():
-            for transcript in novel_transcript_dict[gene.get_id()]:
-                gene.add_transcript(transcript, True)
+    for gene in gene_assembler.iter_genes(lambda known_gene: known_gene.get_id() in novel_transcript_dict):
+        for transcript in novel_transcript_dict[gene.get_id()]:
+            gene.add_transcript(transcript, True)
 
     novlib_info["status"]: Dict[str, bool] = {"01_id_collection": True,
                                               "02_sequence_collection": True,
@@ -383,7 +423,9 @@ def main():
                                                     'merge': .txt-file containing the paths to all annotation-gtfs
                                                      that shall be merged. One path per line. If a threshold is demanded
                                                      this annotations should contain coverage in FPKM.
-                                                    'prep' and 'prepcull': LongOrf.pep output of TransDecoder.
+                                                    'orf': Nucleotide fasta of the merged transcripts.
+                                                    'prep' and 'prepcull': LongOrf.pep output of TransDecoder or the
+                                                    <name>.pep output of 'orf' mode.
                                                     'novlib': Fasta-file containing novel transcripts. The file
                                                     requires a header structure like this:
                                                     ><GENE_ID>|<TRANSCRIPT_ID>|<TAG1> ... <TAGn>|<SYN1> ... <SYNn>
@@ -400,7 +442,9 @@ def main():
                                                      used for transcript curation. If not set, expression will be
                                                      ignored.""",  # THRESHOLD
                                                     """Either 1:'merge', 2:'prep', 3:'prepcull' or 4:'novlib' 
-                                                    depending on the stage of the workflow.""",  # MODE
+                                                    depending on the stage of the workflow. 'orf' predicts the ORFs of
+                                                    the merged transcripts in place of TransDecoder.LongOrfs and
+                                                    writes <name>.pep for DIAMOND and 'prep'.""",  # MODE
                                                     "Name for the output file.",  # NAME
                                                     """Path to the <name>.json file that was output during merge
                                                     mode. This argument is only required for
@@ -425,6 +469,9 @@ def main():
     if argument_dict["mode"] == "merge":
         merge_mode(argument_dict)
 
+    elif argument_dict["mode"] == "orf":
+        orf_mode(argument_dict)
+
     elif argument_dict["mode"] in ["prep", "prepcull"]:
         prep_mode(argument_dict)
 
@@ -30,6 +30,7 @@ from Classes.PassPath.PassPath import PassPath
 from Classes.ReduxArgParse.ReduxArgParse import ReduxArgParse
 from Classes.SequenceHandling.GeneAssembler import GeneAssembler
 from Classes.SequenceHandling.LibraryInfo import LibraryInfo
+from Classes.SequenceHandling.LibraryManifest import LibraryManifest
 
 
 def patch_fas_index(library_path: str):
@@ -76,18 +77,52 @@ def hotfix_fas_index(library_path: str):
 
     for gene in gene_assembler.get_genes():
         delete_list = list()
-        for entry in gene.get_fas_dict().keys():
+        for entry in gene.get_fas_matrix().get_ids():
             if not entry.startswith("ENS"):
                 delete_list.append(entry)
         for entry in delete_list:
-            del gene.get_fas_dict()[entry]
-        for entry in gene.get_fas_dict().keys():
-            for del_entry in delete_list:
-                del gene.get_fas_dict()[entry][del_entry]
+            gene.delete_fas_entry(entry)
 
     gene_assembler.save_fas(pass_path)
 
 
+def convert_to_binary(library_path: str):
+    with open(os.path.join(library_path, "paths.json"), "r") as f:
+        path_dict: Dict[str, Any] = json.load(f)
+    path_dict["transcript_binary"] = os.path.join("transcript_data", "library.bin")
+    pass_path: PassPath = PassPath(path_dict)
+
+    lib_info: LibraryInfo = LibraryInfo(pass_path["info"])
+    gene_assembler: GeneAssembler = GeneAssembler(lib_info["info"]["species"], str(lib_info["info"]["taxon_id"]))
+    gene_assembler.load(pass_path)
+    gene_assembler.save_binary(pass_path)
+
+    with open(os.path.join(library_path, "paths.json"), "w") as f:
+        json.dump(path_dict, f, indent=4)
+
+
+def export_binary_to_json(library_path: str):
+    with open(os.path.join(library_path, "paths.json"), "r") as f:
+        path_dict: Dict[str, Any] = json.load(f)
+    pass_path: PassPath = PassPath(path_dict)
+
+    lib_info: LibraryInfo = LibraryInfo(pass_path["info"])
+    gene_assembler: GeneAssembler = GeneAssembler(lib_info["info"]["species"], str(lib_info["info"]["taxon_id"]))
+    gene_assembler.load_binary(pass_path["transcript_binary"])
+    # Only JSON files that are missing or that the binary library was written from may be replaced.
+    json_exists: bool = any([len(LibraryManifest.get_stat(pass_path[key])) > 0
+                             for key in LibraryManifest.INPUTS["transcript_binary"]])
+    source_fingerprint: str = gene_assembler.binary_library.source_fingerprint
+    if json_exists and source_fingerprint != GeneAssembler.get_json_fingerprint(pass_path):
+        raise ValueError("The JSON files of " + library_path + " changed after the binary library was written. "
+                         "Exporting it would overwrite them with older data.")
+    gene_assembler.save_info(pass_path)
+    gene_assembler.save_seq(pass_path)
+    gene_assembler.save_fas(pass_path)
+    # The binary library is stamped again, it matches the rewritten JSON files.
+    gene_assembler.save_binary(pass_path)
+
+
 def main():
     argument_parser: ReduxArgParse = ReduxArgParse(["--library", "--mode"],
                                                    [str, str],
@@ -96,7 +131,10 @@ def main():
                                                    ["Directory of the library to be patched.",
                                                     """Name of the patch that shall be run:
                                                     fas_index: Splits the singles fas scores file into split up files
-                                                    and an index."""])
+                                                    and an index.
+                                                    binary: Writes the transcript, sequence and FAS data into the
+                                                    binary library file transcript_data/library.bin.
+                                                    json: Rewrites the JSON files from the binary library file."""])
     argument_parser.generate_parser()
     argument_parser.execute()
     argument_dict: Dict[str, Any] = argument_parser.get_args()
@@ -105,6 +143,10 @@ def main():
         patch_fas_index(argument_dict["library"])
     elif argument_dict["mode"] == "hotfix_fas_index":
         hotfix_fas_index(argument_dict["library"])
+    elif argument_dict["mode"] == "binary":
+        convert_to_binary(argument_dict["library"])
+    elif argument_dict["mode"] == "json":
+        export_binary_to_json(argument_dict["library"])
 
 
 if __name__ == "__main__":
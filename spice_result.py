@@ -37,9 +37,10 @@ def expression(library_path: str,
                expression_name: str,
                normalization: str,
                normalization_threshold: float = 1.0,
-               suffix: str = ""):
+               suffix: str = "",
+               threads: int = 1):
     result: ResultBuddy = ResultBuddy(library_path, outdir, False, suffix)
-    result.import_expression_gtf(gtf_path, expression_name, normalization, normalization_threshold)
+    result.import_expression_gtf(gtf_path, expression_name, normalization, normalization_threshold, threads)
     result.generate_ewfd_file(expression_name)
 
 
@@ -74,16 +75,16 @@ def main():
 
     argument_parser: ReduxArgParse = ReduxArgParse(["--mode", "--library", "--outdir", "--gtf",
                                                     "--name", "--replicates", "--compared", "--Normalization",
-                                                    "--threshold", "--suffix"],
+                                                    "--threshold", "--suffix", "--Threads"],
                                                    [str, str, str, str,
                                                     str, str, str, str,
-                                                    float, str],
+                                                    float, str, int],
                                                    ["store", "store", "store", "store",
                                                     "store", "store", "store", "store",
-                                                    "store", "store"],
+                                                    "store", "store", "store"],
                                                    [1, 1, 1, "?",
                                                     "?", "*", "*", "?",
-                                                    "?", "?"],
+                                                    "?", "?", "?"],
                                                    ["""Mode: Either 'setup', 'expression', 'condition' or 'compare'.
                                                    'setup' creates the result directory system.
                                                    'expression' loads a gtf expression file into results as replicate.
@@ -106,7 +107,9 @@ def main():
                                                     """Any expression entry below this threshold will be set to 0.0.
                                                     Optional for 'expression' mode. 1.0 by default.""",
                                                     """Suffix of the result directory that will either be manipulated
-                                                    or created."""
+                                                    or created.""",
+                                                    """Number of processes used to parse an uncompressed expression 
+                                                    gtf. Optional for 'expression' mode. 1 by default."""
                                                     ])
     argument_parser.generate_parser()
     argument_parser.execute()
@@ -115,6 +118,9 @@ def main():
     if argument_dict["suffix"] is None:
         argument_dict["suffix"] = ""
 
+    if argument_dict["Threads"] is None:
+        argument_dict["Threads"] = 1
+
     ####################################################################
     # CHECK THE COMMANDLINE ARGUMENTS FOR THE INTEGRITY.
     if argument_dict["mode"][0] == "setup":
@@ -139,7 +145,8 @@ def main():
                        argument_dict["name"],
                        argument_dict["Normalization"],
                        argument_dict["threshold"],
-                       argument_dict["suffix"])
+                       argument_dict["suffix"],
+                       argument_dict["Threads"])
 
     elif argument_dict["mode"][0] == "condition":
 
@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+from typing import Dict, List, Tuple
+
+import pytest
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+from Classes.TreeGrow.TreeGrow import TreeGrow
+
+
+# Protein ids and their CDS coordinates per gene. Every gene also gets a nonsense mediated decay transcript.
+GENES: Dict[str, List[Tuple[str, List[Tuple[int, int]]]]] = {
+    "ENSG00000000001": [("ENSP00000000011", [(1000, 1100), (1200, 1300)]),
+                        ("ENSP00000000012", [(1000, 1100)]),
+                        ("ENSP00000000013", [(1200, 1300), (1400, 1500)])],
+    "ENSG00000000002": [("ENSP00000000021", [(5000, 5300)]),
+                        ("ENSP00000000022", [(5000, 5100), (5200, 5300)])],
+    "ENSG00000000003": [("ENSP00000000031", [(9000, 9200)])],
+}
+
+
+def make_gtf_line(feature: str, start: int, end: int, attribute_dict: Dict[str, str]) -> str:
+    attributes: str = " ".join([key + " \"" + value + "\";" for key, value in attribute_dict.items()])
+    return "\t".join(["1", "ensembl", feature, str(start), str(end), ".", "+", ".", attributes])
+
+
+def make_gtf() -> str:
+    lines: List[str] = ["#!genome-build test"]
+    for gene_number, (gene_id, proteins) in enumerate(GENES.items()):
+        gene_dict: Dict[str, str] = {"gene_id": gene_id, "gene_name": "GN" + str(gene_number),
+                                     "gene_biotype": "protein_coding"}
+        lines.append(make_gtf_line("gene", 1, 10000, gene_dict))
+        for protein_id, cds in proteins:
+            transcript_dict: Dict[str, str] = dict(gene_dict, transcript_id=protein_id.replace("ENSP", "ENST"),
+                                                   transcript_name=protein_id[-4:],
+                                                   transcript_biotype="protein_coding",
+                                                   transcript_support_level="1", tag="Ensembl_canonical")
+            lines.append(make_gtf_line("transcript", cds[0][0], cds[-1][1], transcript_dict))
+            for start, end in cds:
+                lines.append(make_gtf_line("CDS", start, end, dict(transcript_dict, protein_id=protein_id)))
+        decay_dict: Dict[str, str] = dict(gene_dict, transcript_id=gene_id.replace("ENSG", "ENST9"),
+                                          transcript_biotype="nonsense_mediated_decay", transcript_support_level="2")
+        lines.append(make_gtf_line("transcript", 1, 500, decay_dict))
+    return "\n".join(lines) + "\n"
+
+
+def make_sequence(protein_id: str) -> str:
+    return "M" + "ACDEFGHIKL"[int(protein_id[-1])] * (10 + int(protein_id[-2:]))
+
+
+@pytest.fixture
+def gtf_path(tmp_path) -> str:
+    path: str = str(tmp_path / "test.gtf")
+    with open(path, "w") as f:
+        f.write(make_gtf())
+    return path
+
+
+@pytest.fixture
+def library(tmp_path, gtf_path) -> PassPath:
+    """
+    Small library with sequences, implicit FAS scores and pairings, as spice_library leaves it before the FAS runs.
+    """
+    path_dict: Dict[str, str] = {"root": str(tmp_path / "library"),
+                                 "info": "info.yaml",
+                                 "fas_data": "fas_data",
+                                 "fas_scores": "fas_data/fas_scores",
+                                 "fas_index": "fas_data/fas_index.json",
+                                 "fas_temp": "fas_data/tmp",
+                                 "fas_annoTools": "fas_data/annoTools.txt",
+                                 "transcript_data": "transcript_data",
+                                 "transcript_info": "transcript_data/transcript_info.json",
+                                 "transcript_seq": "transcript_data/sequences.json",
+                                 "transcript_fasta": "transcript_data/transcript_set.fasta",
+                                 "transcript_pairings": "transcript_data/transcript_pairings.json",
+                                 "transcript_ids": "transcript_data/phyloprofile_ids.tsv"}
+    tree_grow: TreeGrow = TreeGrow(path_dict)
+    tree_grow.create_folders()
+    tree_grow.put_path_json()
+    pass_path: PassPath = PassPath(path_dict)
+    with open(pass_path["fas_index"], "w") as f:
+        json.dump(dict(), f, indent=4)
+
+    gene_assembler: GeneAssembler = GeneAssembler("homo_sapiens", "9606")
+    gene_assembler.extract(gtf_path)
+    for gene in gene_assembler.iter_genes():
+        for protein in gene.get_proteins():
+            gene.set_sequence_of_transcript(protein.get_id(), make_sequence(protein.get_id()))
+        gene.calculate_implicit_fas_scores()
+    gene_assembler.save_seq(pass_path)
+    gene_assembler.save_fas(pass_path)
+    gene_assembler.save_info(pass_path)
+    with open(pass_path["transcript_pairings"], "w") as f:
+        json.dump({gene.get_id(): gene.make_pairings() for gene in gene_assembler.iter_genes()}, f, indent=4)
+    with open(pass_path["info"], "w") as f:
+        yaml.dump({"info": {"species": "homo_sapiens", "taxon_id": 9606, "fas_mode": "0f"}, "fas_cache": None}, f)
+    return pass_path
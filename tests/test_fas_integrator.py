@@ -0,0 +1,119 @@
+import json
+import os
+from typing import Dict, List
+
+from Classes.FASTools.FASIntegrator import FASIntegrator
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.FASMatrix import FASMatrix
+from FASResultHandler import PHYLOPROFILE_HEADER, get_pending_results, get_result_dir, save_integrated
+
+
+def make_row(gene_id: str, seed_id: str, query_id: str, scores: str = "0.5\t0.25") -> str:
+    return gene_id + "|" + seed_id + "|9606\tncbi9606\t" + gene_id + "|" + query_id + "|9606\t" + scores
+
+
+GENE_ROWS: Dict[str, List[str]] = {
+    "ENSG00000000001": [make_row("ENSG00000000001", "ENSP00000000011", "ENSP00000000012"),
+                        make_row("ENSG00000000001", "ENSP00000000011", "ENSP00000000013", "0.4\t0.3")],
+    "ENSG00000000002": [make_row("ENSG00000000002", "ENSP00000000021", "ENSP00000000022", "0.9\t0.8")],
+}
+
+
+def write_phyloprofile(path: str, rows: List[str]) -> str:
+    with open(path, "w") as f:
+        f.write(PHYLOPROFILE_HEADER + "".join(row + "\n" for row in rows))
+    return path
+
+
+def write_gene_result(library: PassPath, gene_id: str, rows: List[str]) -> str:
+    os.makedirs(get_result_dir(library["fas_data"]), exist_ok=True)
+    return write_phyloprofile(os.path.join(get_result_dir(library["fas_data"]), gene_id + ".phyloprofile"), rows)
+
+
+def read_shards(library: PassPath) -> Dict[str, str]:
+    shards: Dict[str, str] = dict()
+    for shard in os.listdir(library["fas_scores"]):
+        with open(os.path.join(library["fas_scores"], shard), "r") as f:
+            shards[shard] = f.read()
+    return shards
+
+
+def get_matrix(library: PassPath, gene_id: str) -> FASMatrix:
+    with open(library["fas_index"], "r") as f:
+        shard: str = json.load(f)[gene_id]
+    with open(os.path.join(library["fas_scores"], shard), "r") as f:
+        return FASMatrix.from_dict(json.load(f)[gene_id])
+
+
+def get_mtimes(library: PassPath) -> Dict[str, int]:
+    return {shard: os.stat(os.path.join(library["fas_scores"], shard)).st_mtime_ns
+            for shard in os.listdir(library["fas_scores"])}
+
+
+def restore_shards(library: PassPath, shards: Dict[str, str]) -> None:
+    for shard, text in shards.items():
+        with open(os.path.join(library["fas_scores"], shard), "w") as f:
+            f.write(text)
+
+
+def test_gene_results_match_combined_file(library):
+    old_shards: Dict[str, str] = read_shards(library)
+    old_mtimes: Dict[str, int] = get_mtimes(library)
+    result_paths: Dict[str, str] = {gene_id: write_gene_result(library, gene_id, rows)
+                                    for gene_id, rows in GENE_ROWS.items()}
+    assert FASIntegrator(library).integrate_genes(result_paths) == 3
+    gene_shards: Dict[str, str] = read_shards(library)
+    # The forward score is set in the row of the query.
+    fas_matrix: FASMatrix = get_matrix(library, "ENSG00000000001")
+    assert fas_matrix.get_score("ENSP00000000012", "ENSP00000000011") == 0.5
+    assert fas_matrix.get_score("ENSP00000000011", "ENSP00000000012") == 0.25
+    # The gene without rows keeps its shard.
+    with open(library["fas_index"], "r") as f:
+        untouched_shard: str = json.load(f)["ENSG00000000003"]
+    assert get_mtimes(library)[untouched_shard] == old_mtimes[untouched_shard]
+    assert gene_shards[untouched_shard] == old_shards[untouched_shard]
+    assert gene_shards != old_shards
+
+    restore_shards(library, old_shards)
+    combined_path: str = write_phyloprofile(os.path.join(library["fas_data"], "fas.phyloprofile"),
+                                            [row for rows in GENE_ROWS.values() for row in rows])
+    assert FASIntegrator(library).integrate_file(combined_path) == 3
+    assert read_shards(library) == gene_shards
+
+
+def test_pending_results_only_hold_new_genes(library):
+    anno_dir: str = library["fas_data"]
+    write_gene_result(library, "ENSG00000000001", GENE_ROWS["ENSG00000000001"])
+    pending_dict: Dict[str, str] = get_pending_results(anno_dir)
+    assert list(pending_dict.keys()) == ["ENSG00000000001"]
+    assert FASIntegrator(library).integrate_genes(pending_dict) == 2
+    save_integrated(anno_dir, list(pending_dict.values()))
+    assert get_pending_results(anno_dir) == dict()
+
+    write_gene_result(library, "ENSG00000000002", GENE_ROWS["ENSG00000000002"])
+    pending_dict = get_pending_results(anno_dir)
+    assert list(pending_dict.keys()) == ["ENSG00000000002"]
+    assert FASIntegrator(library).integrate_genes(pending_dict) == 1
+    save_integrated(anno_dir, list(pending_dict.values()))
+    assert get_pending_results(anno_dir) == dict()
+    # A rewritten result file is integrated again.
+    write_gene_result(library, "ENSG00000000001", GENE_ROWS["ENSG00000000001"][:1])
+    assert list(get_pending_results(anno_dir).keys()) == ["ENSG00000000001"]
+
+
+def test_unknown_rows_are_skipped(library):
+    old_shards: Dict[str, str] = read_shards(library)
+    # Unknown gene, unknown protein, protein of another gene and a truncated row.
+    rows: List[str] = [make_row("ENSG00000000009", "ENSP00000000091", "ENSP00000000092"),
+                       make_row("ENSG00000000001", "ENSP00000000011", "ENSP00000000019"),
+                       make_row("ENSG00000000002", "ENSP00000000021", "ENSP00000000012"),
+                       "ENSG00000000002|ENSP00000000021"]
+    combined_path: str = write_phyloprofile(os.path.join(library["fas_data"], "fas.phyloprofile"), rows)
+    assert FASIntegrator(library).integrate_file(combined_path) == 0
+    unknown_path: str = write_gene_result(library, "ENSG00000000009", rows[:1])
+    assert FASIntegrator(library).integrate_genes({"ENSG00000000009": unknown_path}) == 0
+    assert read_shards(library) == old_shards
+
+    combined_path = write_phyloprofile(combined_path, rows + GENE_ROWS["ENSG00000000002"])
+    assert FASIntegrator(library).integrate_file(combined_path) == 1
+    assert get_matrix(library, "ENSG00000000002").get_score("ENSP00000000022", "ENSP00000000021") == 0.9
@@ -0,0 +1,57 @@
+from typing import Dict, List
+
+import pytest
+
+from FASJobAssistant import FASJobAssistant
+
+GENE_COSTS: Dict[str, float] = {"G1": 80.0, "G2": 10.0, "G3": 40.0, "G4": 35.0, "G5": 4.0, "G6": 30.0, "G7": 20.0}
+
+
+def get_task_costs(tasks: List[List[str]]) -> List[float]:
+    return [sum(GENE_COSTS[gene_id] for gene_id in task) for task in tasks]
+
+
+def test_estimate_gene_costs(library):
+    gene_costs: Dict[str, float] = FASJobAssistant.estimate_gene_costs(library)
+    overhead: float = FASJobAssistant.GENE_OVERHEAD
+    residues_per_second: float = FASJobAssistant.RESIDUES_PER_SECOND
+    # Three pairs of proteins with 22 to 24 residues, one pair with 32 and 33 residues and a gene without pairs.
+    assert gene_costs == pytest.approx({"ENSG00000000001": overhead + 3 * 23 / residues_per_second,
+                                        "ENSG00000000002": overhead + 32.5 / residues_per_second,
+                                        "ENSG00000000003": overhead})
+
+
+@pytest.mark.parametrize("task_count", [1, 3, 7])
+def test_pack_genes_assigns_every_gene_once(task_count):
+    tasks: List[List[str]] = FASJobAssistant.pack_genes(GENE_COSTS, task_count)
+    assert len(tasks) == task_count
+    assert sorted(gene_id for task in tasks for gene_id in task) == sorted(GENE_COSTS)
+
+
+def test_pack_genes_orders_tasks_by_cost():
+    tasks: List[List[str]] = FASJobAssistant.pack_genes(GENE_COSTS, 3)
+    assert tasks == [["G1"], ["G3", "G7", "G2"], ["G4", "G6", "G5"]]
+    task_costs: List[float] = get_task_costs(tasks)
+    assert task_costs == sorted(task_costs, reverse=True)
+    # The genes of a task are kept in the order they were packed, the most expensive first.
+    for task in tasks:
+        assert [GENE_COSTS[gene_id] for gene_id in task] == sorted([GENE_COSTS[gene_id] for gene_id in task],
+                                                                     reverse=True)
+
+
+def test_pack_genes_clamps_task_count():
+    tasks: List[List[str]] = FASJobAssistant.pack_genes(GENE_COSTS, 20)
+    assert len(tasks) == len(GENE_COSTS)
+    assert [task[0] for task in tasks] == ["G1", "G3", "G4", "G6", "G7", "G2", "G5"]
+    assert FASJobAssistant.pack_genes(dict(), 5) == []
+
+
+def test_get_task_count():
+    assert FASJobAssistant.get_task_count(GENE_COSTS) == len(GENE_COSTS)
+    assert FASJobAssistant.get_task_count({str(i): 1.0 for i in range(2000)}) == FASJobAssistant.TASK_COUNT
+    # The genes need 219 seconds in total.
+    assert FASJobAssistant.get_task_count(GENE_COSTS, 1.0) == 4
+    assert FASJobAssistant.get_task_count(GENE_COSTS, 3.5) == 2
+    assert FASJobAssistant.get_task_count(GENE_COSTS, 4.0) == 1
+    assert FASJobAssistant.get_task_count(GENE_COSTS, 0.1) == len(GENE_COSTS)
+    assert FASJobAssistant.get_task_count(dict(), 1.0) == 1
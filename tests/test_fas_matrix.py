@@ -0,0 +1,60 @@
+import numpy as np
+
+from Classes.SequenceHandling.FASMatrix import FASMatrix
+
+
+def make_matrix() -> FASMatrix:
+    fas_matrix: FASMatrix = FASMatrix(2)
+    for transcript_id in ["P1", "P2", "P3"]:
+        fas_matrix.add(transcript_id, FASMatrix.UNSCORED)
+    fas_matrix.add("T1", 0.0)
+    fas_matrix.fill_diagonal(1.0)
+    fas_matrix.set_score("P1", "P2", 0.25)
+    fas_matrix.set_score("P2", "P1", 0.5)
+    return fas_matrix
+
+
+def test_add_pairs_new_transcripts():
+    fas_matrix: FASMatrix = make_matrix()
+    assert fas_matrix.get_ids() == ["P1", "P2", "P3", "T1"]
+    assert fas_matrix.get_score("P1", "T1") == 0.0
+    assert fas_matrix.get_score("P1", "P3") == FASMatrix.UNSCORED
+    assert fas_matrix.get_unscored_pairs() == [("P1", "P3"), ("P2", "P3")]
+    assert fas_matrix.get_unscored_ids() == ["P1", "P2", "P3"]
+
+
+def test_counters_match_recount():
+    fas_matrix: FASMatrix = make_matrix()
+    counters = (fas_matrix.get_unscored_count(), fas_matrix.get_unscored_row_count())
+    fas_matrix.recount()
+    assert counters == (fas_matrix.get_unscored_count(), fas_matrix.get_unscored_row_count()) == (4, 3)
+    loaded_matrix: FASMatrix = FASMatrix.from_dict(fas_matrix.to_dict())
+    assert (loaded_matrix.get_unscored_count(), loaded_matrix.get_unscored_row_count()) == (4, 3)
+    fas_matrix.delete("P3")
+    assert fas_matrix.is_complete()
+    assert fas_matrix.get_ids() == ["P1", "P2", "T1"]
+    assert fas_matrix.get_score("P2", "P1") == 0.5
+
+
+def test_dict_round_trip():
+    fas_matrix: FASMatrix = make_matrix()
+    fas_dict = fas_matrix.to_dict()
+    assert fas_dict["P1"]["P2"] == 0.25
+    loaded_matrix: FASMatrix = FASMatrix.from_dict(fas_dict)
+    assert loaded_matrix.get_ids() == fas_matrix.get_ids()
+    assert loaded_matrix.to_dict() == fas_dict
+
+
+def test_block_round_trip():
+    fas_matrix: FASMatrix = make_matrix()
+    loaded_matrix: FASMatrix = FASMatrix.from_block(fas_matrix.get_ids(), fas_matrix.matrix.ravel())
+    assert np.array_equal(loaded_matrix.get_block(), fas_matrix.get_block())
+    assert loaded_matrix.get_unscored_row_count() == fas_matrix.get_unscored_row_count()
+
+
+def test_reset_marks_rows_unscored():
+    fas_matrix: FASMatrix = make_matrix()
+    fas_matrix.reset(["P1"])
+    assert fas_matrix.get_score("P1", "P2") == FASMatrix.UNSCORED
+    assert fas_matrix.get_score("P2", "P1") == 0.5
+    assert fas_matrix.get_score("P1", "P1") == 1.0
@@ -0,0 +1,42 @@
+import os
+from typing import List
+
+from FASResultHandler import PHYLOPROFILE_HEADER, get_result_dir, merge_results
+
+
+def make_row(gene_id: str, protein_id_1: str, protein_id_2: str) -> str:
+    return gene_id + "|" + protein_id_1 + "|9606\tncbi9606\t" + gene_id + "|" + protein_id_2 + "|9606\t0.5\t0.25\n"
+
+
+def write_file(path: str, text: str) -> None:
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def test_merge_keeps_rows_of_genes_without_result_file(tmp_path):
+    anno_dir: str = str(tmp_path)
+    os.makedirs(get_result_dir(anno_dir))
+    old_rows: List[str] = [make_row("G1", "P11", "P12"), make_row("G2", "P21", "P22"), make_row("G2", "P22", "P21")]
+    write_file(os.path.join(anno_dir, "fas.phyloprofile"), PHYLOPROFILE_HEADER + "".join(old_rows))
+    new_rows: List[str] = [make_row("G2", "P21", "P22"), make_row("G3", "P31", "P32")]
+    write_file(os.path.join(get_result_dir(anno_dir), "G2.phyloprofile"), PHYLOPROFILE_HEADER + new_rows[0])
+    write_file(os.path.join(get_result_dir(anno_dir), "G3.phyloprofile"), PHYLOPROFILE_HEADER + new_rows[1])
+
+    assert merge_results((anno_dir, ".phyloprofile", "fas.phyloprofile")) == 3
+    with open(os.path.join(anno_dir, "fas.phyloprofile"), "r") as f:
+        assert f.read() == PHYLOPROFILE_HEADER + old_rows[0] + "".join(new_rows)
+    # Merging again gives the same file.
+    assert merge_results((anno_dir, ".phyloprofile", "fas.phyloprofile")) == 3
+    with open(os.path.join(anno_dir, "fas.phyloprofile"), "r") as f:
+        assert f.read() == PHYLOPROFILE_HEADER + old_rows[0] + "".join(new_rows)
+
+
+def test_merge_again_replaces_rows_of_merged_genes(tmp_path):
+    anno_dir: str = str(tmp_path)
+    os.makedirs(get_result_dir(anno_dir))
+    domain_row: str = "G1|P11|9606#G1|P12|9606\tG1|P11|9606\t100\tpfam_A\t10\t50\t1.0\tY\n"
+    write_file(os.path.join(get_result_dir(anno_dir), "G1_forward.domains"), domain_row)
+    for _ in range(2):
+        assert merge_results((anno_dir, "_forward.domains", "forward.domains")) == 1
+        with open(os.path.join(anno_dir, "forward.domains"), "r") as f:
+            assert f.read() == domain_row
@@ -0,0 +1,57 @@
+import os
+
+from Classes.FASTools.FASScoreCache import FASScoreCache
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.FASMatrix import FASMatrix
+from Classes.SequenceHandling.Gene import Gene
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+
+
+def load_gene(pass_path: PassPath, gene_id: str) -> Gene:
+    gene_assembler: GeneAssembler = GeneAssembler("homo_sapiens", "9606")
+    gene_assembler.load(pass_path)
+    return gene_assembler[gene_id]
+
+
+def test_scores_are_kept_per_mode_and_tools(tmp_path):
+    cache_path: str = str(tmp_path / "cache.sqlite")
+    with FASScoreCache(cache_path, "0f", "tools_1") as fas_score_cache:
+        fas_score_cache.put_scores([("a", "b", 0.5), ("b", "a", 0.25)])
+        assert fas_score_cache.get_score("a", "b") == 0.5
+        assert fas_score_cache.get_score("b", "a") == 0.25
+        assert fas_score_cache.get_score("a", "c") is None
+    with FASScoreCache(cache_path, "0f", "tools_1") as fas_score_cache:
+        assert fas_score_cache.get_score("a", "b") == 0.5
+    with FASScoreCache(cache_path, "1f", "tools_1") as fas_score_cache:
+        assert fas_score_cache.get_score("a", "b") is None
+    with FASScoreCache(cache_path, "0f", "tools_2") as fas_score_cache:
+        assert fas_score_cache.get_score("a", "b") is None
+
+
+def test_gene_round_trip(tmp_path, library):
+    scored_gene: Gene = load_gene(library, "ENSG00000000001")
+    scored_gene.set_fas_score("ENSP00000000011", "ENSP00000000012", 0.75)
+    scored_gene.set_fas_score("ENSP00000000012", "ENSP00000000011", 0.5)
+
+    with FASScoreCache(str(tmp_path / "cache.sqlite"), "0f", "tools") as fas_score_cache:
+        fas_score_cache.add_gene(scored_gene)
+        gene: Gene = load_gene(library, "ENSG00000000001")
+        assert fas_score_cache.fill_gene(gene) == 2
+        assert fas_score_cache.fill_gene(gene) == 0
+    assert gene.get_fas_matrix().get_score("ENSP00000000011", "ENSP00000000012") == 0.75
+    assert gene.get_fas_matrix().get_score("ENSP00000000012", "ENSP00000000011") == 0.5
+    assert gene.get_fas_matrix().get_score("ENSP00000000011", "ENSP00000000013") == FASMatrix.UNSCORED
+
+
+def test_tools_label(tmp_path):
+    anno_tools: str = str(tmp_path / "annoTools")
+    os.makedirs(os.path.join(anno_tools, "Pfam"))
+    with open(os.path.join(anno_tools, "Pfam", "Pfam-A.hmm"), "w") as f:
+        f.write("HMMER3")
+    label: str = FASScoreCache.get_tools_label(anno_tools)
+    assert label.startswith("annoTools:")
+    assert FASScoreCache.get_tools_label(anno_tools) == label
+    with open(os.path.join(anno_tools, "Pfam", "Pfam-A.hmm"), "a") as f:
+        f.write("/3.4")
+    assert FASScoreCache.get_tools_label(anno_tools) != label
+    assert FASScoreCache.get_tools_label("pfam_35") == "pfam_35"
@@ -0,0 +1,17 @@
+from Classes.SequenceHandling.Gene import Gene
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+
+
+def test_delete_fas_entry_updates_the_gene_index(library):
+    gene_assembler: GeneAssembler = GeneAssembler("homo_sapiens", "9606")
+    gene_assembler.load(library)
+    assert gene_assembler.get_protein_count(False, True) == 5
+    gene: Gene = gene_assembler["ENSG00000000001"]
+
+    gene.delete_fas_entry("ENSP00000000013")
+    assert "ENSP00000000013" not in gene.get_fas_matrix()
+    assert "ENSP00000000013" in gene.transcripts
+    assert gene_assembler.get_protein_count(False, True) == 4
+    assert gene_assembler.gene_index.fas_changed_gene_ids == {"ENSG00000000001"}
+    gene.check_fas_status()
+    assert gene_assembler.get_protein_count(False, True) == 4
@@ -0,0 +1,190 @@
+import gzip
+import json
+import os
+import shutil
+from typing import Dict, List
+
+import pytest
+
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.FASMatrix import FASMatrix
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+from spice_patch import export_binary_to_json
+
+
+def load_library(pass_path: PassPath) -> GeneAssembler:
+    gene_assembler: GeneAssembler = GeneAssembler("homo_sapiens", "9606")
+    gene_assembler.load(pass_path)
+    return gene_assembler
+
+
+def get_shard_times(pass_path: PassPath) -> Dict[str, int]:
+    return {file_name: os.stat(os.path.join(pass_path["fas_scores"], file_name)).st_mtime_ns
+            for file_name in os.listdir(pass_path["fas_scores"])}
+
+
+def add_binary_path(pass_path: PassPath) -> PassPath:
+    path_dict: Dict[str, str] = dict(pass_path.path_dict)
+    path_dict["transcript_binary"] = os.path.join("transcript_data", "library.bin")
+    with open(os.path.join(pass_path["root"], "paths.json"), "w") as f:
+        json.dump(path_dict, f, indent=4)
+    return PassPath(path_dict)
+
+
+def test_extract(gtf_path):
+    gene_assembler: GeneAssembler = GeneAssembler("homo_sapiens", "9606")
+    gene_assembler.extract(gtf_path)
+    assert gene_assembler.get_gene_count() == 3
+    assert gene_assembler.get_transcript_count() == 9
+    assert gene_assembler.get_protein_count() == 6
+    assert gene_assembler.get_gene_of("ENSP00000000022").get_id() == "ENSG00000000002"
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_parallel_extraction_matches_stream(gtf_path, compressed):
+    if compressed:
+        with open(gtf_path, "rb") as f_in, gzip.open(gtf_path + ".gz", "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        gtf_path += ".gz"
+    stream_assembler: GeneAssembler = GeneAssembler("homo_sapiens", "9606")
+    stream_assembler.extract(gtf_path)
+    parallel_assembler: GeneAssembler = GeneAssembler("homo_sapiens", "9606")
+    parallel_assembler.extract(gtf_path, threads=2)
+    assert GeneAssembler.to_dict(parallel_assembler.gene_assembly, "info") == \
+        GeneAssembler.to_dict(stream_assembler.gene_assembly, "info")
+
+
+def test_range_with_gene_of_another_range(gtf_path):
+    with open(gtf_path, "r") as f:
+        lines: List[str] = f.read().split("\n")
+    # The lines of one protein of the first gene are moved behind the last gene.
+    moved_lines: List[str] = [line for line in lines if "ENSP00000000013" in line or "ENST00000000013" in line]
+    lines = [line for line in lines if line not in moved_lines][:-1] + moved_lines + [""]
+    with open(gtf_path, "w") as f:
+        f.write("\n".join(lines))
+    gene_line: str = next(line for line in lines if "\tgene\t" in line and "ENSG00000000002" in line)
+    second_gene_start: int = sum(len(line) + 1 for line in lines[:lines.index(gene_line)])
+
+    assert GeneAssembler.extract_range((gtf_path, second_gene_start, os.path.getsize(gtf_path), "homo_sapiens", "9606",
+                                        dict())) is None
+    stream_assembler: GeneAssembler = GeneAssembler("homo_sapiens", "9606")
+    stream_assembler.extract(gtf_path)
+    parallel_assembler: GeneAssembler = GeneAssembler("homo_sapiens", "9606")
+    parallel_assembler.extract(gtf_path, threads=2)
+    assert GeneAssembler.to_dict(parallel_assembler.gene_assembly, "info") == \
+        GeneAssembler.to_dict(stream_assembler.gene_assembly, "info")
+
+
+def test_range_with_missing_attribute_raises(gtf_path):
+    with open(gtf_path, "r") as f:
+        gtf: str = f.read()
+    with open(gtf_path, "w") as f:
+        f.write(gtf.replace(" protein_id \"ENSP00000000022\";", ""))
+    with pytest.raises(KeyError):
+        GeneAssembler.extract_range((gtf_path, 0, os.path.getsize(gtf_path), "homo_sapiens", "9606", dict()))
+
+
+def test_columnar_rejects_threads(gtf_path):
+    with pytest.raises(ValueError):
+        GeneAssembler("homo_sapiens", "9606").extract(gtf_path, engine="columnar", threads=2)
+
+
+def test_fas_round_trip(library):
+    gene_assembler: GeneAssembler = load_library(library)
+    gene_assembler["ENSG00000000001"].set_fas_score("ENSP00000000011", "ENSP00000000012", 0.75)
+    gene_assembler.save_fas(library)
+
+    loaded_assembler: GeneAssembler = load_library(library)
+    assert loaded_assembler["ENSG00000000001"].get_fas_matrix().get_score("ENSP00000000011",
+                                                                          "ENSP00000000012") == 0.75
+    assert GeneAssembler.to_dict(loaded_assembler.gene_assembly, "fas") == \
+        GeneAssembler.to_dict(gene_assembler.gene_assembly, "fas")
+    with open(library["fas_index"], "r") as f:
+        assert json.load(f) == {gene_id: GeneAssembler.get_fas_shard(gene_id)
+                                for gene_id in gene_assembler.gene_assembly}
+
+
+def test_save_fas_rewrites_changed_shards_only(library):
+    gene_assembler: GeneAssembler = load_library(library)
+    shard_times: Dict[str, int] = get_shard_times(library)
+    gene_assembler["ENSG00000000002"].set_fas_score("ENSP00000000021", "ENSP00000000022", 0.5)
+    gene_assembler.save_fas(library)
+
+    changed_shard: str = GeneAssembler.get_fas_shard("ENSG00000000002")
+    new_shard_times: Dict[str, int] = get_shard_times(library)
+    assert new_shard_times.keys() == shard_times.keys()
+    assert [shard for shard in shard_times if shard_times[shard] != new_shard_times[shard]] == [changed_shard]
+
+
+def test_missing_sequences_raise(library):
+    with open(library["transcript_seq"], "r") as f:
+        seq_dict = json.load(f)
+    del seq_dict["ENSG00000000003"]
+    with open(library["transcript_seq"], "w") as f:
+        json.dump(seq_dict, f)
+    with pytest.raises(ValueError):
+        load_library(library)
+
+
+def test_deleted_transcripts_leave_the_fas_matrix(library):
+    gene_assembler: GeneAssembler = load_library(library)
+    gene_assembler["ENSG00000000001"].delete_transcript("ENSP00000000013")
+    # The FAS scores are saved later, the saved matrix still holds the deleted protein.
+    gene_assembler.save_info(library)
+    gene_assembler.save_seq(library)
+
+    loaded_assembler: GeneAssembler = load_library(library)
+    fas_matrix: FASMatrix = loaded_assembler["ENSG00000000001"].get_fas_matrix()
+    assert "ENSP00000000013" not in fas_matrix.get_ids()
+    loaded_assembler.save_fas(library)
+    assert "ENSP00000000013" not in load_library(library)["ENSG00000000001"].get_fas_matrix().get_ids()
+
+
+def test_binary_library(library):
+    json_assembler: GeneAssembler = load_library(library)
+    pass_path: PassPath = add_binary_path(library)
+    json_assembler.save_binary(pass_path)
+
+    binary_assembler: GeneAssembler = load_library(pass_path)
+    assert binary_assembler.binary_is_saved
+    assert len(binary_assembler.gene_assembly) == 0
+    assert binary_assembler["ENSG00000000002"].get_id() == "ENSG00000000002"
+    assert len(binary_assembler.gene_assembly) == 1
+    assert binary_assembler.get_gene_count() == 3
+    for mode in GeneAssembler.LIBRARY_COMPONENTS:
+        assert GeneAssembler.to_dict(binary_assembler.gene_assembly, mode) == \
+            GeneAssembler.to_dict(json_assembler.gene_assembly, mode)
+
+
+def test_stale_binary_library(library):
+    gene_assembler: GeneAssembler = load_library(library)
+    pass_path: PassPath = add_binary_path(library)
+    gene_assembler.save_binary(pass_path)
+    gene_assembler["ENSG00000000001"].set_fas_score("ENSP00000000011", "ENSP00000000012", 0.75)
+    gene_assembler.save_fas(pass_path)
+
+    loaded_assembler: GeneAssembler = load_library(pass_path)
+    assert not loaded_assembler.binary_is_saved
+    assert loaded_assembler["ENSG00000000001"].get_fas_matrix().get_score("ENSP00000000011",
+                                                                          "ENSP00000000012") == 0.75
+    with pytest.raises(ValueError):
+        export_binary_to_json(library["root"])
+
+
+def test_export_binary_library(library):
+    gene_assembler: GeneAssembler = load_library(library)
+    pass_path: PassPath = add_binary_path(library)
+    gene_assembler.save_binary(pass_path)
+    for key in ["transcript_info", "transcript_seq", "fas_index"]:
+        os.remove(pass_path[key])
+    shutil.rmtree(pass_path["fas_scores"])
+    os.makedirs(pass_path["fas_scores"])
+
+    export_binary_to_json(library["root"])
+    exported_assembler: GeneAssembler = load_library(pass_path)
+    assert exported_assembler.binary_is_saved
+    exported_assembler.close_binary()
+    exported_assembler.load(library)
+    for mode in GeneAssembler.LIBRARY_COMPONENTS:
+        assert GeneAssembler.to_dict(exported_assembler.gene_assembly, mode) == \
+            GeneAssembler.to_dict(gene_assembler.gene_assembly, mode)
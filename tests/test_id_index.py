@@ -0,0 +1,63 @@
+import json
+import os
+from typing import Any, Dict
+
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+from Classes.SequenceHandling.IDIndex import IDIndex
+from Classes.SequenceHandling.Protein import Protein
+
+
+def test_lookups_match_gene_assembler(library):
+    id_index: IDIndex = IDIndex.load(library)
+    gene_assembler: GeneAssembler = GeneAssembler("homo_sapiens", "9606")
+    gene_assembler.load(library, ["info"], True)
+    synonym_map: Dict[str, str] = dict()
+    protein_map: Dict[str, str] = dict()
+    gene_map: Dict[str, str] = dict()
+    for transcript in gene_assembler.iter_transcripts():
+        if isinstance(transcript, Protein):
+            transcript_id: str = transcript.get_id_transcript()
+            protein_map[transcript_id] = transcript.get_id()
+        else:
+            transcript_id: str = transcript.get_id()
+            protein_map[transcript_id] = ""
+        gene_map[transcript_id] = transcript.get_id_gene()
+        synonym_map[transcript_id] = transcript_id
+        for synonym in transcript.get_synonyms():
+            synonym_map[synonym] = transcript_id
+
+    assert len(gene_map) == 9
+    assert id_index.synonyms == synonym_map
+    assert {transcript_id: id_index.get_protein_id(transcript_id) for transcript_id in id_index.transcripts} \
+        == protein_map
+    assert {transcript_id: id_index.get_gene_id(transcript_id) for transcript_id in id_index.transcripts} == gene_map
+    assert dict(id_index.iter_genes()) == {gene.get_id(): [transcript_id for transcript_id in gene_map
+                                                           if gene_map[transcript_id] == gene.get_id()]
+                                           for gene in gene_assembler.iter_genes()}
+    # The saved index reads back to the same lookups.
+    loaded_index: IDIndex = IDIndex.load(library)
+    assert (loaded_index.genes, loaded_index.transcripts, loaded_index.synonyms) \
+        == (id_index.genes, id_index.transcripts, id_index.synonyms)
+
+
+def write_transcript_info(library: PassPath, info_dict: Dict[str, Any]) -> None:
+    with open(library["transcript_info"], "w") as f:
+        json.dump(info_dict, f, indent=4)
+
+
+def test_load_rebuilds_after_transcript_info_changed(library):
+    id_index: IDIndex = IDIndex.load(library)
+    assert os.path.exists(IDIndex.get_path(library))
+    assert "ENST00000000031" in id_index
+
+    with open(library["transcript_info"], "r") as f:
+        info_dict: Dict[str, Any] = json.load(f)
+    del info_dict["ENSG00000000003"]
+    write_transcript_info(library, info_dict)
+    id_index = IDIndex.load(library)
+    assert "ENST00000000031" not in id_index
+    assert "ENSG00000000003" not in id_index.genes
+    assert id_index.fingerprint == IDIndex.get_fingerprint(library)
+    with open(IDIndex.get_path(library), "r") as f:
+        assert json.load(f)["transcript_info"] == id_index.fingerprint
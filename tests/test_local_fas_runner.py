@@ -0,0 +1,66 @@
+import functools
+import os
+import subprocess
+from typing import List, Set
+
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.FASMatrix import FASMatrix
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+from FASJobAssistant import FASJobAssistant, LocalFASRunner
+
+PHYLOPROFILE_HEADER: str = "geneID\tncbiID\torthoID\tFAS_F\tFAS_B\n"
+
+
+def stub_runner(failing_ids: Set[str], command: List[str]) -> int:
+    """
+    Stands in for fas.run and the annotation, every pair gets the scores 0.5 and 0.25. The FASResultHandler commands
+    are run.
+    """
+    if command[0].endswith("fas.run"):
+        argument_dict = dict(zip(command[1:], command[2:]))
+        gene_id: str = argument_dict["--out_name"]
+        if gene_id in failing_ids:
+            return 1
+        with open(argument_dict["--pairwise"], "r") as f:
+            pairs: List[List[str]] = [line.split("\t") for line in f.read().split("\n") if len(line) > 0]
+        with open(os.path.join(argument_dict["--out_dir"], gene_id + ".phyloprofile"), "w") as f:
+            f.write(PHYLOPROFILE_HEADER + "".join([protein_1 + "\tncbi9606\t" + protein_2 + "\t0.5\t0.25\n"
+                                                   for protein_1, protein_2 in pairs]))
+        for suffix in ["_forward.domains", "_reverse.domains", "_config.yml"]:
+            with open(os.path.join(argument_dict["--out_dir"], gene_id + suffix), "w") as f:
+                f.write("")
+        return 0
+    if command[0].endswith("fas.doAnno") or "FASResultHandler" not in command[1]:
+        return 0
+    return subprocess.run(command).returncode
+
+
+def get_pair_scores(gene_assembler: GeneAssembler, gene_id: str, protein_id_1: str, protein_id_2: str) -> Set[float]:
+    fas_matrix: FASMatrix = gene_assembler[gene_id].get_fas_matrix()
+    return {fas_matrix.get_score(protein_id_1, protein_id_2), fas_matrix.get_score(protein_id_2, protein_id_1)}
+
+
+def make_runner(pass_path: PassPath, failing_ids: Set[str]) -> LocalFASRunner:
+    job_assistant: FASJobAssistant = FASJobAssistant(pass_path, "", [], "/fas/bin", "", [], 1, "/annoTools")
+    return LocalFASRunner(job_assistant, 2, functools.partial(stub_runner, failing_ids))
+
+
+def test_annotate(library):
+    assert make_runner(library, set()).annotate()
+
+
+def test_run_and_retry(library):
+    failed_ids: List[str] = make_runner(library, {"ENSG00000000002"}).run()
+    assert failed_ids == ["ENSG00000000002"]
+    local_fas_runner: LocalFASRunner = make_runner(library, set())
+    with open(local_fas_runner.get_retry_path(), "r") as f:
+        assert f.read() == "ENSG00000000002"
+    gene_assembler: GeneAssembler = GeneAssembler("homo_sapiens", "9606")
+    gene_assembler.load(library)
+    assert get_pair_scores(gene_assembler, "ENSG00000000001", "ENSP00000000011", "ENSP00000000012") == {0.5, 0.25}
+    assert gene_assembler.get_fas_scored_count() < gene_assembler.get_protein_count()
+
+    assert local_fas_runner.run(True) == []
+    gene_assembler.load(library)
+    assert gene_assembler.get_fas_scored_count() == gene_assembler.get_protein_count()
+    assert get_pair_scores(gene_assembler, "ENSG00000000002", "ENSP00000000021", "ENSP00000000022") == {0.5, 0.25}
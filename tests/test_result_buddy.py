@@ -0,0 +1,24 @@
+import gzip
+import os
+import shutil
+from typing import Dict, List
+
+import pytest
+
+from Classes.GTFBoy.GTFBoy import GTFBoy
+from Classes.ResultBuddy.ResultBuddy import ResultBuddy
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_parallel_expression_parsing_matches_serial(gtf_path, compressed):
+    line_dicts: List[Dict[str, str]] = list(ResultBuddy.parse_expression_lines(GTFBoy(gtf_path)))
+    if compressed:
+        with open(gtf_path, "rb") as f_in, gzip.open(gtf_path + ".gz", "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        gtf_path += ".gz"
+    file_names: List[str] = sorted(os.listdir(os.path.dirname(gtf_path)))
+
+    assert list(ResultBuddy.parse_expression_parallel(GTFBoy(gtf_path), 2, "")) == line_dicts
+    assert len(line_dicts) == 9
+    # The unpacked copy of a compressed GTF is removed again.
+    assert sorted(os.listdir(os.path.dirname(gtf_path))) == file_names
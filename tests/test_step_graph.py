@@ -0,0 +1,72 @@
+from typing import Dict, List, Optional, Set
+
+import pytest
+
+from Classes.PassPath.PassPath import PassPath
+from Classes.SequenceHandling.GeneAssembler import GeneAssembler
+from Classes.SequenceHandling.LibraryInfo import LibraryInfo
+from Classes.StepGraph.StepGraph import LibraryStep, StepGraph
+
+STATUS_KEYS: List[str] = ["01_collect", "02_filter", "03_score"]
+
+
+class RecordingAssembler(GeneAssembler):
+    """
+    Records the saved components instead of writing them.
+    """
+
+    def __init__(self) -> None:
+        super().__init__("homo_sapiens", "9606")
+        self.saved: List[str] = list()
+
+    def save_seq(self, pass_path: PassPath) -> None:
+        self.saved.append("seq")
+
+    def save_fas(self, pass_path: PassPath) -> None:
+        self.saved.append("fas")
+
+    def save_info(self, pass_path: PassPath) -> None:
+        self.saved.append("info")
+
+
+def set_status(status_key: str):
+    def step_function(gene_assembler: GeneAssembler, library_info: LibraryInfo, pass_path: PassPath) -> None:
+        library_info["status"][status_key] = True
+    return step_function
+
+
+def make_step_graph(library: PassPath, status: Dict[str, bool], checkpoints: Optional[Set[str]] = None) -> StepGraph:
+    library_info: LibraryInfo = LibraryInfo(library["info"])
+    library_info["status"] = status
+    step_graph: StepGraph = StepGraph(RecordingAssembler(), library_info, library, checkpoints)
+    step_graph.add_step(LibraryStep("01_collect", "Collect", "Collected", set_status("01_collect"),
+                                    writes=["seq", "info"]))
+    step_graph.add_step(LibraryStep("02_filter", "Filter", "Filtered", set_status("02_filter"),
+                                    requires=["01_collect"], writes=["fas"]))
+    step_graph.add_step(LibraryStep("03_score", "Score", "Scored", set_status("03_score"),
+                                    requires=["02_filter"], writes=["fas"], reads=["fas"]))
+    return step_graph
+
+
+def test_parse_checkpoints():
+    assert StepGraph.parse_checkpoints("all", STATUS_KEYS) is None
+    assert StepGraph.parse_checkpoints("none", STATUS_KEYS) == set()
+    assert StepGraph.parse_checkpoints("1, 03", STATUS_KEYS) == {"01_collect", "03_score"}
+    with pytest.raises(ValueError):
+        StepGraph.parse_checkpoints("04", STATUS_KEYS)
+
+
+def test_checkpoint_before_reading_step_saves_all_components(library):
+    step_graph: StepGraph = make_step_graph(library, dict(), set())
+    assert step_graph.run() == STATUS_KEYS
+    # The reading step needs the FAS scores on disk, the transcript info and sequences are saved along with them.
+    assert step_graph.gene_assembler.saved == ["seq", "fas", "info", "fas"]
+    assert LibraryInfo(library["info"])["status"] == {status_key: True for status_key in STATUS_KEYS}
+
+
+def test_required_steps_rerun(library):
+    step_graph: StepGraph = make_step_graph(library, {"01_collect": False, "02_filter": True, "03_score": True})
+    assert step_graph.run() == STATUS_KEYS
+    step_graph = make_step_graph(library, {status_key: True for status_key in STATUS_KEYS})
+    assert step_graph.run() == []
+    assert step_graph.gene_assembler.saved == []